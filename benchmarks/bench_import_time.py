@@ -0,0 +1,40 @@
+"""Times a cold `import quickmap` with python -X importtime and lists the slowest modules
+
+Run with: python benchmarks/bench_import_time.py [--runs 10] [--max-ms 150]
+Exits with status 1 when the median import time is over --max-ms.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+def import_times(module='quickmap'):
+    """Returns {module: cumulative microseconds} for one fresh interpreter importing module"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None)
+    args = parser.parse_args()
+    runs = [import_times() for _ in range(args.runs)]
+    total = statistics.median(run['quickmap'] for run in runs) / 1000
+    print(f'import quickmap: {total:.1f}ms median of {args.runs} runs')
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)[:10]
+    for name, cumulative in slowest:
+        print(f'  {cumulative / 1000:8.1f}ms  {name}')
+    heavy = [name for name in ('numpy', 'PIL.Image', 'pyproj') if name in runs[-1]]
+    if heavy:
+        print(f'imported eagerly: {", ".join(heavy)}')
+    if args.max_ms is not None and total > args.max_ms:
+        sys.exit(1)
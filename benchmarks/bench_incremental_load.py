@@ -0,0 +1,50 @@
+"""Loads 1,000 incremental geojson batches and times keeping the extent current
+
+Run with: python benchmarks/bench_incremental_load.py
+"""
+import random
+import time
+
+from quickmap.feature import FeatureCollection
+from quickmap.geometry import BoundingBox
+
+BATCHES = 1000
+FEATURES_PER_BATCH = 20
+
+
+def batch(rng):
+    return {
+        'type': 'FeatureCollection',
+        'features': [{
+            'type': 'Feature',
+            'properties': {'id': i},
+            'geometry': {'type': 'Point', 'coordinates': [rng.uniform(-120, -70), rng.uniform(25, 50)]}
+        } for i in range(FEATURES_PER_BATCH)]
+    }
+
+
+def full_extent(fc):
+    return BoundingBox.covering(n.bounding_box for n in fc.features)
+
+
+def run(extent):
+    rng = random.Random(0)
+    batches = [batch(rng) for _ in range(BATCHES)]
+    fc = FeatureCollection()
+    changes = 0
+    start = time.perf_counter()
+    for data in batches:
+        # the same reads QuickMap.load_geosjon makes to decide whether to re-render the basemap
+        previous = extent(fc)
+        fc.load_geojson(data)
+        if previous != extent(fc):
+            changes += 1
+    return time.perf_counter() - start, changes
+
+
+if __name__ == '__main__':
+    incremental, changes = run(lambda fc: fc.bounding_box)
+    full, _ = run(full_extent)
+    print(f'{BATCHES} batches of {FEATURES_PER_BATCH} features, extent changed {changes} times')
+    print(f'incremental extent: {incremental:.3f}s')
+    print(f'full recompute:     {full:.3f}s')
@@ -0,0 +1,53 @@
+"""Loads many GeoJSON files with load_many on one process and on a pool, and prints the speedup
+
+Run with: python benchmarks/bench_load_many.py [--files 40] [--features 5000] [--processes 4]
+
+The speedup is bounded by the work left in the parent: unpickling the FeatureArrays of
+every file, building its Features and one extend. Run it on a machine with at least
+--processes free cores.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from quickmap.bulk import load_many
+
+
+def write_files(directory, files, features):
+    rng = random.Random(0)
+    for n in range(files):
+        data = {'type': 'FeatureCollection', 'features': [{
+            'type': 'Feature',
+            'properties': {'id': i, 'name': f'feature {i}', 'value': rng.random()},
+            'geometry': {'type': 'Point', 'coordinates': [rng.uniform(-120, -70), rng.uniform(25, 50)]}
+        } for i in range(features)]}
+        with open(os.path.join(directory, f'{n:04}.geojson'), 'w') as f:
+            json.dump(data, f)
+
+
+def best_of(repeat, processes, directory):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        feature_collection, _ = load_many(directory, processes=processes)
+        times.append(time.perf_counter() - start)
+    return min(times), len(feature_collection.features)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--features', type=int, default=5000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        write_files(directory, args.files, args.features)
+        serial, count = best_of(args.repeat, 1, directory)
+        pooled, _ = best_of(args.repeat, args.processes, directory)
+    print(f'{args.files} files, {count} features, {os.cpu_count()} cpus')
+    print(f'processes=1:  {serial:.3f}s')
+    print(f'processes={args.processes}:  {pooled:.3f}s  {serial / pooled:.2f}x')
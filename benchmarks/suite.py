@@ -0,0 +1,226 @@
+"""Benchmark suite for projection, tile cover, GeoJSON loading and full renders
+
+Run with: python benchmarks/suite.py [--sizes 10000 100000] [--output results.json] [--baseline baseline.json]
+
+Every case runs once to warm up and then --repeat times with the garbage collector off, and
+the min, median and spread of the timed runs are reported. Basemap tiles come from an in
+memory stand-in source, so no network is needed. With --baseline the fastest runs are
+compared to an earlier --output file, the minimum being the least noisy of the numbers,
+and the suite exits with status 1 when a case got slower than --threshold.
+
+Sizes are feature counts. Use --sizes 10000 100000 1000000 10000000 for the full range. The
+10M size needs several GB of memory.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+from quickmap import QuickMap
+from quickmap.feature import FeatureCollection
+from quickmap.geometry import BoundingBox, Point
+from quickmap.io_service import read_geojson
+from quickmap.source import TileSource
+from quickmap.tile import Tile, TileCollection
+
+SIZES = [10_000, 100_000, 1_000_000]
+ZOOM = 12
+
+
+class StandInTileSource(TileSource):
+    """Answers every tile with the same png, so renders are timed without the network"""
+
+    name = 'stand-in'
+    cacheable = False
+
+    def __init__(self) -> None:
+        buffer = io.BytesIO()
+        Image.new('RGBA', (256, 256), (200, 220, 200, 255)).save(buffer, format='PNG')
+        self.png = buffer.getvalue()
+
+    def fetch(self, tile, etag=None):
+        return self.png, None
+
+
+def coordinates(size, seed=0):
+    rng = random.Random(seed)
+    return [(rng.uniform(-120.0, -70.0), rng.uniform(25.0, 50.0)) for _ in range(size)]
+
+
+def geojson(size):
+    return {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'id': i}, 'geometry': {'type': 'Point', 'coordinates': [lng, lat]}}
+        for i, (lng, lat) in enumerate(coordinates(size))]}
+
+
+def bench_web_mercator(size, workdir):
+    points = [Point(lng, lat) for lng, lat in coordinates(size)]
+    return lambda: [point.web_mercator for point in points]
+
+
+def bench_pixels(size, workdir):
+    points = [Point(lng, lat) for lng, lat in coordinates(size)]
+    return lambda: [point.pixels(ZOOM) for point in points]
+
+
+def bench_tile_for_latitude_longitude(size, workdir):
+    points = coordinates(size)
+    return lambda: [Tile.for_latitude_longitude(lat, lng, ZOOM) for lng, lat in points]
+
+
+def bench_calculate_tiles(size, workdir):
+    # one bounding box per 100 features, from a few blocks to a few states across
+    rng = random.Random(0)
+    boxes = []
+    for lng, lat in coordinates(max(1, size // 100)):
+        width = rng.uniform(0.01, 5.0)
+        boxes.append(BoundingBox(x_min=lng, x_max=lng + width, y_min=lat, y_max=lat + width / 2))
+    return lambda: [TileCollection().calculate_tiles(box) for box in boxes]
+
+
+def bench_read_geojson(size, workdir):
+    path = os.path.join(workdir, f'{size}.geojson')
+    if not os.path.exists(path):
+        with open(path, 'w') as f:
+            json.dump(geojson(size), f)
+    return lambda: read_geojson(path)
+
+
+def bench_get_features(size, workdir):
+    data = geojson(size)
+    return lambda: FeatureCollection.get_features(data)
+
+
+def bench_from_binary(size, workdir):
+    path = os.path.join(workdir, f'{size}.qmf')
+    if not os.path.exists(path):
+        FeatureCollection(FeatureCollection.get_features(geojson(size))).to_binary(path)
+    return lambda: FeatureCollection.from_binary(path)
+
+
+def bench_save_png(size, workdir):
+    data = geojson(size)
+    source = StandInTileSource()
+    output = os.path.join(workdir, 'map.png')
+
+    def run():
+        quick_map = QuickMap(source=source, workers=1)
+        quick_map.load_geosjon(data)
+        quick_map.save_png(output)
+    return run
+
+
+CASES = {
+    'Point.web_mercator': bench_web_mercator,
+    'Point.pixels': bench_pixels,
+    'Tile.for_latitude_longitude': bench_tile_for_latitude_longitude,
+    'TileCollection.calculate_tiles': bench_calculate_tiles,
+    'read_geojson': bench_read_geojson,
+    'FeatureCollection.get_features': bench_get_features,
+    'FeatureCollection.from_binary': bench_from_binary,
+    'QuickMap.save_png': bench_save_png,
+}
+
+
+def measure(run, repeat):
+    """Returns the seconds of repeat timed calls of run after one untimed warm up call"""
+    run()
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return times
+
+
+def run_suite(sizes, repeat, names, workdir):
+    results = []
+    for name in names:
+        for size in sizes:
+            run = CASES[name](size, workdir)
+            times = measure(run, repeat)
+            result = {
+                'name': name,
+                'size': size,
+                'min': min(times),
+                'median': statistics.median(times),
+                'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+                'times': times,
+            }
+            results.append(result)
+            print(f'{name:32} {size:>10} {result["median"] * 1000:10.1f}ms  '
+                  f'{result["median"] / size * 1e9:10.0f}ns/feature  ±{result["stdev"] * 1000:.1f}ms', flush=True)
+            del run
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(results, baseline, threshold):
+    """Prints the change of every fastest run against baseline, returns the cases slower than threshold"""
+    previous = {(result['name'], result['size']): result for result in baseline['results']}
+    regressions = []
+    print(f'\ncompared to {baseline["environment"].get("commit")} from {baseline["environment"].get("time")}')
+    for result in results:
+        before = previous.get((result['name'], result['size']))
+        if before is None:
+            continue
+        ratio = result['min'] / before['min']
+        # a change within the noise of both runs is not a regression
+        noise = (result['stdev'] + before['stdev']) / before['min']
+        slower = ratio > 1.0 + max(threshold, noise)
+        if slower:
+            regressions.append(result)
+        print(f'{result["name"]:32} {result["size"]:>10} {ratio:8.2f}x {"REGRESSION" if slower else ""}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--output', help='write the results as json to this path')
+    parser.add_argument('--baseline', help='compare against the json results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown, 0.10 is 10%%')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_suite(args.sizes, args.repeat, args.cases, workdir)
+    report = {'environment': environment(), 'repeat': args.repeat, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
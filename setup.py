@@ -12,5 +12,9 @@ setup(
     author_email='quickmap@timoslund.com',
     url='https://github.com/toslund/quickmap',
     package_dir={"": "src"},
-    packages=find_packages(where="src")
+    packages=find_packages(where="src"),
+    package_data={"quickmap": ["icons/*.png"]},
+    install_requires=["numpy", "Pillow>=10.1"],
+    extras_require={"pyproj": ["pyproj"], "dev": ["pyflakes", "pytest"]},
+    entry_points={"console_scripts": ["quickmap=quickmap.cli:main"]}
 )
@@ -1,4 +1,20 @@
 from .quickmap import *
 from .feature import *
 from .geometry import *
-from .tile import *
\ No newline at end of file
+from .tile import *
+from .cache import *
+from .session import *
+from .source import *
+from .columnar import *
+from .symbols import *
+from .index import *
+from .export import *
+from .batch import *
+from .stats import *
+from .encoders import *
+from .cluster import *
+from .binary import *
+from .seeding import *
+from .density import *
+from .striped import *
+from .bulk import *
\ No newline at end of file
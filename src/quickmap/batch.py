@@ -0,0 +1,189 @@
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterable, List, Optional
+
+from .cache import TileCache
+from .canvas import MapCanvas
+from .feature import FeatureCollection
+from .lazy import lazy_import
+from .meta import TILE_SIZE
+from .source import TileSource, XYZTileSource
+from .symbols import PointStyle
+from .tile import TileCollection
+
+Image = lazy_import('PIL.Image')
+
+TILE_BYTES = TILE_SIZE * TILE_SIZE * 4
+# decoded basemap tiles of one wave, sized for a small /dev/shm as containers often have
+WAVE_BYTES = 32 * 1024 * 1024
+
+
+@dataclass
+class BatchResult:
+    '''Class for the outcome of one job of a batch'''
+    output: str
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def _plan(features):
+    """Loads a job's features and works out the tiles its basemap needs"""
+    start = time.perf_counter()
+    if not isinstance(features, FeatureCollection):
+        feature_collection = FeatureCollection()
+        feature_collection.load_geojson(features)
+        features = feature_collection
+    if not features.features:
+        raise ValueError('Job has no features to render')
+    tiles = TileCollection()
+    tiles.calculate_tiles(features.bounding_box)
+    return features, tiles.zoom, tiles.tiles, time.perf_counter() - start
+
+def _render(features, zoom, tiles, output, style, shared_name, offsets):
+    """Renders a job from the tiles of its wave, offsets are {tile: offset} into shared memory or {tile: bytes}"""
+    start = time.perf_counter()
+    shared = _attach(shared_name) if shared_name else None
+    try:
+        images = {}
+        for tile in tiles:
+            if tile in offsets:
+                if shared:
+                    offset = offsets[tile]
+                    data = bytes(shared.buf[offset:offset + TILE_BYTES])
+                else:
+                    data = offsets[tile]
+                images[tile] = Image.frombytes('RGBA', (TILE_SIZE, TILE_SIZE), data)
+    finally:
+        if shared:
+            shared.close()
+    canvas = MapCanvas(features, workers=1)
+    canvas.style = style
+    canvas._tiles.zoom = zoom
+    canvas._tiles.tiles = tiles
+    canvas.stitch_tiles(images=images)
+    canvas.save_png(output)
+    return time.perf_counter() - start
+
+
+def render_batch(jobs: Iterable, source: Optional[TileSource] = None, cache: Optional[TileCache] = None,
+                 style: PointStyle = PointStyle(), processes: Optional[int] = None, workers: int = 8) -> List[BatchResult]:
+    """Renders many (features, output) jobs to png on a pool of processes
+
+    features is a FeatureCollection or anything load_geojson accepts. Jobs are planned on
+    the pool, then handled in waves of neighbouring maps of at most WAVE_BYTES of decoded
+    tiles: every distinct basemap tile of a wave is fetched once (through cache when given)
+    and decoded once into shared memory that the rendering processes read from. When
+    shared memory has no room, the decoded tiles of a job are sent to its process instead.
+    A failing job is reported in its BatchResult and does not stop the batch.
+    """
+    jobs = list(jobs)
+    source = source or XYZTileSource()
+    results = [BatchResult(output=str(output)) for _, output in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        plans = {}
+        futures = {executor.submit(_plan, features): i for i, (features, _) in enumerate(jobs)}
+        for future, i in futures.items():
+            try:
+                plans[i] = future.result()
+            except Exception as e:
+                results[i].error = repr(e)
+        # neighbouring maps share the most tiles, so keep them in the same wave
+        order = sorted(plans, key=lambda i: (plans[i][1], min((n.x, n.y) for n in plans[i][2])))
+        for wave in _waves(order, plans):
+            unique = TileCollection(source=source)
+            unique.tiles = list(dict.fromkeys(tile for i in wave for tile in plans[i][2]))
+            try:
+                shared, offsets = _decode_shared(unique, cache, workers)
+            except Exception as e:
+                for i in wave:
+                    results[i].error = repr(e)
+                continue
+            try:
+                futures = {}
+                for i in wave:
+                    features, zoom, tiles, _ = plans[i]
+                    # without shared memory a job gets only the decoded tiles it needs
+                    job_offsets = offsets if shared else {tile: offsets[tile] for tile in tiles if tile in offsets}
+                    futures[executor.submit(_render, features, zoom, tiles, jobs[i][1], style,
+                                            shared.name if shared else None, job_offsets)] = i
+                for future, i in futures.items():
+                    try:
+                        results[i].seconds = plans[i][3] + future.result()
+                    except Exception as e:
+                        results[i].error = repr(e)
+            finally:
+                if shared:
+                    _release(shared)
+    return results
+
+def _waves(order, plans):
+    """Splits the planned jobs in order into waves whose distinct tiles fit in WAVE_BYTES, a job is never split"""
+    wave, tiles = [], set()
+    for i in order:
+        extra = set(plans[i][2]) - tiles
+        if wave and (len(tiles) + len(extra)) * TILE_BYTES > WAVE_BYTES:
+            yield wave
+            wave, tiles, extra = [], set(), set(plans[i][2])
+        wave.append(i)
+        tiles |= extra
+    if wave:
+        yield wave
+
+def _attach(name):
+    """Opens the parent's shared memory block without registering it with a resource tracker"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # the parent registered the block and unlinks it. Forked workers share its tracker, which
+    # keeps a set of names, so a register or unregister from here would unbalance it
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def _release(shared):
+    """Closes and unlinks a block made by _decode_shared"""
+    shared.close()
+    shared.unlink()
+
+def _allocate(size):
+    """Creates a shared memory block of size bytes, None when shared memory has no room for it"""
+    # a block larger than the free space of /dev/shm is created, but writing to it crashes
+    if os.path.isdir('/dev/shm') and shutil.disk_usage('/dev/shm').free < size:
+        return None
+    try:
+        return shared_memory.SharedMemory(create=True, size=size)
+    except OSError:
+        return None
+
+def _decode_shared(tiles: TileCollection, cache, workers):
+    """Fetches and decodes tiles once into one shared memory block, returns it with {tile: offset}
+
+    When the block can't be allocated, returns None with the decoded {tile: bytes}.
+    """
+    if not tiles.tiles:
+        return None, {}
+    decode = lambda f: Image.open(f).convert('RGBA').tobytes()
+    shared = _allocate(len(tiles.tiles) * TILE_BYTES)
+    if shared is None:
+        return None, dict(tiles.fetch_tiles(cache=cache, workers=workers, decode=decode))
+    offsets = {}
+    try:
+        for tile, data in tiles.fetch_tiles(cache=cache, workers=workers, decode=decode):
+            offset = len(offsets) * TILE_BYTES
+            shared.buf[offset:offset + TILE_BYTES] = data
+            offsets[tile] = offset
+    except BaseException:
+        shared.close()
+        shared.unlink()
+        raise
+    return shared, offsets
+
+
+__all__ = ['render_batch', 'BatchResult']
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import json
+import struct
+from typing import Iterable, Optional, Union
+
+from .columnar import PointArray
+from .feature import Feature, FeatureCollection
+from .geometry import BoundingBox, LineString, Point, Polygon
+from .io_service import dumps, loads
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+
+MAGIC = b'QMFB'
+VERSION = 1
+ALIGNMENT = 64
+CHUNK_SIZE = 1 << 16
+POINT, LINE_STRING, POLYGON = 0, 1, 2
+_PREAMBLE = struct.Struct('<4sIQ')
+
+# every feature is a run of parts and every part a run of vertices, a polygon feature also
+# has a run of ring counts, one per polygon
+ARRAYS = {
+    'types': 'u1',
+    'feature_parts': '<i8',
+    'part_vertices': '<i8',
+    'feature_rings': '<i8',
+    'rings': '<i8',
+    'x': '<f8',
+    'y': '<f8',
+    'boxes': '<f8',
+    'property_offsets': '<i8',
+    'properties': 'u1',
+}
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_features(features: Union[FeatureCollection, PointArray, Iterable[Feature]], path) -> int:
+    """Writes features to path in the quickmap binary feature format, returns the number written
+
+    The file is a small json header followed by 64 byte aligned arrays: the geometry type
+    of every feature, the offsets of its parts, rings and vertices, the x and y of all
+    vertices, the bounding box of every feature and the properties as one json document
+    per feature.
+    """
+    arrays = feature_arrays(features)
+    boxes = arrays['boxes']
+    count = len(arrays['types'])
+    header = {
+        'version': VERSION,
+        'count': count,
+        'bounding_box': [float(boxes[:, 0].min()), float(boxes[:, 1].max()),
+                         float(boxes[:, 2].min()), float(boxes[:, 3].max())] if count else None,
+        'arrays': {},
+    }
+    offset = 0
+    for name, dtype in ARRAYS.items():
+        arrays[name] = np.ascontiguousarray(arrays[name], dtype=dtype)
+        header['arrays'][name] = [offset, arrays[name].size]
+        offset = _aligned(offset + arrays[name].nbytes)
+    offsets = {name: offset for name, (offset, _) in header['arrays'].items()}
+    header = json.dumps(header).encode()
+    start = _aligned(_PREAMBLE.size + len(header))
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name in ARRAYS:
+            f.write(b'\0' * (start + offsets[name] - f.tell()))
+            f.write(arrays[name].tobytes())
+    return count
+
+
+def feature_arrays(features: Union[FeatureCollection, PointArray, Iterable[Feature]]) -> dict:
+    """Returns the arrays write_features stores for features, keyed by the names of ARRAYS"""
+    if isinstance(features, PointArray):
+        return _point_arrays(features)
+    return _feature_arrays(features.features if isinstance(features, FeatureCollection) else features)
+
+
+def _point_arrays(points):
+    count = len(points)
+    columns = {name: values.tolist() for name, values in points.properties.items()}
+    rows = [{name: values[i] for name, values in columns.items()} for i in range(count)] if columns else None
+    offsets = np.arange(count + 1, dtype=np.int64)
+    return dict(
+        types=np.zeros(count, dtype=np.uint8),
+        feature_parts=offsets,
+        part_vertices=offsets,
+        feature_rings=np.zeros(count + 1, dtype=np.int64),
+        rings=np.empty(0, dtype=np.int64),
+        x=points.x,
+        y=points.y,
+        boxes=np.column_stack((points.x, points.x, points.y, points.y)),
+        **_property_arrays(rows, count))
+
+
+def _feature_arrays(features):
+    types, feature_parts, part_vertices, feature_rings, rings = [], [0], [0], [0], []
+    xs, ys, boxes, rows = [], [], [], []
+    # runs of point coordinates are collected as floats and turned into one array per run
+    point_x, point_y = [], []
+    vertices = 0
+    for feature in features:
+        geometry = feature.geometry
+        if isinstance(geometry, Point):
+            types.append(POINT)
+            point_x.append(geometry.x)
+            point_y.append(geometry.y)
+            vertices += 1
+            part_vertices.append(vertices)
+        elif isinstance(geometry, (LineString, Polygon)):
+            types.append(POLYGON if isinstance(geometry, Polygon) else LINE_STRING)
+            if point_x:
+                xs.append(np.array(point_x))
+                ys.append(np.array(point_y))
+                point_x, point_y = [], []
+            for part in geometry.parts:
+                xs.append(part[:, 0])
+                ys.append(part[:, 1])
+                vertices += len(part)
+                part_vertices.append(vertices)
+            if isinstance(geometry, Polygon):
+                rings.extend(geometry.rings)
+        else:
+            raise TypeError(f'Unsupported geometry {geometry}')
+        feature_parts.append(len(part_vertices) - 1)
+        feature_rings.append(len(rings))
+        box = geometry.bounding_box
+        boxes.append((box.x_min, box.x_max, box.y_min, box.y_max))
+        rows.append(feature.properties)
+    if point_x:
+        xs.append(np.array(point_x))
+        ys.append(np.array(point_y))
+    return dict(
+        types=np.array(types, dtype=np.uint8),
+        feature_parts=np.array(feature_parts, dtype=np.int64),
+        part_vertices=np.array(part_vertices, dtype=np.int64),
+        feature_rings=np.array(feature_rings, dtype=np.int64),
+        rings=np.array(rings, dtype=np.int64),
+        x=np.concatenate(xs) if xs else np.empty(0),
+        y=np.concatenate(ys) if ys else np.empty(0),
+        boxes=np.array(boxes, dtype=np.float64).reshape(-1, 4),
+        **_property_arrays(rows))
+
+
+def _property_arrays(rows, count=None):
+    if rows is None:
+        # count features without properties
+        return {'property_offsets': np.arange(count + 1, dtype=np.int64) * 2,
+                'properties': np.frombuffer(b'{}' * count, dtype=np.uint8)}
+    encoded = [dumps(row) for row in rows]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in encoded], out=offsets[1:])
+    return {'property_offsets': offsets, 'properties': np.frombuffer(b''.join(encoded), dtype=np.uint8)}
+
+
+class FeatureArrays:
+    """Features held as the arrays of the binary feature format instead of Python objects
+
+    The arrays pickle as a few buffers, so features are cheap to send between processes,
+    and Features and their properties are built only when asked for.
+    """
+
+    def __init__(self, arrays: dict) -> None:
+        for name, dtype in ARRAYS.items():
+            setattr(self, name, np.asanyarray(arrays[name], dtype=dtype))
+        self.boxes = self.boxes.reshape(-1, 4)
+
+    @classmethod
+    def from_features(cls, features: Union[FeatureCollection, PointArray, Iterable[Feature]]) -> 'FeatureArrays':
+        """Converts features to arrays, see write_features"""
+        return cls(feature_arrays(features))
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(features={len(self)})'
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index: int) -> Feature:
+        if not -len(self) <= index < len(self):
+            raise IndexError('Feature index out of range')
+        index %= len(self)
+        start, stop = self.property_offsets[index:index + 2]
+        properties = loads(self.properties[start:stop].tobytes())
+        return Feature(self._geometry(index), properties)
+
+    def __iter__(self):
+        return self.features()
+
+    def features(self, indices=None):
+        """Yields the features, or the features at the indices, as Feature objects
+
+        Work is done a chunk of features at a time: the properties of a chunk are decoded
+        by one json call and the point coordinates converted in bulk.
+        """
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=np.int64)
+        for start in range(0, len(indices), CHUNK_SIZE):
+            chunk = indices[start:start + CHUNK_SIZE]
+            first, last = int(chunk.min()), int(chunk.max())
+            offsets = self.property_offsets[first:last + 2]
+            blob = self.properties[offsets[0]:offsets[-1]].tobytes()
+            starts = (offsets[chunk - first] - offsets[0]).tolist()
+            stops = (offsets[chunk - first + 1] - offsets[0]).tolist()
+            properties = loads(b'[' + b','.join([blob[a:b] for a, b in zip(starts, stops)]) + b']')
+            vertices = self.part_vertices[self.feature_parts[chunk]]
+            xs, ys = self.x[vertices].tolist(), self.y[vertices].tolist()
+            for i, kind, x, y, row in zip(chunk.tolist(), self.types[chunk].tolist(), xs, ys, properties):
+                yield Feature(Point(x=x, y=y) if kind == POINT else self._geometry(i), row)
+
+    def _geometry(self, index):
+        kind = self.types[index]
+        part_start, part_stop = self.feature_parts[index:index + 2]
+        if kind == POINT:
+            vertex = self.part_vertices[part_start]
+            return Point(x=float(self.x[vertex]), y=float(self.y[vertex]))
+        parts = []
+        for part in range(part_start, part_stop):
+            start, stop = self.part_vertices[part:part + 2]
+            parts.append(np.column_stack((self.x[start:stop], self.y[start:stop])))
+        if kind == LINE_STRING:
+            return LineString(parts)
+        ring_start, ring_stop = self.feature_rings[index:index + 2]
+        polygons, start = [], 0
+        for count in self.rings[ring_start:ring_stop].tolist():
+            polygons.append(parts[start:start + count])
+            start += count
+        return Polygon(polygons)
+
+    @property
+    def bounding_box(self) -> BoundingBox:
+        """Extent of all features"""
+        if not len(self):
+            return BoundingBox()
+        boxes = self.boxes
+        return BoundingBox(x_min=float(boxes[:, 0].min()), x_max=float(boxes[:, 1].max()),
+                           y_min=float(boxes[:, 2].min()), y_max=float(boxes[:, 3].max()))
+
+    def within(self, bounding_box: BoundingBox):
+        """Indices of the features whose bounding boxes intersect bounding_box"""
+        boxes = self.boxes
+        return np.flatnonzero((boxes[:, 0] <= bounding_box.x_max) & (boxes[:, 1] >= bounding_box.x_min)
+                              & (boxes[:, 2] <= bounding_box.y_max) & (boxes[:, 3] >= bounding_box.y_min))
+
+    def to_point_array(self, index: Optional[np.ndarray] = None) -> PointArray:
+        """Returns the point features, or those among the index array, as a PointArray without properties
+
+        When every feature is a point the coordinates are the mapped arrays themselves.
+        """
+        points = np.flatnonzero(self.types == POINT) if index is None else np.asarray(index)[self.types[index] == POINT]
+        if index is None and len(points) == len(self) == len(self.x):
+            return PointArray(self.x, self.y)
+        vertices = self.part_vertices[self.feature_parts[points]]
+        return PointArray(self.x[vertices], self.y[vertices])
+
+    def to_feature_collection(self, bounding_box: Optional[BoundingBox] = None) -> FeatureCollection:
+        """Builds a FeatureCollection of all features, or of those intersecting bounding_box"""
+        return FeatureCollection(list(self.features(None if bounding_box is None else self.within(bounding_box))))
+
+
+class FeatureFile(FeatureArrays):
+    """Features of a quickmap binary feature file, memory mapped read only
+
+    Opening only reads the header, the arrays are views into the mapped file, so pages are
+    read on first use and shared by every process that opens the same file. Features and
+    their properties are built when asked for. Pickling a FeatureFile sends the path only.
+    """
+
+    def __init__(self, path) -> None:
+        self.path = path
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, header_length = _PREAMBLE.unpack(bytes(buffer[:_PREAMBLE.size]))
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a quickmap binary feature file')
+        if version != VERSION:
+            raise ValueError(f'Unsupported binary feature file version {version}')
+        header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+        start = _aligned(_PREAMBLE.size + header_length)
+        arrays = {}
+        for name, dtype in ARRAYS.items():
+            offset, size = header['arrays'][name]
+            dtype = np.dtype(dtype)
+            arrays[name] = buffer[start + offset:start + offset + size * dtype.itemsize].view(dtype)
+        super().__init__(arrays)
+        self._bounding_box = header['bounding_box']
+
+    def __reduce__(self):
+        return self.__class__, (self.path,)
+
+    def __repr__(self):
+        return f'FeatureFile({self.path!r}, features={len(self)})'
+
+    @property
+    def bounding_box(self) -> BoundingBox:
+        """Extent of all features, read from the header"""
+        if self._bounding_box is None:
+            return BoundingBox()
+        x_min, x_max, y_min, y_max = self._bounding_box
+        return BoundingBox(x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max)
+
+
+def open_features(path) -> FeatureFile:
+    """Opens a quickmap binary feature file written by write_features"""
+    return FeatureFile(path)
+
+
+__all__ = ['FeatureArrays', 'FeatureFile', 'write_features', 'open_features']
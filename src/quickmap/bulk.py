@@ -0,0 +1,106 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple, Union
+
+from .binary import FeatureArrays
+from .feature import FeatureCollection
+from .geometry import BoundingBox
+from .io_service import json_backend, loads, set_json_backend
+
+
+@dataclass
+class LoadResult:
+    '''Class for the outcome of loading one GeoJSON file'''
+    path: str
+    features: int = 0
+    seconds: float = 0.0
+    bounding_box: Optional[BoundingBox] = None
+    error: Optional[str] = None
+
+
+def expand_paths(paths: Union[str, os.PathLike, Iterable]) -> List[str]:
+    """Returns the files of a glob pattern, a directory's .geojson files or a list of paths, in sorted order for patterns"""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = str(paths)
+        if os.path.isdir(paths):
+            return sorted(glob.glob(os.path.join(paths, '*.geojson')))
+        if glob.has_magic(paths):
+            return sorted(glob.glob(paths, recursive=True))
+        return [paths]
+    return [str(path) for path in paths]
+
+
+def _load(path, bounding_box=None, where=None, columnar=False):
+    """Parses one file into features, errors are returned in its LoadResult instead of raised
+
+    With columnar the features come back as FeatureArrays, which a worker process sends
+    back as a few buffers instead of pickling every Feature.
+    """
+    start = time.perf_counter()
+    try:
+        with open(path, 'rb') as f:
+            data = loads(f.read())
+        features = FeatureCollection.get_features(data)
+        if bounding_box is not None:
+            features = [feature for feature in features if bounding_box.intersects(feature.bounding_box)]
+        if where is not None:
+            features = [feature for feature in features if where(feature.properties)]
+        count = len(features)
+        if columnar:
+            features = FeatureArrays.from_features(features)
+            extent = features.bounding_box if count else None
+        else:
+            extent = BoundingBox.covering(feature.bounding_box for feature in features) if count else None
+    except Exception as e:
+        return [], LoadResult(path, seconds=time.perf_counter() - start, error=repr(e))
+    return features, LoadResult(path, features=count, seconds=time.perf_counter() - start, bounding_box=extent)
+
+
+def load_many(paths, feature_collection: Optional[FeatureCollection] = None, processes: Optional[int] = None,
+              bounding_box: Optional[BoundingBox] = None, where=None) -> Tuple[FeatureCollection, List[LoadResult]]:
+    """Loads many GeoJSON files into one FeatureCollection, parsing them on a pool of processes
+
+    paths is a list of paths, a glob pattern or a directory of .geojson files. Files are
+    parsed with the fastest installed json backend, see io_service.set_json_backend, and
+    filtered by bounding_box and where, which has to be picklable, e.g. a module level
+    function. Workers send the features of a file back as FeatureArrays and the Features
+    are built from them in bulk here. The features of all files are appended in the order
+    of paths with one extend, growing the extent by the file extents the workers computed.
+    With processes 1 the files are loaded in this process. A file that fails is reported
+    in its LoadResult and the others are still loaded. Returns the collection and a
+    LoadResult per file.
+    """
+    paths = expand_paths(paths)
+    feature_collection = FeatureCollection() if feature_collection is None else feature_collection
+    if processes == 1 or len(paths) <= 1:
+        features, results = _collect(_load(path, bounding_box, where) for path in paths)
+    else:
+        # the workers use the same backend as this process
+        backend = json_backend()
+        processes = processes or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (4 * processes))
+        with ProcessPoolExecutor(max_workers=processes, initializer=set_json_backend, initargs=(backend,)) as executor:
+            features, results = _collect(executor.map(_load, paths, [bounding_box] * len(paths), [where] * len(paths),
+                                                      [True] * len(paths), chunksize=chunksize))
+    # the extents of the files were worked out in the workers
+    extent = BoundingBox.covering(result.bounding_box for result in results if result.bounding_box is not None)
+    feature_collection.extend(features, bounding_box=extent)
+    return feature_collection, results
+
+
+def _collect(loaded):
+    """Gathers the features and LoadResults of _load calls in order
+
+    Features of a file are built as soon as its result arrives, while the workers are
+    still on the next files.
+    """
+    features, results = [], []
+    for loaded_features, result in loaded:
+        features.extend(loaded_features.features() if isinstance(loaded_features, FeatureArrays) else loaded_features)
+        results.append(result)
+    return features, results
+
+__all__ = ['load_many', 'LoadResult']
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+DEFAULT_CACHE_PATH = os.path.join('~', '.cache', 'quickmap', 'tiles.sqlite')
+
+
+@dataclass
+class CachedTile:
+    '''Class for a tile read back from a TileCache'''
+    data: bytes
+    etag: Optional[str] = None
+    stale: bool = False
+
+
+class TileCache:
+    """Persistent tile cache stored in a single SQLite file
+
+    Tiles are keyed by (source, zoom, x, y). The total size of the stored tiles is kept
+    under max_bytes by evicting the least recently used tiles. Tiles older than ttl seconds
+    are reported as stale so they can be revalidated against the source with their etag.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None) -> None:
+        self.path = os.path.expanduser(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS tiles ('
+                'source TEXT, zoom INTEGER, x INTEGER, y INTEGER, data BLOB, etag TEXT, '
+                'fetched REAL, accessed REAL, size INTEGER, PRIMARY KEY (source, zoom, x, y))')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS tiles_accessed ON tiles (accessed)')
+
+    def __repr__(self):
+        return f'TileCache(path={self.path!r}, max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses})'
+
+    def __getstate__(self):
+        # every process opens its own connection to the cache file
+        return {'path': self.path, 'max_bytes': self.max_bytes, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __contains__(self, key):
+        source, tile = key
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT 1 FROM tiles WHERE source = ? AND zoom = ? AND x = ? AND y = ?',
+                (source, tile.zoom, tile.x, tile.y)).fetchone()
+        return row is not None
+
+    def get(self, source: str, tile) -> Optional[CachedTile]:
+        """Returns the cached tile and marks it as recently used, or None on a miss"""
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT data, etag, fetched FROM tiles WHERE source = ? AND zoom = ? AND x = ? AND y = ?',
+                (source, tile.zoom, tile.x, tile.y)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute(
+                'UPDATE tiles SET accessed = ? WHERE source = ? AND zoom = ? AND x = ? AND y = ?',
+                (now, source, tile.zoom, tile.x, tile.y))
+        data, etag, fetched = row
+        stale = self.ttl is not None and now - fetched > self.ttl
+        if stale:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return CachedTile(data=data, etag=etag, stale=stale)
+
+    def put(self, source: str, tile, data: bytes, etag: Optional[str] = None):
+        """Stores a tile and evicts least recently used tiles beyond max_bytes"""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (source, tile.zoom, tile.x, tile.y, data, etag, now, now, len(data)))
+            self._evict()
+
+    def revalidated(self, source: str, tile):
+        """Marks a stale tile as fresh after the source confirmed it did not change"""
+        self.revalidations += 1
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE tiles SET fetched = ? WHERE source = ? AND zoom = ? AND x = ? AND y = ?',
+                (time.time(), source, tile.zoom, tile.x, tile.y))
+
+    @property
+    def size(self):
+        """Total bytes of tile data in the cache"""
+        with self._lock:
+            return self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM tiles').fetchone()[0]
+
+    def _evict(self):
+        total = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM tiles').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._connection.execute('SELECT rowid, size FROM tiles ORDER BY accessed')
+        evicted = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total -= size
+        self._connection.executemany('DELETE FROM tiles WHERE rowid = ?', evicted)
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM tiles')
+
+    def close(self):
+        self._connection.close()
+
+
+__all__ = ['TileCache']
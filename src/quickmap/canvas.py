@@ -1,61 +1,447 @@
-from dataclasses import dataclass
-import importlib
-from typing import Optional
+from __future__ import annotations
 
-from PIL import Image, ImageDraw
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Optional, Union
 
-from .tile import TileCollection
-from .geometry import BoundingBox, Point
+from .binary import POINT, FeatureArrays
+from .cache import TileCache
+from .cluster import ClusterIndex, ClusterStyle
+from .encoders import PNG, Encoder
+from .columnar import PointArray
+from .density import DensityGrid, HeatmapStyle
+from .source import AsyncTileSource, TileSource
+from .symbols import PathStyle, PointStyle, composite, sprite, stamp
+from .meta import TILE_SIZE
+from .tile import Tile, TileCollection
+from .geometry import BoundingBox, PathGeometry, Point, Polygon
 from .feature import Feature, FeatureCollection
+from .lazy import lazy_import
+from .stats import RenderStats
+
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+ImageDraw = lazy_import('PIL.ImageDraw')
+ImageFont = lazy_import('PIL.ImageFont')
+
+
+def _indices_within(source, bounding_box: BoundingBox):
+    """Indices of the features of a FeatureArrays or PointArray intersecting bounding_box"""
+    index = source.within(bounding_box)
+    return np.flatnonzero(index) if index.dtype == bool else index
+
 
 class MapCanvas:
-    def __init__(self, feature_collection: FeatureCollection) -> None:
+
+    SYMBOL_BUFFER = 64
+
+    def __init__(self, feature_collection: Union[FeatureCollection, FeatureArrays, PointArray],
+                 cache: Optional[TileCache] = None, workers: int = 8, source: Optional[TileSource] = None) -> None:
         self._image = None
         self._basemap = None
-        self._tiles = TileCollection()
+        self._tiles = TileCollection(source=source)
         self._feature_collection = feature_collection
+        self.cache = cache
+        self.workers = workers
+        self.style = PointStyle()
+        self.style_function = None
+        self.path_style = PathStyle()
+        self.path_style_function = None
+        self.simplify_tolerance = 0.5
+        self.cluster_style: Optional[ClusterStyle] = None
+        self._cluster_index = None
+        self._cluster_key = None
+        self.heatmap_style: Optional[HeatmapStyle] = None
+        self._density = None
+        self._basemap_key = None
+        self._overlay = None
+        self._overlay_key = None
+        self._overlay_count = 0
+        self._overlay_empty = True
+        self._basemap_blank = False
+        self.stats = RenderStats()
+
+    def stitch_tiles(self, images: Optional[dict] = None):
+        """Composites the basemap, from already decoded {tile: image} images when given instead of fetching
 
-    def stitch_tiles(self):
-        width = self._tiles.x_tiles * 256
-        height = self._tiles.y_tiles * 256
-        self._basemap = Image.new('RGBA', (width, height))
+        Only the part of every tile inside the tile collection's window is composited. The
+        previous basemap is kept. When the window moves or grows at the same zoom the area
+        both windows share is copied over and only the tiles it does not cover are fetched.
+        """
+        key, basemap, missing = self._start_stitch(reuse=images is None)
+        if basemap is None:
+            return
+        if images is not None:
+            tiles = ((tile, images[tile]) for tile in missing if tile in images)
+        else:
+            tiles = self._tiles.fetch_tiles(cache=self.cache, workers=self.workers, tiles=missing, stats=self.stats,
+                                            decode=self._decode_tile)
+        for tile, im in tiles:
+            self._paste_tile(basemap, tile, im)
+        self._basemap = basemap
+        self._basemap_key = key if images is None else None
+        self._basemap_blank = False
 
+    async def stitch_tiles_async(self, source: Optional[AsyncTileSource] = None, timeout: Optional[float] = None):
+        """Coroutine counterpart of stitch_tiles, tiles are fetched concurrently with timeout seconds each
+
+        Decoding and compositing run on the loop's default executor, only the fetches run on the loop.
+        """
+        loop = asyncio.get_running_loop()
+        key, basemap, missing = await loop.run_in_executor(None, self._start_stitch, True)
+        if basemap is None:
+            return
+        async for tile, im in self._tiles.fetch_tiles_async(source=source, cache=self.cache, tiles=missing,
+                                                            stats=self.stats, timeout=timeout, decode=self._decode_tile):
+            await loop.run_in_executor(None, self._paste_tile, basemap, tile, im)
+        self._basemap = basemap
+        self._basemap_key = key
+        self._basemap_blank = False
+
+    def _start_stitch(self, reuse):
+        """Returns the basemap key, a new basemap with what can be reused and the tiles to fetch, or None for the basemap when it is current"""
+        window = self._tiles.pixel_window
+        key = (self._tiles.source.name, self._tiles.zoom) + window
+        if reuse and key == self._basemap_key:
+            return key, None, []
+        basemap = Image.new('RGBA', window[2:])
+        with self.stats.span('stitch'):
+            reused = self._reuse_basemap(basemap, key) if reuse else set()
+        return key, basemap, [tile for tile in self._tiles.tiles if (tile.x, tile.y) not in reused]
+
+    @staticmethod
+    def _decode_tile(f):
+        return Image.open(f).convert('RGBA')
+
+    def _paste_tile(self, basemap, tile, im):
+        """Pastes the part of the tile image inside the window into basemap"""
+        with self.stats.span('stitch'):
+            left, top, _, _ = self._tiles.pixel_window
+            part_left, part_top, part_right, part_bottom = self._tiles.visible_part(tile)
+            tile_left, tile_top = tile.x * TILE_SIZE, tile.y * TILE_SIZE
+            if (part_right - part_left, part_bottom - part_top) != im.size:
+                im = im.crop((part_left - tile_left, part_top - tile_top, part_right - tile_left, part_bottom - tile_top))
+            basemap.paste(im, (part_left - left, part_top - top))
+
+    def _reuse_basemap(self, basemap, key):
+        """Copies the area the previous basemap shares with key into basemap, returns the (x, y) of the tiles it covers"""
+        if self._basemap_key is None or self._basemap_key[:2] != key[:2]:
+            return set()
+        old_left, old_top, old_width, old_height = self._basemap_key[2:]
+        left, top, width, height = key[2:]
+        shared_left, shared_top = max(old_left, left), max(old_top, top)
+        shared_right, shared_bottom = min(old_left + old_width, left + width), min(old_top + old_height, top + height)
+        if shared_left >= shared_right or shared_top >= shared_bottom:
+            return set()
+        region = self._basemap.crop((shared_left - old_left, shared_top - old_top,
+                                     shared_right - old_left, shared_bottom - old_top))
+        basemap.paste(region, (shared_left - left, shared_top - top))
+        reused = set()
         for tile in self._tiles.tiles:
-            im = Image.open(tile.fetch()).convert('RGBA')
-            x = (tile.x - self._tiles.min_x_tile) * 256
-            y = (tile.y - self._tiles.min_y_tile) * 256
-            self._basemap.paste(im, (x, y))
+            part_left, part_top, part_right, part_bottom = self._tiles.visible_part(tile)
+            if (shared_left <= part_left and shared_top <= part_top
+                    and part_right <= shared_right and part_bottom <= shared_bottom):
+                reused.add((tile.x, tile.y))
+        return reused
+
+    def render_tile(self, tile: Tile, basemap: bool = False):
+        """Renders the features on a single tile, returns None when no feature touches it"""
+        if isinstance(self._feature_collection, FeatureCollection):
+            if not self._feature_collection.features_in_tile(tile, buffer=self.SYMBOL_BUFFER):
+                return None
+        elif not len(_indices_within(self._feature_collection, tile.buffered_bounding_box(self.SYMBOL_BUFFER))):
+            return None
+        self._tiles = TileCollection(zoom=tile.zoom, source=self._tiles.source)
+        self._tiles.tiles = [tile]
+        if basemap:
+            self.stitch_tiles()
+        else:
+            self._basemap = Image.new('RGBA', (TILE_SIZE, TILE_SIZE))
+            self._basemap_key = None
+            self._basemap_blank = True
+        self.render()
+        return self._image
 
     def render(self):
-        self._image = self._basemap.copy()
-        self.draw_features()
+        """Composites the feature overlay over the basemap
+
+        The overlay is cached as its own layer. While only features were appended since the
+        last render, just the new features are drawn onto it. FeatureArrays, FeatureFiles and
+        PointArrays are not appended to, they are drawn whole.
+        """
+        source = self._feature_collection
+        arrays = not isinstance(source, FeatureCollection)
+        features = None if arrays else source.features
+        count = len(source) if arrays else len(features)
+        key = (id(source), getattr(source, 'generation', 0), self._basemap.size,
+               self._tiles.zoom, self._tiles.pixel_window, self.style, self.style_function,
+               self.path_style, self.path_style_function, self.simplify_tolerance, self.cluster_style,
+               self.heatmap_style)
+        if self.cluster_style is not None:
+            # an appended point can merge into any cluster, so clusters are always redrawn whole
+            key += (getattr(source, 'version', 0),)
+        if self._overlay is None or key != self._overlay_key or count < self._overlay_count:
+            width, height = self._basemap.size
+            self._overlay = np.zeros((height, width, 4), dtype=np.uint8)
+            self._overlay_key = key
+            self._overlay_count = 0
+            self._overlay_empty = True
+            self._density = None
+        with self.stats.span('draw'):
+            if not self._overlay_count:
+                self.draw_features()
+            elif not arrays:
+                self.draw_features(features[self._overlay_count:])
+            self._overlay_count = count
+            # the basemap is only copied when there is something to composite over it
+            if self._basemap_blank:
+                self._image = Image.frombuffer('RGBA', self._basemap.size, self._overlay, 'raw', 'RGBA', 0, 1)
+            elif self._overlay_empty:
+                self._image = self._basemap
+            else:
+                overlay = Image.frombuffer('RGBA', self._basemap.size, self._overlay, 'raw', 'RGBA', 0, 1)
+                self._image = Image.alpha_composite(self._basemap, overlay)
 
-    def save_png(self, output_path):
+    def to_array(self) -> np.ndarray:
+        """Renders and returns the map as a read only (height, width, 4) RGBA array
+
+        Without a basemap the array is a view of the overlay, otherwise Pillow's frame is
+        copied out once. The array is only valid until the next render.
+        """
+        self.render()
+        if self._basemap_blank:
+            array = self._overlay.view()
+        else:
+            array = np.asarray(self._image)
+        array.flags.writeable = False
+        return array
+
+    def encode(self, fp=None, encoder: Optional[Encoder] = None):
+        """Renders the map and writes it encoded to the file object fp, or returns the bytes when fp is None"""
         self.render()
-        self._image.save(output_path, quality=95)
+        with self.stats.span('encode'):
+            return (encoder or PNG).encode(self._image, fp)
+
+    def save(self, output_path, encoder: Optional[Encoder] = None):
+        """Renders the map to a file, encoded as its extension says unless encoder is given"""
+        encoder = encoder or Encoder.from_name(os.path.splitext(str(output_path))[1] or 'png')
+        with open(output_path, 'wb') as f:
+            self.encode(f, encoder)
+
+    def save_png(self, output_path, encoder: Optional[Encoder] = None):
+        self.save(output_path, encoder or PNG)
 
     def ellipse_from_pixel(self, x, y, px):
         radius = px/2
-        x = x - self._tiles.min_x_tile * 256
-        y = y - self._tiles.min_y_tile * 256
+        x, y = self.translated(x, y)
         xy = [(x - radius, y-radius), (x + radius, y + radius)]
         # translate
         return {'xy': xy, 'fill': 'black', 'outline': 'grey'}
 
     def translated(self, x, y):
-        x = x - self._tiles.min_x_tile * 256
-        y = y - self._tiles.min_y_tile * 256
-        return x, y
+        left, top, _, _ = self._tiles.pixel_window
+        return x - left, y - top
 
-    def draw_features(self):
-        for feature in self._feature_collection.features:
+    def draw_features(self, features=None):
+        """Draws features onto the overlay, all of them when features is None
+
+        All points that share a PointStyle are drawn in one batched pass. With a cluster_style
+        the points are drawn as the clusters of the cluster index at the current zoom instead,
+        with a heatmap_style as a density layer under the lines and polygons.
+        """
+        visible_box = self._tiles.buffered_bounding_box(self.SYMBOL_BUFFER)
+        if not isinstance(self._feature_collection, FeatureCollection):
+            self._draw_arrays()
+            return
+        if self.heatmap_style is not None:
+            self._draw_heatmap_features(features, visible_box)
+            return
+        if features is None:
+            visible = self._feature_collection.features_within(visible_box)
+        else:
+            visible = [feature for feature in features if visible_box.intersects(feature.bounding_box)]
+        self.stats.count(features_drawn=len(visible))
+        if visible:
+            self._overlay_empty = False
+        self.draw_paths([feature for feature in visible if isinstance(feature.geometry, PathGeometry)])
+        if self.cluster_style is not None:
+            if features is None:
+                self.draw_clusters(visible_box)
+            return
+        styles = {}
+        for feature in visible:
             if isinstance(feature.geometry, Point):
-                pixel_x, pixel_y = feature.geometry.pixels(self._tiles.zoom)
-                with importlib.resources.path(__package__+'.icons', 'circle.png') as p:
-                    data_path = p
-                    icon = Image.open(data_path)
-                    self._image.paste(icon, self.translated(pixel_x, pixel_y), icon)
-
-                # d = ImageDraw.Draw(self._image)
-                # self._image.paste(im, (x, y))
-                # d.ellipse(**self.ellipse_from_pixel(pixel_x, pixel_y, 10))
\ No newline at end of file
+                style = self.style_function(feature) if self.style_function else self.style
+                styles.setdefault(style, []).append(feature)
+        for style, features in styles.items():
+            pixels_x, pixels_y = PointArray.from_features(features).pixels(self._tiles.zoom)
+            stamp(self._overlay, *self.translated(pixels_x, pixels_y), sprite(style))
+
+    def _draw_arrays(self):
+        """Draws a FeatureArrays, FeatureFile or PointArray straight from its arrays
+
+        Only the features intersecting the window are read. Points are projected and stamped
+        as arrays, Feature objects are built for lines and polygons alone, so properties are
+        not read and style_function does not apply.
+        """
+        if self.style_function is not None:
+            raise ValueError('style_function needs Feature objects, draw a FeatureCollection instead')
+        source = self._feature_collection
+        buffer = self.SYMBOL_BUFFER
+        if self.heatmap_style is not None:
+            buffer = max(buffer, self.heatmap_style.margin)
+        visible_box = self._tiles.buffered_bounding_box(buffer)
+        index = _indices_within(source, visible_box)
+        points = source.to_point_array(index)
+        paths = list(source.features(index[source.types[index] != POINT])) if isinstance(source, FeatureArrays) else []
+        self.stats.count(features_drawn=len(points) + len(paths))
+        if len(points) or paths:
+            self._overlay_empty = False
+        if self.heatmap_style is not None:
+            weight = self.heatmap_style.weight
+            if weight is not None and weight not in points.properties:
+                raise ValueError(f'The heatmap weight {weight!r} is not a property column of the points')
+            self._draw_density(points, None if weight is None else points.properties[weight].astype(np.float64))
+            self.draw_paths(paths)
+            return
+        self.draw_paths(paths)
+        if self.cluster_style is not None:
+            self.draw_clusters(visible_box)
+        elif len(points):
+            stamp(self._overlay, *self.translated(*points.pixels(self._tiles.zoom)), sprite(self.style))
+
+    @property
+    def cluster_index(self) -> ClusterIndex:
+        """Cluster index over the point features, rebuilt when the collection or the cluster radius changed"""
+        key = (id(self._feature_collection), getattr(self._feature_collection, 'version', 0), self.cluster_style.radius)
+        if self._cluster_index is None or key != self._cluster_key:
+            self._cluster_index = ClusterIndex.from_feature_collection(self._feature_collection,
+                                                                       radius=self.cluster_style.radius)
+            self._cluster_key = key
+        return self._cluster_index
+
+    def draw_clusters(self, bounding_box: BoundingBox):
+        """Draws the point clusters inside bounding_box, one batched pass per symbol size"""
+        clusters = self.cluster_index.clusters(bounding_box, self._tiles.zoom)
+        if not len(clusters):
+            return
+        self._overlay_empty = False
+        counts = clusters.properties['count']
+        pixels_x, pixels_y = self.translated(*clusters.pixels(self._tiles.zoom))
+        styles = {}
+        for i, count in enumerate(counts.tolist()):
+            style = self.style if count == 1 else self.cluster_style.point_style(count)
+            styles.setdefault(style, []).append(i)
+        for style, index in styles.items():
+            stamp(self._overlay, pixels_x[index], pixels_y[index], sprite(style))
+        if self.cluster_style.labels:
+            self._label_clusters(pixels_x, pixels_y, counts)
+
+    def _label_clusters(self, pixels_x, pixels_y, counts):
+        labelled = counts > 1
+        if not labelled.any():
+            return
+        height, width = self._overlay.shape[:2]
+        mask = Image.new('L', (width, height))
+        draw = ImageDraw.Draw(mask)
+        font = ImageFont.load_default(size=max(8, self.cluster_style.min_size // 2))
+        for x, y, count in zip(pixels_x[labelled].tolist(), pixels_y[labelled].tolist(), counts[labelled].tolist()):
+            draw.text((x, y), f'{count:,}' if count < 10000 else f'{count // 1000}k', fill=255, font=font, anchor='mm')
+        layer = np.zeros((height, width, 4), dtype=np.uint8)
+        layer[..., :3] = self.cluster_style.label_color[:3]
+        alpha = self.cluster_style.label_color[3] if len(self.cluster_style.label_color) == 4 else 255
+        layer[..., 3] = (np.asarray(mask, dtype=np.uint16) * alpha // 255).astype(np.uint8)
+        composite(self._overlay, layer)
+
+    def _draw_heatmap_features(self, features, visible_box):
+        if features is not None and not features:
+            return
+        # points are binned in one linear pass, the grid drops those off the map, which is
+        # cheaper than building the spatial index for them
+        candidates = self._feature_collection.features if features is None else features
+        drawn = self.draw_density([feature for feature in candidates if isinstance(feature.geometry, Point)])
+        # the density layer replaced the overlay, so all paths are drawn again over it
+        paths = [feature for feature in self._feature_collection.features
+                 if isinstance(feature.geometry, PathGeometry) and visible_box.intersects(feature.bounding_box)]
+        self.stats.count(features_drawn=drawn + len(paths))
+        if drawn or paths:
+            self._overlay_empty = False
+        self.draw_paths(paths)
+
+    def draw_density(self, features) -> int:
+        """Adds point features to the density grid and replaces the overlay with the colored density
+
+        The grid is kept until the overlay is redrawn whole, so appended points are only binned
+        and the blur and colors run once over the window. Returns the number of points binned.
+        """
+        weights = None
+        if features and self.heatmap_style.weight is not None:
+            weights = [float((feature.properties or {}).get(self.heatmap_style.weight) or 0.0) for feature in features]
+        return self._draw_density(PointArray.from_features(features), weights)
+
+    def _draw_density(self, points: PointArray, weights=None) -> int:
+        style = self.heatmap_style
+        height, width = self._overlay.shape[:2]
+        if self._density is None:
+            self._density = DensityGrid(width, height, style.margin)
+        if len(points):
+            pixels_x, pixels_y = self.translated(*points.pixels(self._tiles.zoom))
+            binned = self._density.add(pixels_x, pixels_y, weights)
+        else:
+            binned = 0
+        self._overlay[:] = self._density.colorize(style)
+        return binned
+
+    def draw_paths(self, features):
+        """Draws line and polygon features from their vertices simplified for the current zoom"""
+        if not features:
+            return
+        origin = np.array(self.translated(0, 0), dtype=np.float64)
+        drawn = []
+        for feature in features:
+            style = self.path_style_function(feature) if self.path_style_function else self.path_style
+            parts = [part + origin for part in feature.geometry.pixel_parts(self._tiles.zoom, self.simplify_tolerance)]
+            drawn.append((feature, style, [part for part in parts if len(part)]))
+        vertices = [part for _, _, parts in drawn for part in parts]
+        if not vertices:
+            return
+        # only the region the paths cover is drawn and composited
+        height, width = self._overlay.shape[:2]
+        margin = max(style.width for _, style, _ in drawn) + 1
+        left, top = np.maximum(np.floor(np.min([part.min(axis=0) for part in vertices], axis=0)) - margin, 0).astype(int)
+        right, bottom = np.minimum(np.ceil(np.max([part.max(axis=0) for part in vertices], axis=0)) + margin, (width, height)).astype(int)
+        if left >= right or top >= bottom:
+            return
+        offset = np.array([left, top], dtype=np.float64)
+        layer = Image.new('RGBA', (right - left, bottom - top))
+        draw = ImageDraw.Draw(layer)
+        for feature, style, parts in drawn:
+            parts = [part - offset for part in parts]
+            if isinstance(feature.geometry, Polygon) and style.fill:
+                for exterior, holes in feature.geometry.polygons(parts):
+                    self._fill_polygon(layer, exterior, holes, style.fill)
+            for part in parts:
+                if len(part) >= 2 and style.width:
+                    draw.line(part.ravel().tolist(), fill=tuple(style.stroke), width=style.width, joint='curve')
+        composite(self._overlay, np.asarray(layer), left, top)
+
+    @staticmethod
+    def _fill_polygon(overlay, exterior, holes, fill):
+        if len(exterior) < 3:
+            return
+        left, top = np.maximum(np.floor(exterior.min(axis=0)), 0).astype(int)
+        right, bottom = np.minimum(np.ceil(exterior.max(axis=0)) + 1, overlay.size).astype(int)
+        if left >= right or top >= bottom:
+            return
+        offset = np.array([left, top])
+        mask = Image.new('L', (right - left, bottom - top))
+        draw = ImageDraw.Draw(mask)
+        draw.polygon((exterior - offset).ravel().tolist(), fill=255)
+        for hole in holes:
+            if len(hole) >= 3:
+                draw.polygon((hole - offset).ravel().tolist(), fill=0)
+        alpha = fill[3] if len(fill) == 4 else 255
+        layer = Image.new('RGBA', mask.size, tuple(fill[:3]) + (0,))
+        layer.putalpha(mask.point(lambda value: value * alpha // 255))
+        overlay.alpha_composite(layer, (int(left), int(top)))
@@ -0,0 +1,116 @@
+import argparse
+import sys
+
+from .cache import DEFAULT_CACHE_PATH, TileCache
+from .geometry import BoundingBox
+from .source import TILE_URL, DirectoryTileSource, MBTilesTileSource, XYZTileSource
+from .tile import TileCollection
+
+
+def tile_source(location: str):
+    """Returns the TileSource for a url template, an .mbtiles file or a tile directory"""
+    if '://' in location:
+        return XYZTileSource(location)
+    if location.endswith('.mbtiles'):
+        return MBTilesTileSource(location)
+    return DirectoryTileSource(location)
+
+
+def serve(args):
+    # the server modules are only imported by the command that needs them
+    from . import server
+    cache = None if args.no_cache else TileCache(args.cache)
+    print(f'serving on http://{args.host}:{args.port}', file=sys.stderr)
+    server.serve(args.host, args.port, source=tile_source(args.tiles), cache=cache, max_tiles=args.max_tiles,
+          workers=args.workers)
+
+
+def zoom_range(text: str):
+    """Parses a zoom range like 3-12, or a single zoom"""
+    low, _, high = text.partition('-')
+    try:
+        low, high = int(low), int(high or low)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Invalid zoom range {text!r}, expected a range like 3-12') from None
+    if not 0 <= low <= high <= TileCollection.MAX_ZOOM:
+        raise argparse.ArgumentTypeError(f'Zooms must be from 0 to {TileCollection.MAX_ZOOM}, low to high')
+    return low, high
+
+
+def bounding_box(text: str):
+    """Parses west,south,east,north into a BoundingBox"""
+    try:
+        west, south, east, north = (float(n) for n in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Invalid bounding box {text!r}, expected west,south,east,north') from None
+    return BoundingBox(x_min=west, x_max=east, y_min=south, y_max=north)
+
+
+def seed(args):
+    from . import seeding
+    extent = seeding.extent_of(args.bbox or args.geojson)
+    min_zoom, max_zoom = args.zoom
+    total = seeding.count_tiles(extent, min_zoom, max_zoom)
+    print(f'{total} tiles from zoom {min_zoom} to {max_zoom}', file=sys.stderr)
+    if args.dry_run:
+        return 0
+
+    def report(progress):
+        remaining = progress.remaining_seconds
+        print(f'{progress.done}/{progress.total} tiles, {progress.fetched} fetched, {progress.skipped} cached, '
+              f'{progress.failed} failed, {progress.tiles_per_second:.1f} tiles/s, '
+              f'{progress.bytes_downloaded / 1e6:.1f} MB' + (f', {remaining:.0f}s left' if remaining else ''),
+              file=sys.stderr)
+
+    cache = TileCache(args.cache, max_bytes=args.max_bytes)
+    try:
+        progress = seeding.seed(extent, min_zoom, max_zoom, cache=cache, source=tile_source(args.tiles),
+                                workers=args.workers, rate=args.rate or None, limit=args.limit, refresh=args.refresh,
+                                progress=report, total=total)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        cache.close()
+    if progress.failed:
+        print(f'{progress.failed} tiles failed, last error: {progress.error}', file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='quickmap')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='run the HTTP render server')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--tiles', default=TILE_URL, help='tile url template, .mbtiles file or tile directory')
+    serve_parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='TileCache file')
+    serve_parser.add_argument('--no-cache', action='store_true')
+    serve_parser.add_argument('--max-tiles', type=int, default=1024, help='decoded tiles kept in memory')
+    serve_parser.add_argument('--workers', type=int, default=8)
+    serve_parser.set_defaults(run=serve)
+
+    seed_parser = commands.add_parser('seed', help='download the tiles of an extent into the tile cache')
+    extent = seed_parser.add_mutually_exclusive_group(required=True)
+    extent.add_argument('--bbox', type=bounding_box, help='west,south,east,north in degrees, as --bbox=-91,39,-89,41')
+    extent.add_argument('--geojson', help='GeoJSON file whose extent is seeded')
+    seed_parser.add_argument('--zoom', type=zoom_range, required=True, help='zoom range, for example 3-12')
+    seed_parser.add_argument('--tiles', required=True,
+                             help='tile url template of a server that allows bulk downloads, tile.openstreetmap.org does not')
+    seed_parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='TileCache file')
+    seed_parser.add_argument('--max-bytes', type=int, default=1024 * 1024 * 1024, help='size of the TileCache')
+    seed_parser.add_argument('--workers', type=int, default=4)
+    seed_parser.add_argument('--rate', type=float, default=10.0, help='tiles per second, 0 for no limit')
+    seed_parser.add_argument('--limit', type=int, default=100_000, help='refuse to seed more tiles than this')
+    seed_parser.add_argument('--refresh', action='store_true', help='download tiles that are already cached')
+    seed_parser.add_argument('--dry-run', action='store_true', help='only print the number of tiles')
+    seed_parser.set_defaults(run=seed)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .columnar import PointArray
+from .geometry import BoundingBox
+from .lazy import lazy_import
+from .meta import TILE_SIZE
+from .simplify import lng_lat_to_pixels
+from .symbols import PointStyle
+
+np = lazy_import('numpy')
+
+
+@dataclass(frozen=True)
+class ClusterStyle:
+    '''Class for how point clusters are drawn
+
+    Points closer than about radius pixels are drawn as one symbol, sized from min_size to
+    max_size by the log of its count and labelled with the count when labels is set.
+    Points that stay alone are drawn with the canvas's point style.
+    '''
+    radius: int = 40
+    symbol: str = 'circle'
+    color: Optional[Tuple[int, ...]] = (200, 60, 40, 220)
+    min_size: int = 18
+    max_size: int = 48
+    labels: bool = True
+    label_color: Tuple[int, ...] = (255, 255, 255, 255)
+
+    def point_style(self, count: int) -> PointStyle:
+        """The PointStyle a cluster of count points is drawn with"""
+        size = min(self.max_size, self.min_size + 4 * int(math.log2(count)))
+        return PointStyle(symbol=self.symbol, size=size, color=self.color)
+
+
+class ClusterIndex:
+    """Hierarchical grid of point clusters for every zoom from min_zoom to max_zoom
+
+    Built once from the points: at max_zoom they are grouped into cells of radius pixels and
+    every zoom below groups the clusters of the zoom above, so each cluster is the count
+    weighted centroid of its children. Every level is sorted by cell column, so a query is
+    a binary search plus a filter over the clusters in the box's columns. Above max_zoom the points
+    themselves are returned.
+    """
+
+    def __init__(self, points: PointArray, radius: int = 40, min_zoom: int = 0, max_zoom: int = 16) -> None:
+        if radius <= 0:
+            raise ValueError('radius must be positive')
+        if not 0 <= min_zoom <= max_zoom:
+            raise ValueError('Zooms must satisfy 0 <= min_zoom <= max_zoom')
+        self.radius = radius
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        # positions are kept in world units, 0 to 1 across the map at any zoom
+        world = lng_lat_to_pixels(np.column_stack((points.x, points.y)), 0) / TILE_SIZE
+        x, y = world[:, 0], world[:, 1]
+        cell = self._cell(max_zoom + 1)
+        order = np.argsort(self._keys(x, y, cell), kind='stable')
+        x, y, count = x[order], y[order], np.ones(len(points), dtype=np.int64)
+        self._levels = {max_zoom + 1: (self._keys(x, y, cell), x, y, count)}
+        for zoom in range(max_zoom, min_zoom - 1, -1):
+            keys, inverse = np.unique(self._keys(x, y, self._cell(zoom)), return_inverse=True)
+            total = np.bincount(inverse, weights=count, minlength=len(keys))
+            x = np.bincount(inverse, weights=x * count, minlength=len(keys)) / total
+            y = np.bincount(inverse, weights=y * count, minlength=len(keys)) / total
+            count = total.astype(np.int64)
+            self._levels[zoom] = (keys, x, y, count)
+
+    def __len__(self):
+        return len(self._levels[self.max_zoom + 1][0])
+
+    @classmethod
+    def from_feature_collection(cls, feature_collection, **options):
+        """Builds the index over the Point features of a FeatureCollection"""
+        return cls(feature_collection.to_point_array(), **options)
+
+    def _cell(self, zoom):
+        return self.radius / (TILE_SIZE * 2 ** zoom)
+
+    @staticmethod
+    def _keys(x, y, cell):
+        # cells are numbered column by column, so the cells of a range of columns are one run of keys
+        return np.floor(x / cell).astype(np.int64) * (int(1.0 / cell) + 2) + np.floor(y / cell).astype(np.int64)
+
+    def clusters(self, bounding_box: BoundingBox, zoom: int) -> PointArray:
+        """Returns the clusters inside bounding_box at zoom as a PointArray with a count property"""
+        zoom = min(max(int(zoom), self.min_zoom), self.max_zoom + 1)
+        keys, x, y, count = self._levels[zoom]
+        if bounding_box.is_empty:
+            return PointArray([], [], {'count': np.empty(0, dtype=np.int64)})
+        (left, bottom), (right, top) = lng_lat_to_pixels(
+            np.array([[bounding_box.x_min, bounding_box.y_min], [bounding_box.x_max, bounding_box.y_max]]), 0) / TILE_SIZE
+        cell = self._cell(zoom)
+        rows = int(1.0 / cell) + 2
+        start = np.searchsorted(keys, math.floor(left / cell) * rows, side='left')
+        stop = np.searchsorted(keys, (math.floor(right / cell) + 1) * rows, side='left')
+        x, y, count = x[start:stop], y[start:stop], count[start:stop]
+        inside = (x >= left) & (x <= right) & (y >= top) & (y <= bottom)
+        x, y = x[inside], y[inside]
+        lng = x * 360.0 - 180.0
+        lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * y))))
+        return PointArray(lng, lat, {'count': count[inside]})
+
+__all__ = ['ClusterIndex', 'ClusterStyle']
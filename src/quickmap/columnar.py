@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import math
+from typing import Iterable, Optional
+
+from .feature import Feature, FeatureCollection
+from .geometry import BoundingBox, Point
+from .io_service import read_geojson
+from .lazy import lazy_import
+from .meta import ORIGIN_SHIFT, resolution
+
+np = lazy_import('numpy')
+
+
+class PointArray:
+    """Columnar storage for point features
+
+    Coordinates are kept in contiguous float64 x (longitude) and y (latitude) arrays and
+    the properties in a table of one array per property name, so projections and bounds
+    run over whole arrays instead of one Point at a time.
+    """
+
+    def __init__(self, x, y, properties: Optional[dict] = None) -> None:
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        if self.x.shape != self.y.shape or self.x.ndim != 1:
+            raise ValueError('x and y must be one dimensional arrays of the same length')
+        self.properties = {name: np.asarray(values) for name, values in (properties or {}).items()}
+        for name, values in self.properties.items():
+            if len(values) != len(self.x):
+                raise ValueError(f'Property {name} must have one value per point')
+
+    def __repr__(self):
+        return f'PointArray(points={len(self)}, properties={list(self.properties)})'
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, index):
+        """Selects points by slice, index array or boolean mask"""
+        return PointArray(
+            self.x[index],
+            self.y[index],
+            {name: values[index] for name, values in self.properties.items()})
+
+    @classmethod
+    def from_features(cls, features: Iterable[Feature]):
+        """Creates a PointArray from point features"""
+        features = list(features)
+        for feature in features:
+            if not isinstance(feature.geometry, Point):
+                raise TypeError(f'PointArray only holds Point geometries, got {feature.geometry}')
+        x = np.fromiter((feature.geometry.x for feature in features), dtype=np.float64, count=len(features))
+        y = np.fromiter((feature.geometry.y for feature in features), dtype=np.float64, count=len(features))
+        return cls(x, y, cls._property_table([feature.properties for feature in features]))
+
+    @classmethod
+    def from_geojson(cls, data):
+        """Creates a PointArray straight from a geojson FeatureCollection without building Feature objects"""
+        data = read_geojson(data)
+        if data.get('type') != 'FeatureCollection':
+            raise ValueError('Data must be a geojson FeatureCollection')
+        features = data['features']
+        for feature in features:
+            if feature['geometry']['type'] != 'Point':
+                raise TypeError(f'PointArray only holds Point geometries, got {feature["geometry"]["type"]}')
+        coordinates = np.array([feature['geometry']['coordinates'][:2] for feature in features], dtype=np.float64).reshape(-1, 2)
+        return cls(coordinates[:, 0], coordinates[:, 1], cls._property_table([feature['properties'] for feature in features]))
+
+    @staticmethod
+    def _property_table(rows):
+        names = {}
+        for row in rows:
+            names.update(dict.fromkeys(row or {}))
+        table = {}
+        for name in names:
+            values = [(row or {}).get(name) for row in rows]
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+                column = column.astype(np.float64)
+            table[name] = column
+        return table
+
+    def features(self):
+        """Yields the points as Feature objects"""
+        columns = {name: values.tolist() for name, values in self.properties.items()}
+        for i, (x, y) in enumerate(zip(self.x.tolist(), self.y.tolist())):
+            yield Feature(Point(x=x, y=y), {name: values[i] for name, values in columns.items()})
+
+    def to_feature_collection(self):
+        return FeatureCollection(list(self.features()))
+
+    @property
+    def web_mercator(self):
+        """Gets the XY meters in Spherical Mercator EPSG:3857 as two arrays"""
+        meter_x = self.x * ORIGIN_SHIFT / 180.0
+        meter_y = np.log(np.tan((90.0 + self.y) * math.pi / 360.0)) / (math.pi / 180.0)
+        meter_y = meter_y * ORIGIN_SHIFT / 180.0
+        return meter_x, meter_y
+
+    def pixels(self, zoom=None):
+        """Gets the pyramid pixels at zoom as two int64 arrays, matching Point.pixels"""
+        meter_x, meter_y = self.web_mercator
+        pixel_x = (meter_x + ORIGIN_SHIFT) / resolution(zoom=zoom)
+        pixel_y = (meter_y - ORIGIN_SHIFT) / resolution(zoom=zoom)
+        return np.abs(np.rint(pixel_x)).astype(np.int64), np.abs(np.rint(pixel_y)).astype(np.int64)
+
+    @property
+    def bounding_box(self) -> BoundingBox:
+        if not len(self):
+            return BoundingBox()
+        return BoundingBox(
+            x_min=float(self.x.min()),
+            x_max=float(self.x.max()),
+            y_min=float(self.y.min()),
+            y_max=float(self.y.max())
+        )
+
+    def within(self, bounding_box: BoundingBox):
+        """Boolean mask of the points inside bounding_box"""
+        return ((self.x >= bounding_box.x_min) & (self.x <= bounding_box.x_max)
+                & (self.y >= bounding_box.y_min) & (self.y <= bounding_box.y_max))
+
+    def to_point_array(self, index=None) -> 'PointArray':
+        """Returns the points, or those selected by index, matching FeatureArrays.to_point_array"""
+        return self if index is None else self[index]
+
+
+__all__ = ['PointArray']
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+
+HEAT = ((0, 0, 255, 0), (0, 255, 255, 140), (0, 255, 0, 180), (255, 255, 0, 210), (255, 0, 0, 240))
+
+
+@dataclass(frozen=True)
+class HeatmapStyle:
+    '''Class for how point density is drawn
+
+    Point counts per pixel, or the sums of the weight property, are blurred with a
+    Gaussian of sigma pixels and mapped through colors, evenly spaced RGBA stops from no
+    density to max_value. Without max_value the densest pixel of the map gets the last color.
+    '''
+    sigma: float = 8.0
+    colors: Tuple[Tuple[int, int, int, int], ...] = HEAT
+    max_value: Optional[float] = None
+    weight: Optional[str] = None
+
+    def __post_init__(self):
+        if self.sigma < 0:
+            raise ValueError('sigma must not be negative')
+        if len(self.colors) < 2:
+            raise ValueError('A heatmap needs at least two colors')
+
+    @property
+    def margin(self) -> int:
+        """Pixels around the map whose points still blur into it"""
+        return math.ceil(3 * self.sigma)
+
+
+def gaussian_kernel(sigma: float) -> np.ndarray:
+    """Normalized 1D Gaussian kernel reaching 3 sigma to either side"""
+    radius = math.ceil(3 * sigma)
+    offsets = np.arange(-radius, radius + 1, dtype=np.float64)
+    kernel = np.exp(-offsets ** 2 / (2 * sigma ** 2))
+    return kernel / kernel.sum()
+
+
+def blur(values: np.ndarray, sigma: float) -> np.ndarray:
+    """Gaussian blur of a 2D float array, separable so it runs as one pass per axis
+
+    Each pass sums shifted slices of the padded array, which stays vectorized over all
+    pixels at once. Values beyond the edges count as zero.
+    """
+    if not sigma:
+        return values
+    kernel = gaussian_kernel(sigma)
+    radius = len(kernel) // 2
+    height, width = values.shape
+    padded = np.pad(values, ((0, 0), (radius, radius)))
+    rows = np.zeros_like(values)
+    for i, weight in enumerate(kernel):
+        rows += weight * padded[:, i:i + width]
+    padded = np.pad(rows, ((radius, radius), (0, 0)))
+    result = np.zeros_like(values)
+    for i, weight in enumerate(kernel):
+        result += weight * padded[i:i + height]
+    return result
+
+
+def color_table(colors) -> np.ndarray:
+    """Returns a (256, 4) uint8 lookup table interpolating the RGBA stops"""
+    stops = np.asarray(colors, dtype=np.float64)
+    positions = np.linspace(0.0, 1.0, len(stops))
+    levels = np.linspace(0.0, 1.0, 256)
+    table = np.column_stack([np.interp(levels, positions, stops[:, channel]) for channel in range(4)])
+    return np.rint(table).astype(np.uint8)
+
+
+class DensityGrid:
+    """2D histogram of points over a pixel window, kept between renders so new points are just added
+
+    The grid reaches margin pixels beyond the window on every side, so points just off the
+    map still blur into its edges.
+    """
+
+    def __init__(self, width: int, height: int, margin: int = 0) -> None:
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.counts = np.zeros((height + 2 * margin, width + 2 * margin), dtype=np.float64)
+        self.points = 0
+
+    def add(self, xs: np.ndarray, ys: np.ndarray, weights: Optional[np.ndarray] = None) -> int:
+        """Bins points at window pixels (xs, ys) into the grid, returns the number that landed on it"""
+        grid_height, grid_width = self.counts.shape
+        xs = np.asarray(xs, dtype=np.int64) + self.margin
+        ys = np.asarray(ys, dtype=np.int64) + self.margin
+        inside = (xs >= 0) & (xs < grid_width) & (ys >= 0) & (ys < grid_height)
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)[inside]
+        cells = ys[inside] * grid_width + xs[inside]
+        self.counts += np.bincount(cells, weights=weights, minlength=self.counts.size).reshape(self.counts.shape)
+        self.points += int(inside.sum())
+        return int(inside.sum())
+
+    def density(self, sigma: float) -> np.ndarray:
+        """The blurred grid cut to the window"""
+        margin = self.margin
+        return blur(self.counts, sigma)[margin:margin + self.height, margin:margin + self.width]
+
+    def colorize(self, style: HeatmapStyle) -> np.ndarray:
+        """Returns the density as a (height, width, 4) RGBA array through the style's colors"""
+        density = self.density(style.sigma)
+        top = style.max_value or float(density.max())
+        if top <= 0:
+            return np.zeros(density.shape + (4,), dtype=np.uint8)
+        levels = np.rint(np.clip(density / top, 0.0, 1.0) * 255).astype(np.uint8)
+        frame = color_table(style.colors)[levels]
+        # pixels without density stay fully transparent whatever the first color is
+        frame[levels == 0] = 0
+        return frame
+
+
+__all__ = ['HeatmapStyle', 'DensityGrid']
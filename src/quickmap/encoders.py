@@ -0,0 +1,73 @@
+import io
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .lazy import lazy_import
+
+Image = lazy_import('PIL.Image')
+
+FORMATS = {'png': 'image/png', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+@dataclass(frozen=True)
+class Encoder:
+    '''Class for how a rendered map is encoded
+
+    PNG is lossless, a lower compress_level encodes faster into larger files and colors
+    quantizes to a palette of that many colors first. JPEG drops transparency by flattening
+    the map onto background. WebP uses quality unless lossless is set, method trades encode
+    time for size from 0 to 6.
+    '''
+    format: str = 'png'
+    compress_level: int = 6
+    colors: Optional[int] = None
+    quality: int = 85
+    lossless: bool = False
+    method: int = 4
+    background: Tuple[int, int, int] = (255, 255, 255)
+
+    def __post_init__(self):
+        if self.format not in FORMATS:
+            raise ValueError(f'Format must be one of {", ".join(FORMATS)}, not {self.format!r}')
+        if self.colors is not None and not 2 <= self.colors <= 256:
+            raise ValueError('A palette has between 2 and 256 colors')
+
+    @classmethod
+    def from_name(cls, name: str, **options):
+        """Returns the encoder for png, png8, jpeg, jpg or webp with options overriding its defaults"""
+        name = name.lower().lstrip('.')
+        if name == 'png8':
+            return cls(format='png', colors=256, **options)
+        return cls(format='jpeg' if name == 'jpg' else name, **options)
+
+    @property
+    def content_type(self) -> str:
+        return FORMATS[self.format]
+
+    def encode(self, image, fp=None):
+        """Writes image to the file object fp, or returns it as bytes when fp is None"""
+        if fp is None:
+            buffer = io.BytesIO()
+            self.encode(image, buffer)
+            return buffer.getvalue()
+        if self.format == 'png':
+            if self.colors:
+                image = image.quantize(self.colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+            image.save(fp, format='PNG', compress_level=self.compress_level)
+        elif self.format == 'jpeg':
+            if image.mode == 'RGBA':
+                flattened = Image.new('RGB', image.size, self.background)
+                flattened.paste(image, mask=image.getchannel('A'))
+                image = flattened
+            image.save(fp, format='JPEG', quality=self.quality)
+        else:
+            image.save(fp, format='WEBP', quality=self.quality, lossless=self.lossless, method=self.method)
+
+
+PNG = Encoder()
+PNG8 = Encoder(colors=256)
+JPEG = Encoder(format='jpeg')
+WEBP = Encoder(format='webp')
+
+
+__all__ = ['Encoder', 'PNG', 'PNG8', 'JPEG', 'WEBP']
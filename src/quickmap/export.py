@@ -0,0 +1,155 @@
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from .binary import FeatureArrays
+from .canvas import MapCanvas, _indices_within
+from .columnar import PointArray
+from .encoders import PNG
+from .feature import FeatureCollection
+from .source import TileSource
+from .symbols import PointStyle
+from .tile import Tile
+
+BATCH_SIZE = 256
+
+
+@dataclass
+class ExportResult:
+    '''Class for the tile counts of an export'''
+    written: int = 0
+    empty: int = 0
+    existing: int = 0
+
+
+class DirectoryTileWriter:
+    """Writes tiles to a {zoom}/{x}/{y}.png directory tree"""
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.expanduser(path)
+
+    def tile_path(self, tile: Tile):
+        return os.path.join(self.path, str(tile.zoom), str(tile.x), f'{tile.y}.png')
+
+    def __contains__(self, tile: Tile):
+        return os.path.exists(self.tile_path(tile))
+
+    def write(self, tile: Tile, data: bytes):
+        path = self.tile_path(tile)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write under a temporary name so an interrupted export never leaves a truncated tile behind
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        pass
+
+
+class MBTilesTileWriter:
+    """Writes tiles to an MBTiles SQLite file"""
+
+    def __init__(self, path: str, name: str = 'quickmap') -> None:
+        self.path = os.path.expanduser(path)
+        self._connection = sqlite3.connect(self.path)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB, '
+                'PRIMARY KEY (zoom_level, tile_column, tile_row))')
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO metadata VALUES (?, ?)', [('name', name), ('format', 'png'), ('type', 'overlay')])
+
+    def __contains__(self, tile: Tile):
+        row = self._connection.execute(
+            'SELECT 1 FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+            (tile.zoom, tile.x, 2 ** tile.zoom - 1 - tile.y)).fetchone()
+        return row is not None
+
+    def write(self, tile: Tile, data: bytes):
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)', (tile.zoom, tile.x, 2 ** tile.zoom - 1 - tile.y, data))
+
+    def close(self):
+        self._connection.close()
+
+
+_canvas = None
+
+def _init_worker(feature_collection, style, source):
+    global _canvas
+    _canvas = MapCanvas(feature_collection, workers=1, source=source)
+    _canvas.style = style
+
+def _render_tile(tile, basemap):
+    image = _canvas.render_tile(tile, basemap=basemap)
+    if image is None:
+        return tile, None
+    return tile, PNG.encode(image)
+
+
+def occupied_tiles(feature_collection: Union[FeatureCollection, FeatureArrays, PointArray], max_zoom: int, buffer: int = MapCanvas.SYMBOL_BUFFER):
+    """Walks the tile pyramid top down, yielding (zoom, [(tile, has features), ...]) for every zoom to max_zoom
+
+    Only the children of tiles with features are visited, a child's buffered area lies
+    inside its parent's, so the work follows the tiles holding data rather than the area of
+    the features' bounding box.
+    """
+    if isinstance(feature_collection, FeatureCollection):
+        count = len(feature_collection.features)
+        occupied = lambda tile: bool(feature_collection.features_in_tile(tile, buffer=buffer))
+    else:
+        count = len(feature_collection)
+        occupied = lambda tile: bool(len(_indices_within(feature_collection, tile.buffered_bounding_box(buffer))))
+    tiles = [Tile(0, 0, 0)] if count else []
+    for zoom in range(max_zoom + 1):
+        checked = [(tile, occupied(tile)) for tile in tiles]
+        yield zoom, checked
+        tiles = [child for tile, occupied in checked if occupied for child in tile.children]
+
+
+def export_tiles(feature_collection: Union[FeatureCollection, FeatureArrays, PointArray], output: str, min_zoom: int, max_zoom: int,
+                 basemap: bool = False, source: Optional[TileSource] = None, style: PointStyle = PointStyle(),
+                 processes: Optional[int] = None) -> ExportResult:
+    """Renders the features into a tile pyramid from min_zoom to max_zoom
+
+    output is a directory for a {zoom}/{x}/{y}.png tree, or a path ending in .mbtiles.
+    Tiles are rendered on a pool of processes, tiles without features are skipped and tiles
+    already in the output are kept, so an interrupted export picks up where it stopped.
+    """
+    if output.endswith('.mbtiles'):
+        writer = MBTilesTileWriter(output)
+    else:
+        writer = DirectoryTileWriter(output)
+    result = ExportResult()
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(feature_collection, style, source)) as executor:
+            for zoom, tiles in occupied_tiles(feature_collection, max_zoom):
+                if zoom < min_zoom:
+                    continue
+                pending = []
+                for tile, occupied in tiles:
+                    if not occupied:
+                        result.empty += 1
+                    elif tile in writer:
+                        result.existing += 1
+                    else:
+                        pending.append(tile)
+                for start in range(0, len(pending), BATCH_SIZE):
+                    batch = pending[start:start + BATCH_SIZE]
+                    for tile, data in executor.map(_render_tile, batch, [basemap] * len(batch), chunksize=8):
+                        if data is None:
+                            result.empty += 1
+                            continue
+                        writer.write(tile, data)
+                        result.written += 1
+    finally:
+        writer.close()
+    return result
+
+
+__all__ = ['export_tiles', 'ExportResult']
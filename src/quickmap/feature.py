@@ -1,22 +1,19 @@
 from typing import Union, Optional
 
-from .geometry import Point, Polygon, BoundingBox
-from .io_service import read_geojson
+from .geometry import Point, LineString, Polygon, BoundingBox
+from .index import QuadTree
+from .io_service import iter_geojson
 
 class Feature:
-    supported_geometry_types = ['Point']
+    supported_geometry_types = ['Point', 'LineString', 'MultiLineString', 'Polygon', 'MultiPolygon']
     unsupported_geometry_types = [
         "MultiPoint",
-        "LineString",
-        "MultiLineString",
-        "Polygon",
-        "MultiPolygon",
         "GeometryCollection"]
 
     # default_gcs = "epsg:4326"
     # default_projection = "epsg:3857"
 
-    def __init__(self, geometry: Union[Point, Polygon] = None, properties: dict = None):
+    def __init__(self, geometry: Union[Point, LineString, Polygon] = None, properties: dict = None):
         self.properties = properties
         self.geometry = geometry
 
@@ -38,18 +35,14 @@ class Feature:
         geometry = cls.geom_loader(geometry_dict)
         return cls(geometry, properties = {})
 
-    # def multipolygon_loader(self, coords):
-    #     polygons = []
-    #     for polygon in coords:
-    #         _polygon = Polygon(polygon[0], self.projection)
-    #         _polygon.holes = [Polygon(hole, self.projection) for hole in polygon[1:]]
-    #         polygons.append(_polygon)
-    #     return polygons
-
     @staticmethod
     def geom_loader(geometry_dict):
         if geometry_dict['type'] == 'Point':
             return Point.from_geometry_dict(geometry_dict)
+        if geometry_dict['type'] in ('LineString', 'MultiLineString'):
+            return LineString.from_geometry_dict(geometry_dict)
+        if geometry_dict['type'] in ('Polygon', 'MultiPolygon'):
+            return Polygon.from_geometry_dict(geometry_dict)
         raise TypeError(f'Unsuported geometry type: {geometry_dict["type"]}')
 
     @property
@@ -60,25 +53,129 @@ class Feature:
 class FeatureCollection(Feature):
 
     def __init__(self, features: Optional[list[Feature]] = None):
+        self.version = 0
+        self.generation = 0
         if features:
             self.features = features
         else:
             self.features = []
 
-    # def load_features(self, data):
-    #     """Load features from geojson data"""
-    #     features = FeatureCollection.get_features(read_geojson(data))
-    #     self.features.append(features)
+    def __getstate__(self):
+        # the spatial index is cheaper to rebuild than to pickle
+        state = self.__dict__.copy()
+        state['_index'] = None
+        return state
+
+    @property
+    def features(self) -> list[Feature]:
+        """The features of the collection. Change them through add, extend and remove so the extent stays current"""
+        return self._features
+
+    @features.setter
+    def features(self, value: list[Feature]):
+        self._features = value
+        self._extent = None if value else BoundingBox()
+        self._extent_count = 0
+        self._index = None
+        self.version += 1
+        self.generation += 1
+
+    # version counts every change, generation only changes that are not appends, so
+    # something drawn from the first n features stays valid while generation is unchanged
+
+    def add(self, feature: Feature):
+        self.extend([feature])
+
+    def extend(self, features, bounding_box: Optional[BoundingBox] = None):
+        """Appends features and grows the extent by their bounding boxes, returns the number added
+
+        bounding_box is the extent of features when the caller already knows it.
+        """
+        features = list(features)
+        if not features:
+            return 0
+        batch = bounding_box if bounding_box is not None else BoundingBox.covering(n.bounding_box for n in features)
+        start = len(self._features)
+        self._features.extend(features)
+        if self._index is not None and len(self._index) == start:
+            self._index.extend((start + i, n.bounding_box) for i, n in enumerate(features))
+        if self._extent is not None and self._extent_count + len(features) == len(self._features):
+            self._extent = self._extent.union(batch)
+            self._extent_count = len(self._features)
+        self.version += 1
+        return len(features)
+
+    def remove(self, feature: Feature):
+        self._features.remove(feature)
+        # a feature on the edge of the extent may have been holding it open, recompute on next access
+        self._extent = None
+        self._index = None
+        self.version += 1
+        self.generation += 1
+
+    def clear(self):
+        self.features = []
+
+    @property
+    def index(self) -> QuadTree:
+        """Spatial index of the features by position in the collection, built on first use and kept current by extend"""
+        if self._index is None or len(self._index) != len(self._features):
+            self._index = QuadTree()
+            self._index.extend((i, n.bounding_box) for i, n in enumerate(self._features))
+        return self._index
+
+    def features_within(self, bounding_box: BoundingBox) -> list[Feature]:
+        """Returns the features intersecting bounding_box in collection order"""
+        return [self._features[i] for i in sorted(self.index.query(bounding_box))]
+
+    def features_in_tile(self, tile, buffer: int = 0) -> list[Feature]:
+        """Returns the features touching tile, or within buffer pixels of it"""
+        return self.features_within(tile.buffered_bounding_box(buffer))
+
+    def load_geojson(self, data, bounding_box: Optional[BoundingBox] = None, where=None):
+        """Load features from geojson data, streaming them from files and file objects"""
+        features = FeatureCollection.iter_geojson(data, bounding_box=bounding_box, where=where)
+        return self.extend(features)
+
+    @staticmethod
+    def iter_geojson(data, bounding_box: Optional[BoundingBox] = None, where=None):
+        """Yields Features from geojson data as it is parsed
+
+        Only features intersecting bounding_box and, when where is given, features for which
+        where(properties) is true are yielded.
+        """
+        for item in iter_geojson(data):
+            for feature in FeatureCollection.get_features(item):
+                if bounding_box is not None and not bounding_box.intersects(feature.bounding_box):
+                    continue
+                if where is not None and not where(feature.properties):
+                    continue
+                yield feature
+
+    @classmethod
+    def from_point_array(cls, points):
+        """Creates a FeatureCollection from a PointArray"""
+        return cls(list(points.features()))
+
+    def to_point_array(self):
+        """Returns the point features as a columnar PointArray"""
+        from .columnar import PointArray
+        return PointArray.from_features(n for n in self.features if isinstance(n.geometry, Point))
+
+    @classmethod
+    def from_binary(cls, path, bounding_box: Optional[BoundingBox] = None):
+        """Loads the features, or those intersecting bounding_box, from a binary feature file written by to_binary
 
-    def load_geojson(self, data):
-        """Load features from geojson data"""
-        features = FeatureCollection.get_features(read_geojson(data))
-        self.features.extend(features)
+        This builds every Feature. To render a file pass FeatureFile(path) to QuickMap
+        instead, which draws from the mapped arrays.
+        """
+        from .binary import FeatureFile
+        return FeatureFile(path).to_feature_collection(bounding_box)
 
-    # @staticmethod
-    # def load_geosjon(data):
-    #     """Load features from geojson data"""
-    #     return FeatureCollection.get_features(read_geojson(data))
+    def to_binary(self, path):
+        """Writes the features to path in the binary feature format, see quickmap.binary"""
+        from .binary import write_features
+        return write_features(self, path)
 
     @staticmethod
     def get_features(data):
@@ -95,14 +192,11 @@ class FeatureCollection(Feature):
 
     @property
     def bounding_box(self): #TODO Naive bb that does not factor in the antimeridian. Replace.
-        _bounding_boxes =  [n.bounding_box for n in self.features]
-        if not _bounding_boxes:
-            print('empty list')
-            return BoundingBox()
-        x_min = min([n.x_min for n in _bounding_boxes])
-        x_max = max([n.x_max for n in _bounding_boxes])
-        y_min = min([n.y_min for n in _bounding_boxes])
-        y_max = max([n.y_max for n in _bounding_boxes])
-        return BoundingBox(x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max)
+        """Extent of the features, kept up to date by extend and only recomputed after removals"""
+        if self._extent is None or self._extent_count != len(self._features):
+            self._extent = BoundingBox.covering(n.bounding_box for n in self._features)
+            self._extent_count = len(self._features)
+        return BoundingBox(x_min=self._extent.x_min, x_max=self._extent.x_max,
+                           y_min=self._extent.y_min, y_max=self._extent.y_max)
 
 __all__ = ['Feature', 'FeatureCollection']
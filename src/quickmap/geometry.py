@@ -3,9 +3,11 @@ from dataclasses import dataclass
 from typing import Optional
 from collections import namedtuple
 
+from .lazy import lazy_import
 from .meta import resolution, ORIGIN_SHIFT, TILE_SIZE
+from .simplify import lng_lat_to_pixels, simplify
 
-from pyproj import Transformer
+np = lazy_import('numpy')
 
 # BasePoint = namedtuple('BasePoint', 'latitude longitude')
 
@@ -19,9 +21,9 @@ class BasePoint:
 class BoundingBox:
     '''Class for min max of Geometry, Feature, or FeatureCollection'''
     x_min: Optional[float] = sys.float_info.max
-    x_max: Optional[float] = sys.float_info.min
+    x_max: Optional[float] = -sys.float_info.max
     y_min: Optional[float] = sys.float_info.max
-    y_max: Optional[float] = sys.float_info.min
+    y_max: Optional[float] = -sys.float_info.max
 
     def __eq__(self, other): 
         if not isinstance(other, BoundingBox):
@@ -30,14 +32,58 @@ class BoundingBox:
 
         return self.x_min == other.x_min and self.x_max == other.x_max and self.y_min == other.y_min and self.y_max == other.y_max
 
+    @property
+    def is_empty(self) -> bool:
+        return self.x_min > self.x_max or self.y_min > self.y_max
+
+    def union(self, other):
+        return BoundingBox.covering([self, other])
+
+    @classmethod
+    def covering(cls, boxes):
+        """Returns the BoundingBox covering all boxes, empty when there are none"""
+        x_min = y_min = sys.float_info.max
+        x_max = y_max = -sys.float_info.max
+        for box in boxes:
+            x_min = min(x_min, box.x_min)
+            x_max = max(x_max, box.x_max)
+            y_min = min(y_min, box.y_min)
+            y_max = max(y_max, box.y_max)
+        return cls(x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max)
+
+    def intersects(self, other) -> bool:
+        return (self.x_min <= other.x_max and other.x_min <= self.x_max
+                and self.y_min <= other.y_max and other.y_min <= self.y_max)
+
     def as_points(self):
         points = [(self.x_min, self.y_min), (self.x_min, self.y_max), (self.x_max, self.y_max), (self.x_max, self.y_min)]
         return [BasePoint(x=xy[0], y=xy[1]) for xy in set([(self.x_min, self.y_min), (self.x_min, self.y_max), (self.x_max, self.y_max), (self.x_max, self.y_min)])]
 
+class _LazyTransformer:
+    """Creates the pyproj Transformer on first access, so pyproj is only needed by code that uses it"""
+
+    def __init__(self, source_crs, target_crs) -> None:
+        self.source_crs = source_crs
+        self.target_crs = target_crs
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, instance, owner):
+        try:
+            from pyproj import Transformer
+        except ImportError as e:
+            raise ImportError(f'{self.owner.__name__}.{self.name} needs pyproj, install it with: pip install pyproj') from e
+        transformer = Transformer.from_crs(self.source_crs, self.target_crs, always_xy=True)
+        setattr(self.owner, self.name, transformer)
+        return transformer
+
+
 class Point(BasePoint):
     """Immutable Point class"""
 
-    TRAN_4326_TO_3857 = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
+    TRAN_4326_TO_3857 = _LazyTransformer("EPSG:4326", "EPSG:3857")
     
     @classmethod
     def from_geometry_dict(cls, geometry_dict):
@@ -125,10 +171,81 @@ class Point(BasePoint):
             meter_y *= -1
         return meter_x, meter_y
 
-class Polygon:
-    
-    def __init__(self) -> None:
-        self.bounding_box = BoundingBox()
+class PathGeometry:
+    """Base class for geometries made of vertex arrays
+
+    parts holds one (n, 2) float64 lng/lat array per line or ring. The bounding box is
+    worked out once, and projected and simplified pixel parts are cached per zoom, so
+    drawing the same zoom again skips that work.
+    """
+
+    def __init__(self, parts) -> None:
+        self.parts = [np.asarray(part, dtype=np.float64).reshape(-1, 2) for part in parts]
+        self._pixel_parts = {}
+        vertices = np.concatenate(self.parts) if self.parts else np.empty((0, 2))
+        if len(vertices):
+            x_min, y_min = vertices.min(axis=0)
+            x_max, y_max = vertices.max(axis=0)
+            self._bounding_box = BoundingBox(x_min=float(x_min), x_max=float(x_max), y_min=float(y_min),
+                                             y_max=float(y_max))
+        else:
+            self._bounding_box = BoundingBox()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(parts={len(self.parts)}, vertices={sum(len(n) for n in self.parts)})'
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pixel_parts'] = {}
+        return state
+
+    @property
+    def bounding_box(self) -> BoundingBox:
+        return self._bounding_box
+
+    def pixel_parts(self, zoom, tolerance=0.5):
+        """Gets the parts as pyramid pixels at zoom, simplified to tolerance pixels"""
+        key = (zoom, tolerance)
+        if key not in self._pixel_parts:
+            self._pixel_parts[key] = [simplify(lng_lat_to_pixels(part, zoom), tolerance) for part in self.parts]
+        return self._pixel_parts[key]
+
+
+class LineString(PathGeometry):
+    """Line geometry, a MultiLineString loads as a LineString with several parts"""
+
+    @classmethod
+    def from_geometry_dict(cls, geometry_dict):
+        if geometry_dict['type'] == 'MultiLineString':
+            return cls(geometry_dict['coordinates'])
+        return cls([geometry_dict['coordinates']])
+
+
+class Polygon(PathGeometry):
+    """Polygon geometry, a MultiPolygon loads as a Polygon with several polygons
+
+    rings holds, per polygon, the number of parts that belong to it: the exterior ring
+    followed by its holes.
+    """
+
+    def __init__(self, polygons=()) -> None:
+        polygons = [list(polygon) for polygon in polygons]
+        super().__init__([ring for polygon in polygons for ring in polygon])
+        self.rings = [len(polygon) for polygon in polygons]
+
+    @classmethod
+    def from_geometry_dict(cls, geometry_dict):
+        if geometry_dict['type'] == 'MultiPolygon':
+            return cls(geometry_dict['coordinates'])
+        return cls([geometry_dict['coordinates']])
+
+    def polygons(self, parts=None):
+        """Groups parts, or the given per part arrays, into (exterior, holes) per polygon"""
+        parts = self.parts if parts is None else parts
+        start = 0
+        for count in self.rings:
+            yield parts[start], parts[start + 1:start + count]
+            start += count
 
 
-__all__ = ['Point', 'Polygon', 'BoundingBox']
+__all__ = ['Point', 'LineString', 'Polygon', 'BoundingBox']
@@ -0,0 +1,96 @@
+from typing import Iterable, List, Optional
+
+from .geometry import BoundingBox
+
+WORLD = BoundingBox(x_min=-180.0, x_max=180.0, y_min=-90.0, y_max=90.0)
+
+
+class QuadTree:
+    """Quadtree over lng/lat bounding boxes
+
+    Each item is stored in the deepest node whose quadrant fully contains its box, so
+    points end up in leaves and large geometries higher up. Items can be inserted at any
+    time and query only visits the nodes that intersect the searched box.
+    """
+
+    MAX_ITEMS = 16
+    MAX_DEPTH = 18
+
+    def __init__(self, bounding_box: BoundingBox = WORLD, depth: int = 0) -> None:
+        self.box = (bounding_box.x_min, bounding_box.x_max, bounding_box.y_min, bounding_box.y_max)
+        self.depth = depth
+        self.items = []
+        self.children: Optional[List['QuadTree']] = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, item, bounding_box: BoundingBox):
+        box = (bounding_box.x_min, bounding_box.x_max, bounding_box.y_min, bounding_box.y_max)
+        self.size += 1
+        node = self
+        while True:
+            if node.children is None:
+                node.items.append((box, item))
+                if len(node.items) > self.MAX_ITEMS and node.depth < self.MAX_DEPTH:
+                    node._split()
+                return
+            child = node._child_containing(box)
+            if child is None:
+                node.items.append((box, item))
+                return
+            node = child
+
+    def extend(self, items: Iterable):
+        """Inserts (item, bounding_box) pairs"""
+        for item, bounding_box in items:
+            self.insert(item, bounding_box)
+
+    def query(self, bounding_box: BoundingBox) -> list:
+        """Returns the items whose box intersects bounding_box"""
+        x_min, x_max, y_min, y_max = bounding_box.x_min, bounding_box.x_max, bounding_box.y_min, bounding_box.y_max
+        found = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for (item_x_min, item_x_max, item_y_min, item_y_max), item in node.items:
+                if item_x_min <= x_max and x_min <= item_x_max and item_y_min <= y_max and y_min <= item_y_max:
+                    found.append(item)
+            if node.children:
+                for child in node.children:
+                    child_x_min, child_x_max, child_y_min, child_y_max = child.box
+                    if child_x_min <= x_max and x_min <= child_x_max and child_y_min <= y_max and y_min <= child_y_max:
+                        stack.append(child)
+        return found
+
+    def _split(self):
+        x_min, x_max, y_min, y_max = self.box
+        x_mid, y_mid = (x_min + x_max) / 2.0, (y_min + y_max) / 2.0
+        self.children = [
+            QuadTree(BoundingBox(x_min=x_min, x_max=x_mid, y_min=y_min, y_max=y_mid), self.depth + 1),
+            QuadTree(BoundingBox(x_min=x_mid, x_max=x_max, y_min=y_min, y_max=y_mid), self.depth + 1),
+            QuadTree(BoundingBox(x_min=x_min, x_max=x_mid, y_min=y_mid, y_max=y_max), self.depth + 1),
+            QuadTree(BoundingBox(x_min=x_mid, x_max=x_max, y_min=y_mid, y_max=y_max), self.depth + 1),
+        ]
+        items, self.items = self.items, []
+        for box, item in items:
+            child = self._child_containing(box)
+            if child is None:
+                self.items.append((box, item))
+            else:
+                child.items.append((box, item))
+        for child in self.children:
+            if len(child.items) > self.MAX_ITEMS and child.depth < self.MAX_DEPTH:
+                child._split()
+
+    def _child_containing(self, box):
+        item_x_min, item_x_max, item_y_min, item_y_max = box
+        for child in self.children:
+            x_min, x_max, y_min, y_max = child.box
+            if x_min <= item_x_min and item_x_max <= x_max and y_min <= item_y_min and item_y_max <= y_max:
+                return child
+        return None
+
+
+__all__ = ['QuadTree']
@@ -1,28 +1,240 @@
+import importlib
 import json
 from pathlib import Path
 import io
-import uuid
+import re
+
+SUPPORTED_FILE_TYPES = ['.geojson']
+CHUNK_SIZE = 1 << 16
+# json parsers in order of preference, the first one installed is used
+JSON_BACKENDS = ['orjson', 'json']
+
+_loads = None
+_dumps = None
+_backend = None
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'\s*')
+_structural = re.compile(r'["{}\[\]]')
+_string_special = re.compile(r'["\\]')
+
+def _geojson_path(data):
+    try:
+        p = Path(data)
+        exists = p.exists()
+    except (OSError, ValueError):
+        return None
+    if not exists:
+        return None
+    if p.suffix not in SUPPORTED_FILE_TYPES:
+        raise TypeError('Data file must be a suported file type')
+    return p
+
+def set_json_backend(name=None):
+    """Chooses the json parser read_geojson uses, the first installed of JSON_BACKENDS when name is None"""
+    global _loads, _dumps, _backend
+    for candidate in [name] if name else JSON_BACKENDS:
+        try:
+            module = importlib.import_module(candidate)
+        except ImportError:
+            if name:
+                raise
+            continue
+        _loads, _backend = module.loads, candidate
+        if candidate == 'orjson':
+            # json turns keys like numbers into strings too
+            _dumps = lambda data: module.dumps(data, option=module.OPT_NON_STR_KEYS)
+        elif candidate == 'json':
+            _dumps = lambda data: module.dumps(data, separators=(',', ':'))
+        else:
+            _dumps = module.dumps
+        return candidate
+
+def json_backend():
+    """Name of the json parser in use, chosen on first use"""
+    if _backend is None:
+        set_json_backend()
+    return _backend
+
+def loads(data):
+    """Parses json text or bytes with the chosen backend"""
+    if _loads is None:
+        set_json_backend()
+    return _loads(data)
+
+def dumps(data) -> bytes:
+    """Serializes data to compact json bytes with the chosen backend"""
+    if _dumps is None:
+        set_json_backend()
+    text = _dumps(data)
+    return text.encode() if isinstance(text, str) else text
 
 def read_geojson(data):
-    suported_file_types = ['.geojson']
     if isinstance(data, str):
-        try:
-            p = Path(data)
-            pass
-        except OSError as e:
-            p = Path(str(uuid.uuid4()))
-        if p.exists():
-            if p.suffix not in suported_file_types:
-                raise TypeError('Data file must be a suported file type')
-            with open(p, 'r') as f:
-                data = f.read()
-                return json.loads(data)
+        p = _geojson_path(data)
+        if p:
+            with open(p, 'rb') as f:
+                return loads(f.read())
         else:
-            return json.loads(data)
+            return loads(data)
     elif isinstance(data, io.IOBase):
-        data = data.read()
-        return json.loads(data)
+        return loads(data.read())
     elif isinstance(data, dict):
         return data
     else:
-        raise TypeError('Invalid input data')
\ No newline at end of file
+        raise TypeError('Invalid input data')
+
+def iter_geojson(data, chunk_size=CHUNK_SIZE):
+    """Yields the members of the features array of geojson data while it is parsed
+
+    Files and file objects are read chunk_size characters at a time and only the feature
+    being parsed is held in memory. Geojson objects that are not a FeatureCollection are
+    yielded whole.
+    """
+    if isinstance(data, dict):
+        if data.get('type') == 'FeatureCollection':
+            yield from data['features']
+        else:
+            yield data
+    elif isinstance(data, str):
+        p = _geojson_path(data)
+        if p:
+            with open(p, 'r', encoding='utf-8') as f:
+                yield from _JsonStream(f, chunk_size).features()
+        else:
+            yield from _JsonStream(io.StringIO(data), chunk_size).features()
+    elif isinstance(data, io.IOBase):
+        if not isinstance(data, io.TextIOBase):
+            data = io.TextIOWrapper(data, encoding='utf-8')
+        yield from _JsonStream(data, chunk_size).features()
+    else:
+        raise TypeError('Invalid input data')
+
+
+class _JsonStream:
+    """Incremental reader for one top level json object"""
+
+    def __init__(self, f, chunk_size):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def features(self):
+        members = {}
+        self._expect('{')
+        while True:
+            char = self._peek()
+            if char == '}':
+                break
+            if char == ',':
+                self._pos += 1
+                continue
+            key = self._value()
+            self._expect(':')
+            if key == 'features':
+                yield from self._array()
+                members['type'] = members.get('type', 'FeatureCollection')
+            else:
+                members[key] = self._value()
+        if members.get('type') != 'FeatureCollection':
+            yield members
+
+    def _array(self):
+        self._expect('[')
+        while True:
+            char = self._peek()
+            if char == ']':
+                self._pos += 1
+                return
+            if char == ',':
+                self._pos += 1
+                continue
+            yield self._value()
+
+    def _fill(self):
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            self._pos = _whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError('Data must be a valid geojson object')
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError('Data must be a valid geojson object')
+        self._pos += 1
+
+    def _value(self):
+        if self._peek() in '{["':
+            self._read_to_end()
+            value, self._pos = _decoder.raw_decode(self._buffer, self._pos)
+            return value
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _read_to_end(self):
+        """Reads chunks until the buffer holds the whole object, array or string at the position
+
+        Every chunk is scanned once for brackets and quotes and the chunks are joined once,
+        so a value spanning many chunks is parsed in linear time.
+        """
+        end, depth, in_string, skip = _scan(self._buffer, self._pos, 0, False)
+        if end is not None:
+            return
+        pieces = [self._buffer[self._pos:]]
+        while end is None:
+            chunk = self._f.read(self._chunk_size)
+            if not chunk:
+                self._eof = True
+                raise ValueError('Data must be a valid geojson object')
+            end, depth, in_string, skip = _scan(chunk, skip, depth, in_string)
+            pieces.append(chunk)
+        self._buffer = ''.join(pieces)
+        self._pos = 0
+
+
+def _scan(text, i, depth, in_string):
+    """Scans text from i for the end of a json value
+
+    Returns the end, None while the value goes on past text, the bracket depth, whether
+    a string is open and how many characters of the next text an escape skips.
+    """
+    while i < len(text):
+        match = (_string_special if in_string else _structural).search(text, i)
+        if match is None:
+            return None, depth, in_string, 0
+        i = match.end()
+        char = match.group()
+        if char == '\\':
+            i += 1
+            continue
+        if char == '"':
+            in_string = not in_string
+        elif char in '{[':
+            depth += 1
+        else:
+            depth -= 1
+        if depth == 0 and not in_string:
+            return i, depth, in_string, 0
+    return None, depth, in_string, i - len(text)
+
@@ -0,0 +1,47 @@
+import importlib.util
+import sys
+import threading
+import types
+
+_lock = threading.RLock()
+_loading = set()
+
+
+class _LazyModule(types.ModuleType):
+    """Module executed on first attribute access, other threads wait until it is executed
+
+    importlib.util.LazyLoader before Python 3.12.3 hands a thread that touches a module
+    while another thread executes it a half filled module.
+    """
+
+    def __getattribute__(self, attr):
+        with _lock:
+            # the executing thread reads attributes of the module while it runs
+            if type(self) is _LazyModule and id(self) not in _loading:
+                _loading.add(id(self))
+                try:
+                    types.ModuleType.__getattribute__(self, '__spec__').loader.exec_module(self)
+                    self.__class__ = types.ModuleType
+                finally:
+                    _loading.discard(id(self))
+        return types.ModuleType.__getattribute__(self, attr)
+
+
+def lazy_import(name: str):
+    """Returns the module name without executing it, it is executed on first attribute access
+
+    numpy, Pillow and pyproj take most of the import time of quickmap, while short lived
+    programs often use only part of the package.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    module = importlib.util.module_from_spec(spec)
+    module.__class__ = _LazyModule
+    sys.modules[name] = module
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -4,7 +4,23 @@ EARTH_RADIUS = 6378137.0
 TILE_SIZE = 256
 ORIGIN_SHIFT = 2.0 * math.pi * EARTH_RADIUS / 2.0
 INITIAL_RESOLUTION = 2.0 * math.pi * EARTH_RADIUS / float(TILE_SIZE)
+MAX_LATITUDE = 85.0511287798
 
 
 def resolution(zoom):
     return INITIAL_RESOLUTION / (2 ** zoom)
+
+def lng_lat_to_pixel(lng, lat, zoom):
+    """Gets the float pixel position in the pyramid at zoom of lng/lat in WGS84, measured from the top left"""
+    map_size = TILE_SIZE * 2 ** zoom
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    pixel_x = (lng + 180.0) / 360.0 * map_size
+    pixel_y = (1.0 - math.log(math.tan(math.pi / 4.0 + math.radians(lat) / 2.0)) / math.pi) / 2.0 * map_size
+    return pixel_x, pixel_y
+
+def pixel_to_lng_lat(pixel_x, pixel_y, zoom):
+    """Gets lng/lat in WGS84 of a pixel position in the pyramid at zoom, measured from the top left"""
+    map_size = TILE_SIZE * 2 ** zoom
+    lng = pixel_x / map_size * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * pixel_y / map_size))))
+    return lng, lat
@@ -1,22 +1,46 @@
-from typing import List
-from copy import deepcopy
-
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
 
+from .binary import FeatureArrays
+from .bulk import load_many
+from .cache import TileCache
+from .columnar import PointArray
 from .feature import FeatureCollection
+from .lazy import lazy_import
+from .source import AsyncTileSource, TileSource
 from .tile import Tile, TileCollection
 from .geometry import BoundingBox, Point
 from .canvas import MapCanvas
+from .encoders import PNG, Encoder
+from .export import export_tiles
+from .stats import RenderStats
+from .striped import render_striped
+from .meta import TILE_SIZE
+
+asyncio = lazy_import('asyncio')
 
 
 class QuickMap:
 
-    def __init__(self, feature_collection: FeatureCollection = None) -> None:
-        if feature_collection:
+    def __init__(self, feature_collection: Union[FeatureCollection, FeatureArrays, PointArray] = None,
+                 cache: TileCache = None, workers: int = 8, source: TileSource = None, stats_hook=None,
+                 size: Optional[Tuple[int, int]] = None, padding: int = 0) -> None:
+        # a FeatureFile or PointArray is drawn straight from its arrays, without building Features
+        if feature_collection is not None:
             self._feature_collection = feature_collection
         else:
             self._feature_collection = FeatureCollection()
         # self.tiles: TileCollection = TileCollection()
-        self.canvas = MapCanvas(self._feature_collection)
+        self.canvas = MapCanvas(self._feature_collection, cache=cache, workers=workers, source=source)
+        # called with the RenderStats of every finished save_png
+        self.stats_hook = stats_hook
+        # (width, height) of the output in pixels, None for whole tiles around the features
+        self.size = size
+        self.padding = padding
+        self._render_finished = False
+        self._async_loop = None
+        self._async_lock = None
+        self._async_source = None
 
     @property
     def features(self):
@@ -28,26 +52,149 @@ class QuickMap:
         return self._feature_collection
 
     @feature_collection.setter
-    def feature_collection(self, value: FeatureCollection):
+    def feature_collection(self, value: Union[FeatureCollection, FeatureArrays, PointArray]):
         self._feature_collection = value
-        self.render_basemap()
-
-    def load_geosjon(self, data):
-        previous_bb = deepcopy(self._feature_collection.bounding_box)
-        new_features = self._feature_collection.load_geojson(data)
-        if previous_bb != self._feature_collection.bounding_box:
-            self.render_basemap()
-        print(previous_bb)
-        print(self._feature_collection.bounding_box)
+        self.canvas._feature_collection = value
+        if not value.bounding_box.is_empty:
+            self.cover_tiles()
+
+    @property
+    def render_stats(self) -> RenderStats:
+        """Stage timings and counters since the previous save_png finished"""
+        return self.canvas.stats
+
+    def _start_render(self):
+        if self._render_finished:
+            self.canvas.stats = RenderStats()
+            self._render_finished = False
+
+    def _finish_render(self):
+        self._render_finished = True
+        if self.stats_hook:
+            self.stats_hook(self.canvas.stats)
+
+    def load_geosjon(self, data, bounding_box: BoundingBox = None, where=None):
+        self._start_render()
+        stats = self.canvas.stats
+        with stats.span('bbox'):
+            previous_bb = self._feature_collection.bounding_box
+        with stats.span('parse'):
+            new_features = self._feature_collection.load_geojson(data, bounding_box=bounding_box, where=where)
+        with stats.span('bbox'):
+            changed = previous_bb != self._feature_collection.bounding_box
+        if changed:
+            self.cover_tiles()
         return new_features
 
-    def save_png(self, fpath):
-        return self.canvas.save_png(fpath)
+    def load_many(self, paths, processes: Optional[int] = None, bounding_box: BoundingBox = None, where=None):
+        """Loads many GeoJSON files in parallel, returns a LoadResult per file, see quickmap.bulk.load_many"""
+        self._start_render()
+        stats = self.canvas.stats
+        with stats.span('bbox'):
+            previous_bb = self._feature_collection.bounding_box
+        with stats.span('parse'):
+            _, results = load_many(paths, self._feature_collection, processes=processes, bounding_box=bounding_box,
+                                   where=where)
+        with stats.span('bbox'):
+            changed = previous_bb != self._feature_collection.bounding_box
+        if changed:
+            self.cover_tiles()
+        return results
+
+    def save(self, fpath, encoder: Optional[Encoder] = None):
+        """Renders the map to a file, encoded as its extension says unless encoder is given"""
+        self._start_render()
+        self.canvas.stitch_tiles()
+        self.canvas.save(fpath, encoder)
+        self._finish_render()
+
+    def save_png(self, fpath, encoder: Optional[Encoder] = None):
+        return self.save(fpath, encoder or PNG)
+
+    def save_striped(self, fpath, zoom: Optional[int] = None, strip_height: int = TILE_SIZE, compress_level: int = 6,
+                     format: Optional[str] = None):
+        """Renders the map in horizontal strips straight into a png or tiff, for maps too large to hold in memory
+
+        With zoom the map shows the features at that zoom with padding around them, however
+        many pixels that takes, otherwise the map's size applies. See quickmap.striped.render_striped.
+        """
+        self._start_render()
+        if zoom is not None:
+            self.canvas._tiles.frame(self._feature_collection.bounding_box, zoom, self.padding)
+        try:
+            size = render_striped(self.canvas, fpath, format=format, strip_height=strip_height,
+                                  compress_level=compress_level)
+        finally:
+            if zoom is not None:
+                self.cover_tiles()
+        self._finish_render()
+        return size
+
+    def encode(self, fp=None, encoder: Optional[Encoder] = None):
+        """Renders the map and writes it encoded to the file object fp, or returns the bytes when fp is None"""
+        self._start_render()
+        self.canvas.stitch_tiles()
+        result = self.canvas.encode(fp, encoder)
+        self._finish_render()
+        return result
+
+    async def render_async(self, output=None, tile_timeout: Optional[float] = None,
+                           encoder: Optional[Encoder] = None) -> bytes:
+        """Renders the map without blocking the event loop, returns the encoded map and writes it to output when given
+
+        Tiles are fetched concurrently on the loop with tile_timeout seconds each, through the
+        async counterpart of the map's source. Decoding, drawing and encoding run on the
+        loop's default executor. Renders of one QuickMap run one at a time.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_loop = loop
+            self._async_lock = asyncio.Lock()
+            self._async_source = AsyncTileSource.from_source(self.canvas._tiles.source)
+        async with self._async_lock:
+            self._start_render()
+            await self.canvas.stitch_tiles_async(source=self._async_source, timeout=tile_timeout)
+            future = loop.run_in_executor(None, self.canvas.encode, None, encoder)
+            try:
+                data = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the render thread cannot be stopped, keep the canvas locked until it is done with it
+                await asyncio.wait([future])
+                raise
+            self._finish_render()
+        if output is not None:
+            await asyncio.to_thread(Path(output).write_bytes, data)
+        return data
+
+    async def aclose(self):
+        """Closes the connections render_async opened"""
+        if self._async_source is not None:
+            await self._async_source.close()
+
+    def export_tiles(self, output, min_zoom, max_zoom, basemap=False, processes=None):
+        """Renders the features into a {zoom}/{x}/{y}.png tree or .mbtiles file, see quickmap.export.export_tiles"""
+        return export_tiles(self._feature_collection, output, min_zoom, max_zoom, basemap=basemap,
+                            source=self.canvas._tiles.source, style=self.canvas.style, processes=processes)
+
+    def resize(self, size: Optional[Tuple[int, int]], padding: int = 0):
+        """Sets the output size in pixels with padding around the features, None for whole tiles"""
+        self.size = size
+        self.padding = padding
+        if not self._feature_collection.bounding_box.is_empty:
+            self.cover_tiles()
+
+    def cover_tiles(self):
+        """Works out the basemap tiles for the features, they are fetched when the map is rendered"""
+        self._start_render()
+        with self.canvas.stats.span('tile_cover'):
+            if self.size:
+                self.canvas._tiles.fit(self.feature_collection.bounding_box, self.size, self.padding)
+            else:
+                self.canvas._tiles.calculate_tiles(self.feature_collection.bounding_box)
 
     def render_basemap(self):
-        self.canvas._tiles.calculate_tiles(self.feature_collection.bounding_box)
+        self.cover_tiles()
         self.canvas.stitch_tiles()
-        print("rendered basemap")
 
     def draw_feature_collection(self):
         for feature in self.feature_collection.features:
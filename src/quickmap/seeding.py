@@ -0,0 +1,169 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+
+from .cache import TileCache
+from .feature import FeatureCollection
+from .geometry import BoundingBox
+from .source import TileNotFoundError, TileSource
+from .tile import Tile, TileCollection
+
+
+@dataclass
+class SeedProgress:
+    '''Class for the progress of seeding a tile cache'''
+    total: int
+    done: int = 0
+    fetched: int = 0
+    skipped: int = 0
+    missing: int = 0
+    failed: int = 0
+    bytes_downloaded: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def tiles_per_second(self) -> float:
+        return self.done / self.seconds if self.seconds else 0.0
+
+    @property
+    def remaining_seconds(self) -> Optional[float]:
+        """Estimated seconds until every tile is done, None before the first tile"""
+        return (self.total - self.done) / self.tiles_per_second if self.done else None
+
+
+class RateLimiter:
+    """Spaces calls to wait at least 1 / rate seconds apart across all threads"""
+
+    def __init__(self, rate: Optional[float]) -> None:
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def extent_of(extent) -> BoundingBox:
+    """Bounding box of an extent, a BoundingBox, a FeatureCollection or anything load_geojson accepts"""
+    if isinstance(extent, BoundingBox):
+        return extent
+    if not isinstance(extent, FeatureCollection):
+        feature_collection = FeatureCollection()
+        feature_collection.load_geojson(extent)
+        extent = feature_collection
+    return extent.bounding_box
+
+
+def iter_tiles(extent, min_zoom: int, max_zoom: int) -> Iterator[Tile]:
+    """Yields every tile from min_zoom to max_zoom that the extent touches, zoom by zoom
+
+    extent is a BoundingBox, a FeatureCollection or anything load_geojson accepts.
+    """
+    bounding_box = extent_of(extent)
+    if bounding_box.is_empty:
+        return
+    for zoom in range(min_zoom, max_zoom + 1):
+        x_min, x_max, y_min, y_max = TileCollection.tile_range(bounding_box, zoom)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                yield Tile(x=x, y=y, zoom=zoom)
+
+
+def count_tiles(extent, min_zoom: int, max_zoom: int) -> int:
+    """Returns the number of tiles iter_tiles yields, without enumerating them"""
+    bounding_box = extent_of(extent)
+    if bounding_box.is_empty:
+        return 0
+    total = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        x_min, x_max, y_min, y_max = TileCollection.tile_range(bounding_box, zoom)
+        total += (x_max - x_min + 1) * (y_max - y_min + 1)
+    return total
+
+
+def seed(extent, min_zoom: int, max_zoom: int, cache: TileCache, source: TileSource, workers: int = 4,
+         rate: Optional[float] = 10.0, limit: Optional[int] = None, refresh: bool = False,
+         progress: Optional[Callable[[SeedProgress], None]] = None, report_every: float = 1.0,
+         total: Optional[int] = None) -> SeedProgress:
+    """Downloads every tile of the extent from min_zoom to max_zoom into cache ahead of rendering
+
+    The tile count is worked out first and a ValueError raised when it is above limit.
+    Tiles already in the cache are skipped unless refresh is set, so an interrupted run
+    picks up where it stopped. Downloads run on workers threads and are started at most
+    rate per second all together. progress is called with the SeedProgress every
+    report_every seconds and once at the end. A tile the source fails on is counted and
+    seeding carries on. Make sure the cache's max_bytes holds the tiles, otherwise the
+    first ones are evicted again. total is the count_tiles of the extent when the caller
+    has it already.
+
+    There is no default source: the usage policies of public tile servers, such as
+    tile.openstreetmap.org, forbid bulk downloads, seed from a server that allows them.
+    """
+    if not source.cacheable:
+        raise ValueError(f'{source} is not cached, there is nothing to seed')
+    if min_zoom > max_zoom:
+        raise ValueError('min_zoom must not be above max_zoom')
+    # a GeoJSON extent is loaded once for the count and the tiles
+    extent = extent_of(extent)
+    if total is None:
+        total = count_tiles(extent, min_zoom, max_zoom)
+    if limit is not None and total > limit:
+        raise ValueError(f'Seeding needs {total} tiles, more than the limit of {limit}')
+    result = SeedProgress(total=total)
+    limiter = RateLimiter(rate)
+    start = time.perf_counter()
+    reported = start
+
+    def load(tile):
+        if not refresh and (source.name, tile) in cache:
+            return 'skipped', 0
+        limiter.wait()
+        try:
+            data, etag = source.fetch(tile)
+        except TileNotFoundError:
+            return 'missing', 0
+        cache.put(source.name, tile, data, etag)
+        return 'fetched', len(data)
+
+    def collect(futures):
+        for future in futures:
+            result.done += 1
+            try:
+                outcome, size = future.result()
+            except Exception as e:
+                result.failed += 1
+                result.error = repr(e)
+                continue
+            setattr(result, outcome, getattr(result, outcome) + 1)
+            result.bytes_downloaded += size
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        # only a few tiles per worker are queued, so huge extents are never held in memory
+        for tile in iter_tiles(extent, min_zoom, max_zoom):
+            pending.add(executor.submit(load, tile))
+            if len(pending) >= workers * 4:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            now = time.perf_counter()
+            if progress is not None and now - reported >= report_every:
+                result.seconds = now - start
+                progress(result)
+                reported = now
+        collect(wait(pending).done)
+    result.seconds = time.perf_counter() - start
+    if progress is not None:
+        progress(result)
+    return result
+
+
+__all__ = ['seed', 'count_tiles', 'iter_tiles', 'extent_of', 'SeedProgress']
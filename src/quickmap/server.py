@@ -0,0 +1,296 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .cache import TileCache
+from .encoders import PNG, Encoder
+from .feature import FeatureCollection
+from .io_service import loads
+from .lazy import lazy_import
+from .quickmap import QuickMap
+from .source import TileNotFoundError, TileSource, XYZTileSource
+from .stats import RenderStats
+from .symbols import PointStyle
+
+Image = lazy_import('PIL.Image')
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_PIXELS = 64 * 1024 * 1024
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time, callers asking for a key already in flight wait for its result"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        """Returns (result, shared), shared is True when the result came from another caller's call"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class DecodedTiles:
+    """Decoded basemap tiles kept in memory, the least recently used beyond max_tiles are dropped
+
+    Tiles missing from memory are read through the TileCache and the source. Concurrent
+    requests for the same tile share one fetch.
+    """
+
+    def __init__(self, source: TileSource, cache: Optional[TileCache] = None, max_tiles: int = 1024,
+                 workers: int = 8) -> None:
+        self.source = source
+        self.cache = cache
+        self.max_tiles = max_tiles
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def get(self, tile, stats: Optional[RenderStats] = None):
+        """Returns the tile as an RGBA image, None when the source has no such tile"""
+        with self._lock:
+            if tile in self._tiles:
+                self._tiles.move_to_end(tile)
+                self.hits += 1
+                return self._tiles[tile]
+            self.misses += 1
+        image, shared = self._flight.do(tile, lambda: self._load(tile, stats))
+        if shared:
+            with self._lock:
+                self.coalesced += 1
+        return image
+
+    def get_many(self, tiles, stats: Optional[RenderStats] = None):
+        """Returns {tile: image} for the tiles the source has, loading the missing ones in parallel"""
+        images = self._executor.map(lambda tile: self.get(tile, stats), tiles)
+        return {tile: image for tile, image in zip(tiles, images) if image is not None}
+
+    def _load(self, tile, stats):
+        with self._lock:
+            # another call may have loaded the tile between the miss and this call
+            if tile in self._tiles:
+                return self._tiles[tile]
+        stats = RenderStats() if stats is None else stats
+        try:
+            with stats.span('fetch'):
+                data = tile.fetch(source=self.source, cache=self.cache, stats=stats)
+            with stats.span('decode'):
+                image = Image.open(data).convert('RGBA')
+        except TileNotFoundError:
+            image = None
+        with self._lock:
+            self._tiles[tile] = image
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return image
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class RenderService:
+    """Renders GeoJSON to png in a long running process, keeping tiles, sprites and connections warm"""
+
+    def __init__(self, source: Optional[TileSource] = None, cache: Optional[TileCache] = None,
+                 max_tiles: int = 1024, workers: int = 8) -> None:
+        self.source = source or XYZTileSource()
+        self.tiles = DecodedTiles(self.source, cache=cache, max_tiles=max_tiles, workers=workers)
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.started = time.time()
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def render(self, geojson: dict, width: Optional[int] = None, height: Optional[int] = None, padding: int = 0,
+               style: PointStyle = PointStyle(), encoder: Encoder = PNG) -> bytes:
+        """Renders features to an image, at width x height pixels when given and in whole tiles otherwise"""
+        start = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+        try:
+            size = None
+            if width is not None or height is not None:
+                if width is None or height is None or width < 1 or height < 1 or width * height > MAX_PIXELS:
+                    raise ValueError(f'Invalid size {width}x{height}, width and height are given together '
+                                     f'and at most {MAX_PIXELS} pixels are rendered')
+                size = (width, height)
+            quick_map = QuickMap(FeatureCollection(), source=self.source, size=size, padding=padding)
+            quick_map.canvas.style = style
+            if not quick_map.load_geosjon(geojson):
+                raise ValueError('GeoJSON has no features to render')
+            canvas = quick_map.canvas
+            canvas.stitch_tiles(images=self.tiles.get_many(canvas._tiles.tiles, stats=canvas.stats))
+            return canvas.encode(encoder=encoder)
+        except BaseException:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self._latencies.append(time.perf_counter() - start)
+
+    def stats(self):
+        """Request counts, throughput, latency percentiles of the last 1,000 renders and tile memory counters"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            requests, errors, in_flight = self.requests, self.errors, self.in_flight
+        uptime = time.time() - self.started
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+        return {
+            'requests': requests,
+            'errors': errors,
+            'in_flight': in_flight,
+            'uptime': uptime,
+            'renders_per_second': (requests - errors) / uptime if uptime else 0.0,
+            'latency': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+            'tiles': {'cached': len(self.tiles), 'hits': self.tiles.hits, 'misses': self.tiles.misses,
+                      'coalesced': self.tiles.coalesced},
+        }
+
+    def close(self):
+        self.tiles.close()
+        self.source.close()
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """POST /render with a GeoJSON body returns a png, GET /stats returns the service stats as json
+
+    /render takes width, height, padding, symbol, size, color (r,g,b or r,g,b,a), format
+    (png, png8, jpeg or webp), compress_level and quality query parameters.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'quickmap'
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/stats':
+            self._send(200, 'application/json', json.dumps(self.server.service.stats()).encode())
+        elif path == '/health':
+            self._send(200, 'text/plain', b'ok')
+        else:
+            self._send(404, 'text/plain', b'not found')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/render':
+            self._send(404, 'text/plain', b'not found')
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send(400, 'text/plain', b'invalid Content-Length')
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(413, 'text/plain', b'body too large')
+            return
+        body = self.rfile.read(length)
+        try:
+            options = self._options(parse_qs(url.query))
+            data = self.server.service.render(loads(body), **options)
+        except (ValueError, TypeError, KeyError) as e:
+            self._send(400, 'text/plain', str(e).encode())
+            return
+        except Exception as e:
+            self._send(500, 'text/plain', repr(e).encode())
+            return
+        self._send(200, options['encoder'].content_type, data)
+
+    @staticmethod
+    def _options(query):
+        def value(name, convert=int):
+            return convert(query[name][-1]) if name in query else None
+        symbol = value('symbol', str) or 'circle'
+        if not symbol.replace('_', '').replace('-', '').isalnum():
+            raise ValueError(f'Invalid symbol {symbol!r}')
+        style = PointStyle(symbol=symbol, size=value('size'),
+                           color=value('color', lambda text: tuple(int(n) for n in text.split(','))))
+        encoder = Encoder.from_name(value('format', str) or 'png', **{
+            name: value(name) for name in ('compress_level', 'quality') if name in query})
+        return {'width': value('width'), 'height': value('height'), 'padding': value('padding') or 0, 'style': style,
+                'encoder': encoder}
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RenderServer(ThreadingHTTPServer):
+    """HTTP server around a RenderService, every request is handled on its own thread"""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, address=('127.0.0.1', 8080), service: Optional[RenderService] = None) -> None:
+        super().__init__(address, RenderRequestHandler)
+        self.service = service or RenderService()
+
+    def server_close(self):
+        super().server_close()
+        self.service.close()
+
+
+def serve(host: str = '127.0.0.1', port: int = 8080, **service_options):
+    """Runs a RenderServer until interrupted, service_options are passed to RenderService"""
+    server = RenderServer((host, port), RenderService(**service_options))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+__all__ = ['RenderService', 'RenderServer', 'serve']
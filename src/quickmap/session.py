@@ -0,0 +1,207 @@
+import io
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+import urllib.error
+from urllib.parse import urlsplit
+
+from .lazy import lazy_import
+
+asyncio = lazy_import('asyncio')
+http_client = lazy_import('http.client')
+ssl = lazy_import('ssl')
+
+
+USER_AGENT = 'Python-Package: quickmap'
+
+
+class TileSession:
+    """Pool of keep-alive HTTP connections shared between tile fetches
+
+    Connections are reused per host and at most max_per_host requests run against one
+    host at the same time, no matter how many threads share the session.
+    """
+
+    def __init__(self, max_per_host: int = 4, timeout: float = 30.0) -> None:
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._idle = defaultdict(list)
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # connections and locks stay with the process that opened them
+        return {'max_per_host': self.max_per_host, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def get(self, url: str, headers: Optional[dict] = None):
+        """GETs url and returns (status, headers, body)"""
+        parsed = urlsplit(url)
+        key = (parsed.scheme, parsed.netloc)
+        path = parsed.path + (f'?{parsed.query}' if parsed.query else '')
+        headers = {'User-Agent': USER_AGENT, **(headers or {})}
+        with self._host_slot(key):
+            connection = self._acquire(key)
+            try:
+                response = self._request(connection, path, headers)
+            except (http_client.HTTPException, OSError):
+                # the server may have dropped an idle keep-alive connection, retry on a fresh one
+                connection.close()
+                connection = self._connect(key)
+                response = self._request(connection, path, headers)
+            body = response.read()
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+        return response.status, response.headers, body
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    @staticmethod
+    def _request(connection, path, headers):
+        connection.request('GET', path, headers=headers)
+        return connection.getresponse()
+
+    @contextmanager
+    def _host_slot(self, key):
+        with self._lock:
+            limit = self._limits.setdefault(key, threading.BoundedSemaphore(self.max_per_host))
+        with limit:
+            yield
+
+    def _acquire(self, key):
+        with self._lock:
+            if self._idle[key]:
+                return self._idle[key].pop()
+        return self._connect(key)
+
+    def _release(self, key, connection):
+        with self._lock:
+            self._idle[key].append(connection)
+
+    def _connect(self, key):
+        scheme, netloc = key
+        if scheme == 'https':
+            return http_client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http_client.HTTPConnection(netloc, timeout=self.timeout)
+
+
+class AsyncTileSession:
+    """asyncio counterpart of TileSession
+
+    Connections are asyncio streams kept alive per host, at most max_per_host requests run
+    against one host at the same time. A session belongs to the event loop that uses it;
+    when it is used from a new loop the connections of the old one are dropped.
+    """
+
+    def __init__(self, max_per_host: int = 4, timeout: float = 30.0) -> None:
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._idle = defaultdict(list)
+        self._limits = {}
+        self._loop = None
+
+    async def get(self, url: str, headers: Optional[dict] = None):
+        """GETs url and returns (status, headers, body)"""
+        self._check_loop()
+        parsed = urlsplit(url)
+        key = (parsed.scheme, parsed.netloc)
+        path = parsed.path + (f'?{parsed.query}' if parsed.query else '')
+        headers = {'User-Agent': USER_AGENT, 'Host': parsed.netloc, **(headers or {})}
+        limit = self._limits.setdefault(key, asyncio.BoundedSemaphore(self.max_per_host))
+        async with limit:
+            reused = bool(self._idle[key])
+            connection = self._idle[key].pop() if reused else await self._connect(key)
+            try:
+                response = await asyncio.wait_for(self._request(connection, path, headers), self.timeout)
+            except (http_client.HTTPException, OSError, asyncio.IncompleteReadError):
+                connection[1].close()
+                if not reused:
+                    raise
+                # the server may have dropped an idle keep-alive connection, retry on a fresh one
+                connection = await self._connect(key)
+                response = await asyncio.wait_for(self._request(connection, path, headers), self.timeout)
+            except BaseException:
+                # a cancelled or timed out request leaves the connection in an unknown state
+                connection[1].close()
+                raise
+            status, reason, response_headers, body, will_close = response
+            if will_close:
+                connection[1].close()
+            else:
+                self._idle[key].append(connection)
+        if status >= 400:
+            raise urllib.error.HTTPError(url, status, reason, response_headers, None)
+        return status, response_headers, body
+
+    async def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._idle = defaultdict(list)
+            self._limits = {}
+            self._loop = loop
+
+    @staticmethod
+    def _address(scheme, netloc):
+        """Host and port of a netloc, which may be a bracketed IPv6 address"""
+        parts = urlsplit(f'//{netloc}')
+        return parts.hostname, parts.port or (443 if scheme == 'https' else 80)
+
+    async def _connect(self, key):
+        scheme, netloc = key
+        host, port = self._address(scheme, netloc)
+        context = ssl.create_default_context() if scheme == 'https' else None
+        return await asyncio.wait_for(asyncio.open_connection(host, port, ssl=context), self.timeout)
+
+    @staticmethod
+    async def _request(connection, path, headers):
+        reader, writer = connection
+        request = f'GET {path} HTTP/1.1\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        writer.write(request.encode('latin-1') + b'\r\n')
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        status_line, _, header_lines = head.partition(b'\r\n')
+        version, status, reason = (status_line.decode('latin-1').split(' ', 2) + [''])[:3]
+        if not version.startswith('HTTP/'):
+            raise http_client.BadStatusLine(status_line)
+        response_headers = http_client.parse_headers(io.BytesIO(header_lines))
+        status = int(status)
+        will_close = version == 'HTTP/1.0' or response_headers.get('Connection', '').lower() == 'close'
+        if status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif response_headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readuntil(b'\r\n')
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif response_headers.get('Content-Length') is not None:
+            body = await reader.readexactly(int(response_headers['Content-Length']))
+        else:
+            body = await reader.read()
+            will_close = True
+        return status, reason.strip(), response_headers, body, will_close
+
+
+__all__ = ['TileSession', 'AsyncTileSession']
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from .lazy import lazy_import
+from .meta import MAX_LATITUDE, TILE_SIZE
+
+np = lazy_import('numpy')
+
+
+def lng_lat_to_pixels(coordinates: np.ndarray, zoom) -> np.ndarray:
+    """Projects an (n, 2) array of lng/lat to float pyramid pixels at zoom, measured from the top left"""
+    map_size = TILE_SIZE * 2 ** zoom
+    lat = np.radians(np.clip(coordinates[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    pixels = np.empty((len(coordinates), 2), dtype=np.float64)
+    pixels[:, 0] = (coordinates[:, 0] + 180.0) / 360.0 * map_size
+    pixels[:, 1] = (1.0 - np.log(np.tan(np.pi / 4.0 + lat / 2.0)) / np.pi) / 2.0 * map_size
+    return pixels
+
+
+def simplify(pixels: np.ndarray, tolerance: float) -> np.ndarray:
+    """Simplifies an (n, 2) vertex array, dropping vertices that are within about tolerance of the result
+
+    Consecutive vertices in the same tolerance sized cell are dropped first, which removes
+    most vertices at low zooms, then Douglas-Peucker runs on what is left with the
+    distances of each span computed over the whole span at once. A tolerance of zero or
+    less keeps every vertex.
+    """
+    if len(pixels) < 3 or tolerance <= 0:
+        return pixels
+    pixels = _snap(pixels, tolerance)
+    if len(pixels) < 3:
+        return pixels
+    keep = np.zeros(len(pixels), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(pixels) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _distances(pixels[first + 1:last], pixels[first], pixels[last])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return pixels[keep]
+
+
+def _snap(pixels, tolerance):
+    # consecutive vertices falling in the same tolerance sized grid cell collapse onto the first of the run
+    cells = np.floor(pixels / tolerance)
+    keep = np.ones(len(pixels), dtype=bool)
+    keep[1:] = (cells[1:] != cells[:-1]).any(axis=1)
+    keep[-1] = True
+    return pixels[keep]
+
+
+def _distances(points, start, end):
+    """Distances of points to the segment from start to end"""
+    segment = end - start
+    length = float(segment @ segment)
+    if length == 0.0:
+        return np.hypot(*(points - start).T)
+    t = np.clip(((points - start) @ segment) / length, 0.0, 1.0)
+    projection = start + t[:, None] * segment
+    return np.hypot(*(points - projection).T)
@@ -0,0 +1,220 @@
+import os
+import sqlite3
+import threading
+import urllib.error
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from .lazy import lazy_import
+from .session import AsyncTileSession, TileSession
+
+asyncio = lazy_import('asyncio')
+
+TILE_URL = 'https://tile.openstreetmap.org/{zoom}/{x}/{y}.png'
+
+
+class TileNotFoundError(LookupError):
+    """Raised when a tile source has no image for a tile"""
+
+
+class TileSource:
+    """Base class for the providers of basemap tile images
+
+    Subclasses implement fetch. Sources that can read many tiles cheaply in one go set
+    batched and override fetch_many. Sources that are already local set cacheable to False
+    so they bypass the TileCache.
+    """
+
+    name = None
+    batched = False
+    cacheable = True
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.name!r})'
+
+    def fetch(self, tile, etag: Optional[str] = None):
+        """Returns (data, etag) for tile. data is None when etag is still current"""
+        raise NotImplementedError
+
+    def fetch_many(self, tiles: Iterable):
+        """Yields (tile, data) for every tile the source has"""
+        for tile in tiles:
+            try:
+                yield tile, self.fetch(tile)[0]
+            except TileNotFoundError:
+                continue
+
+    def close(self):
+        pass
+
+
+class XYZTileSource(TileSource):
+    """Tiles from an HTTP server following a {zoom}/{x}/{y} url template"""
+
+    def __init__(self, url: str = TILE_URL, session: Optional[TileSession] = None) -> None:
+        self.name = url
+        self.url = url
+        self.session = session or TileSession()
+
+    def fetch(self, tile, etag=None):
+        url = self.url.format(zoom=tile.zoom, x=tile.x, y=tile.y)
+        headers = {'If-None-Match': etag} if etag else {}
+        try:
+            status, response_headers, body = self.session.get(url, headers)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise TileNotFoundError(url) from e
+            raise
+        if status == 304:
+            return None, etag
+        return body, response_headers.get('ETag')
+
+    def close(self):
+        self.session.close()
+
+
+class DirectoryTileSource(TileSource):
+    """Tiles stored as files in a local {zoom}/{x}/{y}.png directory tree"""
+
+    cacheable = False
+
+    def __init__(self, path: str, pattern: str = '{zoom}/{x}/{y}.png') -> None:
+        self.path = os.path.expanduser(path)
+        self.name = os.path.join(self.path, pattern)
+        self.pattern = pattern
+
+    def fetch(self, tile, etag=None):
+        try:
+            with open(os.path.join(self.path, self.pattern.format(zoom=tile.zoom, x=tile.x, y=tile.y)), 'rb') as f:
+                return f.read(), None
+        except FileNotFoundError as e:
+            raise TileNotFoundError(str(tile)) from e
+
+
+class MBTilesTileSource(TileSource):
+    """Tiles stored in an MBTiles SQLite file
+
+    The connection stays open for the lifetime of the source and fetch_many reads all
+    requested tiles of a zoom level with one range query.
+    """
+
+    batched = True
+    cacheable = False
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.expanduser(path)
+        self.name = self.path
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(self.path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def fetch(self, tile, etag=None):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+                (tile.zoom, tile.x, self._tms_row(tile.y, tile.zoom))).fetchone()
+        if row is None:
+            raise TileNotFoundError(str(tile))
+        return row[0], None
+
+    def fetch_many(self, tiles):
+        by_zoom = defaultdict(dict)
+        for tile in tiles:
+            by_zoom[tile.zoom][(tile.x, self._tms_row(tile.y, tile.zoom))] = tile
+        for zoom, wanted in by_zoom.items():
+            columns = [column for column, _ in wanted]
+            rows = [row for _, row in wanted]
+            with self._lock:
+                found = self._connection.execute(
+                    'SELECT tile_column, tile_row, tile_data FROM tiles WHERE zoom_level = ? '
+                    'AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?',
+                    (zoom, min(columns), max(columns), min(rows), max(rows))).fetchall()
+            for column, row, data in found:
+                if (column, row) in wanted:
+                    yield wanted[(column, row)], data
+
+    def close(self):
+        self._connection.close()
+
+    @staticmethod
+    def _tms_row(y, zoom):
+        # MBTiles rows count from the south like TMS, XYZ rows count from the north
+        return (2 ** zoom) - 1 - y
+
+
+class AsyncTileSource:
+    """Base class for tile providers that fetch without blocking the event loop
+
+    Subclasses implement the coroutine fetch with the same contract as TileSource.fetch.
+    """
+
+    name = None
+    cacheable = True
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.name!r})'
+
+    @staticmethod
+    def from_source(source: TileSource):
+        """Returns an AsyncTileSource reading the same tiles as source"""
+        if isinstance(source, AsyncTileSource):
+            return source
+        if isinstance(source, XYZTileSource):
+            session = AsyncTileSession(max_per_host=source.session.max_per_host, timeout=source.session.timeout)
+            return AsyncXYZTileSource(source.url, session)
+        return ThreadedTileSource(source)
+
+    async def fetch(self, tile, etag: Optional[str] = None):
+        """Returns (data, etag) for tile. data is None when etag is still current"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class AsyncXYZTileSource(AsyncTileSource):
+    """Tiles from an HTTP server following a {zoom}/{x}/{y} url template, fetched with asyncio"""
+
+    def __init__(self, url: str = TILE_URL, session: Optional[AsyncTileSession] = None) -> None:
+        self.name = url
+        self.url = url
+        self.session = session or AsyncTileSession()
+
+    async def fetch(self, tile, etag=None):
+        url = self.url.format(zoom=tile.zoom, x=tile.x, y=tile.y)
+        headers = {'If-None-Match': etag} if etag else {}
+        try:
+            status, response_headers, body = await self.session.get(url, headers)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise TileNotFoundError(url) from e
+            raise
+        if status == 304:
+            return None, etag
+        return body, response_headers.get('ETag')
+
+    async def close(self):
+        await self.session.close()
+
+
+class ThreadedTileSource(AsyncTileSource):
+    """Runs the fetches of a blocking TileSource on worker threads"""
+
+    def __init__(self, source: TileSource) -> None:
+        self.source = source
+        self.name = source.name
+        self.cacheable = source.cacheable
+
+    async def fetch(self, tile, etag=None):
+        return await asyncio.to_thread(self.source.fetch, tile, etag)
+
+
+__all__ = ['TileSource', 'XYZTileSource', 'DirectoryTileSource', 'MBTilesTileSource', 'TileNotFoundError',
+           'AsyncTileSource', 'AsyncXYZTileSource', 'ThreadedTileSource']
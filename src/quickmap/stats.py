@@ -0,0 +1,49 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict
+
+STAGES = ('parse', 'bbox', 'tile_cover', 'fetch', 'decode', 'stitch', 'draw', 'encode')
+
+
+@dataclass
+class RenderStats:
+    '''Class for the stage timings and counters of a render
+
+    spans holds the seconds spent per stage. fetch and decode run on the tile workers, so
+    their spans are summed over the workers and can be longer than the render itself.
+    '''
+    spans: Dict[str, float] = field(default_factory=dict)
+    tiles_fetched: int = 0
+    cache_hits: int = 0
+    bytes_downloaded: int = 0
+    features_drawn: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str):
+        """Adds the time spent in the with block to stage"""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.spans[stage] = self.spans.get(stage, 0.0) + elapsed
+
+    def count(self, **counters):
+        """Adds to counters by name, safe to call from the tile workers"""
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        with self._lock:
+            return {'spans': dict(self.spans), 'tiles_fetched': self.tiles_fetched, 'cache_hits': self.cache_hits,
+                    'bytes_downloaded': self.bytes_downloaded, 'features_drawn': self.features_drawn}
+
+
+__all__ = ['RenderStats']
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import os
+import struct
+import zlib
+from typing import Optional
+
+from .canvas import MapCanvas
+from .lazy import lazy_import
+from .meta import TILE_SIZE
+
+np = lazy_import('numpy')
+
+IDAT_SIZE = 1 << 16
+
+
+class PNGWriter:
+    """Writes an RGBA png to a file object a band of rows at a time
+
+    Rows are filtered with the Up filter and fed through one zlib stream, so only the
+    previous row is kept between bands and any number of rows can be written.
+    """
+
+    def __init__(self, fp, width: int, height: int, compress_level: int = 6) -> None:
+        self.fp = fp
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = []
+        self._pending_size = 0
+        self._previous = np.zeros(width * 4, dtype=np.uint8)
+        fp.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self.fp.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data)))
+
+    def _compressed(self, data, flush=False):
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size >= IDAT_SIZE or (flush and self._pending):
+            self._chunk(b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def write(self, rows: np.ndarray):
+        """Appends a (rows, width, 4) uint8 RGBA array"""
+        if rows.shape[1:] != (self.width, 4):
+            raise ValueError(f'Rows must be {self.width} RGBA pixels wide, got shape {rows.shape}')
+        if self.rows + len(rows) > self.height:
+            raise ValueError(f'The image is {self.height} rows high')
+        data = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), -1)
+        filtered = np.empty((len(data), data.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        # Up filter, each byte minus the byte above it modulo 256
+        np.subtract(data[:1], self._previous, out=filtered[:1, 1:])
+        np.subtract(data[1:], data[:-1], out=filtered[1:, 1:])
+        self._compressed(self._compressor.compress(filtered.tobytes()))
+        if len(data):
+            self._previous = data[-1].copy()
+        self.rows += len(data)
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError(f'Only {self.rows} of {self.height} rows were written')
+        self._compressed(self._compressor.flush(), flush=True)
+        self._chunk(b'IEND', b'')
+
+
+class TIFFWriter:
+    """Writes an RGBA tiff to a seekable file object a band of rows at a time
+
+    Rows are stored as Deflate compressed strips of rows_per_strip rows. The directory
+    goes after the strips and the header is patched to point at it on close.
+    """
+
+    def __init__(self, fp, width: int, height: int, compress_level: int = 6, rows_per_strip: int = 64) -> None:
+        self.fp = fp
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self.compress_level = compress_level
+        self.rows_per_strip = rows_per_strip
+        self._start = fp.tell()
+        self._pending = []
+        self._pending_rows = 0
+        self._strips = []
+        fp.write(b'II*\x00' + struct.pack('<I', 0))
+
+    def write(self, rows: np.ndarray):
+        """Appends a (rows, width, 4) uint8 RGBA array"""
+        if rows.shape[1:] != (self.width, 4):
+            raise ValueError(f'Rows must be {self.width} RGBA pixels wide, got shape {rows.shape}')
+        if self.rows + len(rows) > self.height:
+            raise ValueError(f'The image is {self.height} rows high')
+        self._pending.append(np.ascontiguousarray(rows, dtype=np.uint8))
+        self._pending_rows += len(rows)
+        self.rows += len(rows)
+        while self._pending_rows >= self.rows_per_strip:
+            self._write_strip(self.rows_per_strip)
+
+    def _write_strip(self, count):
+        pending = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+        strip, rest = pending[:count], pending[count:]
+        self._pending = [rest] if len(rest) else []
+        self._pending_rows = len(rest)
+        data = zlib.compress(strip.tobytes(), self.compress_level)
+        self._strips.append((self.fp.tell() - self._start, len(data)))
+        self.fp.write(data)
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError(f'Only {self.rows} of {self.height} rows were written')
+        if self._pending_rows:
+            self._write_strip(self._pending_rows)
+        if self.fp.tell() % 2:
+            self.fp.write(b'\x00')
+        directory = self.fp.tell() - self._start
+        count = len(self._strips)
+        # values that do not fit the 4 bytes of an entry follow the directory
+        entries = 11
+        values = directory + 2 + entries * 12 + 4
+        bits, offsets, sizes = values, values + 8, values + 8 + 4 * count
+        if sizes + 4 * count > 0xFFFFFFFF:
+            raise ValueError('The image is too large for a classic tiff')
+        tags = [
+            (256, 4, 1, self.width),
+            (257, 4, 1, self.height),
+            (258, 3, 4, bits),
+            (259, 3, 1, 8),
+            (262, 3, 1, 2),
+            (273, 4, count, offsets if count > 1 else self._strips[0][0]),
+            (277, 3, 1, 4),
+            (278, 4, 1, self.rows_per_strip),
+            (279, 4, count, sizes if count > 1 else self._strips[0][1]),
+            (284, 3, 1, 1),
+            (338, 3, 1, 2),
+        ]
+        data = struct.pack('<H', entries)
+        for tag, kind, number, value in tags:
+            # a single short is stored in the first two bytes of the value
+            data += struct.pack('<HHI', tag, kind, number) + (struct.pack('<HH', value, 0) if kind == 3 and number == 1
+                                                              else struct.pack('<I', value))
+        data += struct.pack('<I', 0) + struct.pack('<4H', 8, 8, 8, 8)
+        data += struct.pack(f'<{count}I', *(offset for offset, _ in self._strips))
+        data += struct.pack(f'<{count}I', *(size for _, size in self._strips))
+        self.fp.write(data)
+        end = self.fp.tell()
+        self.fp.seek(self._start + 4)
+        self.fp.write(struct.pack('<I', directory))
+        self.fp.seek(end)
+
+
+WRITERS = {'png': PNGWriter, 'tiff': TIFFWriter}
+
+
+def render_striped(canvas: MapCanvas, output, format: Optional[str] = None, strip_height: int = TILE_SIZE,
+                   compress_level: int = 6):
+    """Renders the canvas's window in horizontal strips, streaming each strip to a png or tiff
+
+    Every strip has its tiles fetched and composited and the features touching it drawn
+    before its rows are written, so memory follows strip_height and the width of the map,
+    not its area. output is a path or a file object, a tiff one has to be seekable. The
+    format comes from the path's extension unless given. A heatmap needs a max_value so
+    all strips share one color scale. Returns the (width, height) written.
+    """
+    if format is None:
+        extension = os.path.splitext(str(output))[1].lower().lstrip('.') if isinstance(output, (str, os.PathLike)) else ''
+        format = {'tif': 'tiff', '': 'png'}.get(extension, extension)
+    if format not in WRITERS:
+        raise ValueError(f'Striped rendering writes png or tiff, not {format!r}')
+    if canvas.heatmap_style is not None and canvas.heatmap_style.max_value is None:
+        raise ValueError('Striped heatmaps need HeatmapStyle.max_value, every strip would be scaled on its own')
+    tiles = canvas._tiles
+    _, _, width, height = tiles.pixel_window
+    fp = open(output, 'wb') if isinstance(output, (str, os.PathLike)) else output
+    try:
+        writer = WRITERS[format](fp, width, height, compress_level=compress_level)
+        for strip in tiles.strips(strip_height):
+            canvas._tiles = strip
+            canvas.stitch_tiles()
+            frame = canvas.to_array()
+            with canvas.stats.span('encode'):
+                writer.write(frame)
+        with canvas.stats.span('encode'):
+            writer.close()
+    finally:
+        canvas._tiles = tiles
+        if fp is not output:
+            fp.close()
+    return width, height
+
+
+__all__ = ['render_striped', 'PNGWriter', 'TIFFWriter']
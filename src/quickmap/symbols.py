@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+resources = lazy_import('importlib.resources')
+
+
+@dataclass(frozen=True)
+class PointStyle:
+    '''Class for how point features are drawn'''
+    symbol: str = 'circle'
+    size: Optional[int] = None
+    color: Optional[Tuple[int, ...]] = None
+
+
+@dataclass(frozen=True)
+class PathStyle:
+    '''Class for how line and polygon features are drawn'''
+    stroke: Tuple[int, ...] = (40, 40, 40, 255)
+    width: int = 2
+    fill: Optional[Tuple[int, ...]] = (40, 40, 40, 64)
+
+
+@functools.lru_cache(maxsize=None)
+def load_symbol(name: str) -> Image.Image:
+    """Reads a symbol png from the icons package once"""
+    with resources.as_file(resources.files(__package__ + '.icons') / f'{name}.png') as path:
+        return Image.open(path).convert('RGBA')
+
+
+@functools.lru_cache(maxsize=256)
+def sprite(style: PointStyle) -> np.ndarray:
+    """Returns the style's symbol as a read only RGBA array, resized and tinted"""
+    image = load_symbol(style.symbol)
+    if style.size and style.size != image.width:
+        image = image.resize((style.size, style.size), Image.LANCZOS)
+    array = np.array(image)
+    if style.color:
+        array[..., :3] = style.color[:3]
+        if len(style.color) == 4:
+            array[..., 3] = (array[..., 3].astype(np.uint16) * style.color[3] // 255).astype(np.uint8)
+    array.flags.writeable = False
+    return array
+
+
+def stamp(frame: np.ndarray, xs: np.ndarray, ys: np.ndarray, sprite_array: np.ndarray, chunk_size: int = 1 << 16) -> int:
+    """Alpha composites sprite_array centered on every (xs, ys) pixel of an RGBA frame in place
+
+    The work is batched over the points instead of pasting one point at a time. Points whose
+    sprite falls fully outside the frame are culled. Returns the number of points drawn.
+    """
+    if not frame.flags.c_contiguous:
+        raise ValueError('frame must be a C contiguous RGBA array')
+    height, width = frame.shape[:2]
+    sprite_height, sprite_width = sprite_array.shape[:2]
+    left = np.asarray(xs, dtype=np.int64) - sprite_width // 2
+    top = np.asarray(ys, dtype=np.int64) - sprite_height // 2
+    visible = (left > -sprite_width) & (left < width) & (top > -sprite_height) & (top < height)
+    left, top = left[visible], top[visible]
+    if not len(left):
+        return 0
+    opaque = sprite_array[..., 3] > 0
+    if not opaque.any():
+        # a fully transparent sprite leaves the frame as it is
+        return 0
+    colors = sprite_array[opaque][:, :3]
+    if (colors == colors[0]).all():
+        _stamp_single_color(frame, left, top, sprite_array, chunk_size)
+    else:
+        for start in range(0, len(left), chunk_size):
+            _stamp_pixels(frame, left[start:start + chunk_size], top[start:start + chunk_size], sprite_array)
+    return len(left)
+
+
+def composite(frame: np.ndarray, layer: np.ndarray, left: int = 0, top: int = 0):
+    """Alpha composites an RGBA layer over frame in place with its top left corner at (left, top)"""
+    height, width = layer.shape[:2]
+    region = frame[top:top + height, left:left + width]
+    layer = layer[:region.shape[0], :region.shape[1]]
+    covered = layer[..., 3] > 0
+    if not covered.any():
+        return
+    source = layer[covered].astype(np.float32)
+    destination = region[covered].astype(np.float32)
+    source_alpha = source[:, 3:] / 255.0
+    destination_alpha = destination[:, 3:] / 255.0 * (1.0 - source_alpha)
+    alpha = source_alpha + destination_alpha
+    blended = np.empty_like(source)
+    blended[:, :3] = (source[:, :3] * source_alpha + destination[:, :3] * destination_alpha) / alpha
+    blended[:, 3] = alpha[:, 0] * 255.0
+    region[covered] = np.rint(blended).astype(np.uint8)
+
+
+def _stamp_single_color(frame, left, top, sprite_array, chunk_size):
+    # For a single color sprite the drawn points are a coverage mask holding the highest sprite
+    # alpha that lands on each pixel. Every offset with the same alpha is scattered at once and
+    # alphas are written in ascending order, so a plain assignment keeps the maximum.
+    height, width = frame.shape[:2]
+    sprite_height, sprite_width = sprite_array.shape[:2]
+    alphas = sprite_array[..., 3]
+    coverage = np.zeros(height * width, dtype=np.uint8)
+    # sprites fully inside the frame need no per pixel bounds checks
+    interior = (left >= 0) & (left <= width - sprite_width) & (top >= 0) & (top <= height - sprite_height)
+    origins = top[interior] * width + left[interior]
+    edge_left, edge_top = left[~interior], top[~interior]
+    for value in np.unique(alphas[alphas > 0]):
+        dy, dx = np.nonzero(alphas == value)
+        offsets = dy * width + dx
+        for start in range(0, len(origins), chunk_size):
+            coverage[(origins[start:start + chunk_size, None] + offsets).ravel()] = value
+        x = (edge_left[:, None] + dx).ravel()
+        y = (edge_top[:, None] + dy).ravel()
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        coverage[y[inside] * width + x[inside]] = value
+    index = np.flatnonzero(coverage)
+    color = sprite_array[alphas > 0][0, :3]
+    _blend(frame.reshape(-1, 4), index, color, coverage[index] / 255.0)
+
+
+def _stamp_pixels(frame, left, top, sprite_array):
+    height, width = frame.shape[:2]
+    pixels = frame.reshape(-1, 4)
+    for dy, dx in zip(*np.nonzero(sprite_array[..., 3])):
+        x = left + dx
+        y = top + dy
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        index = y[inside] * width + x[inside]
+        color = sprite_array[dy, dx]
+        _blend(pixels, index, color[:3], np.full(len(index), color[3] / 255.0))
+
+
+def _blend(pixels, index, color, source_alpha):
+    """Composites color with per pixel source_alpha over pixels[index]"""
+    source_alpha = source_alpha[:, None]
+    destination = pixels[index].astype(np.float32)
+    destination_alpha = destination[:, 3:] / 255.0 * (1.0 - source_alpha)
+    alpha = source_alpha + destination_alpha
+    rgb = (np.asarray(color, dtype=np.float32) * source_alpha + destination[:, :3] * destination_alpha) / alpha
+    pixels[index, :3] = np.rint(rgb).astype(np.uint8)
+    pixels[index, 3] = np.rint(alpha[:, 0] * 255).astype(np.uint8)
+
+
+__all__ = ['PointStyle', 'PathStyle']
@@ -1,10 +1,16 @@
 import math
 from dataclasses import dataclass
-from typing import Optional, List
-import urllib.request
+from typing import Optional, List, Tuple
+import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from .geometry import Point, BoundingBox
-from .meta import TILE_SIZE
+from .meta import MAX_LATITUDE, TILE_SIZE, lng_lat_to_pixel, pixel_to_lng_lat
+from .lazy import lazy_import
+from .source import AsyncTileSource, TileSource, TileNotFoundError, XYZTileSource
+from .stats import RenderStats
+
+asyncio = lazy_import('asyncio')
 
 @dataclass(unsafe_hash=True)
 class BaseTile:
@@ -36,34 +42,109 @@ class Tile(BaseTile):
         ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
         return cls(xtile, ytile, zoom)
 
-    def fetch(self):
-        url = f'https://tile.openstreetmap.org/{self.zoom}/{self.x}/{self.y}.png'
-        opener = urllib.request.build_opener()
-        opener.addheaders = [('User-agent', 'Python-Package: quickmap')]
-        image_data = opener.open(url)
+    def fetch(self, source=None, cache=None, stats: Optional[RenderStats] = None):
+        """Returns the tile image from source as a file object, reading through cache when one is given
+
+        Tiles read from the source and cache hits are counted on stats when given.
+        """
+        source = source or XYZTileSource()
+        if cache is None or not source.cacheable:
+            data, _ = source.fetch(self)
+            if stats is not None:
+                stats.count(tiles_fetched=1, bytes_downloaded=len(data))
+            return io.BytesIO(data)
+        cached = cache.get(source.name, self)
+        if cached is not None and not cached.stale:
+            if stats is not None:
+                stats.count(cache_hits=1)
+            return io.BytesIO(cached.data)
+        data, etag = source.fetch(self, etag=cached.etag if cached else None)
+        if data is None:
+            cache.revalidated(source.name, self)
+            if stats is not None:
+                stats.count(cache_hits=1)
+            return io.BytesIO(cached.data)
+        cache.put(source.name, self, data, etag)
+        if stats is not None:
+            stats.count(tiles_fetched=1, bytes_downloaded=len(data))
+        return io.BytesIO(data)
 
-        # image_data = urlopen(url)
-        return image_data
+    async def fetch_async(self, source, cache=None, stats: Optional[RenderStats] = None):
+        """Coroutine counterpart of fetch that reads from an AsyncTileSource, cache reads and writes run on a thread"""
+        if cache is None or not source.cacheable:
+            data, _ = await source.fetch(self)
+            if stats is not None:
+                stats.count(tiles_fetched=1, bytes_downloaded=len(data))
+            return io.BytesIO(data)
+        cached = await asyncio.to_thread(cache.get, source.name, self)
+        if cached is not None and not cached.stale:
+            if stats is not None:
+                stats.count(cache_hits=1)
+            return io.BytesIO(cached.data)
+        data, etag = await source.fetch(self, etag=cached.etag if cached else None)
+        if data is None:
+            await asyncio.to_thread(cache.revalidated, source.name, self)
+            if stats is not None:
+                stats.count(cache_hits=1)
+            return io.BytesIO(cached.data)
+        await asyncio.to_thread(cache.put, source.name, self, data, etag)
+        if stats is not None:
+            stats.count(tiles_fetched=1, bytes_downloaded=len(data))
+        return io.BytesIO(data)
 
     @property
     def bounds(self):
         """Gets the bounds of a tile represented as the most west and south point and the most east and north point"""
-        google_x, google_y = self.google
-        pixel_x_west, pixel_y_north = google_x * TILE_SIZE, google_y * TILE_SIZE
-        pixel_x_east, pixel_y_south = (google_x + 1) * TILE_SIZE, (google_y + 1) * TILE_SIZE
+        bounding_box = self.bounding_box
+        return Point(x=bounding_box.x_min, y=bounding_box.y_min), Point(x=bounding_box.x_max, y=bounding_box.y_max)
 
-        point_min = Point.from_pixel(pixel_x=pixel_x_west, pixel_y=pixel_y_south, zoom=self.zoom)
-        point_max = Point.from_pixel(pixel_x=pixel_x_east, pixel_y=pixel_y_north, zoom=self.zoom)
-        return point_min, point_max
+    @property
+    def bounding_box(self) -> BoundingBox:
+        return self.buffered_bounding_box(0)
+
+    @property
+    def children(self) -> List['Tile']:
+        """The four tiles of the next zoom that cover this tile"""
+        x, y, zoom = 2 * self.x, 2 * self.y, self.zoom + 1
+        return [Tile(x, y, zoom), Tile(x + 1, y, zoom), Tile(x, y + 1, zoom), Tile(x + 1, y + 1, zoom)]
+
+    def buffered_bounding_box(self, pixels) -> BoundingBox:
+        """Gets the lng/lat bounds of the tile grown by a number of pixels on every side"""
+        west, north = pixel_to_lng_lat(self.x * TILE_SIZE - pixels, self.y * TILE_SIZE - pixels, self.zoom)
+        east, south = pixel_to_lng_lat((self.x + 1) * TILE_SIZE + pixels, (self.y + 1) * TILE_SIZE + pixels, self.zoom)
+        return BoundingBox(x_min=west, x_max=east, y_min=south, y_max=north)
 
 
 class TileCollection:
 
     MAX_TILES = 16
+    MAX_ZOOM = 18
 
-    def __init__(self, zoom=15) -> None:
+    def __init__(self, zoom=15, source: Optional[TileSource] = None) -> None:
         self.tiles: List[Tile] = []
         self.zoom = zoom
+        self.source = source or XYZTileSource()
+        # (left, top, width, height) in pixels at zoom that is cut from the tiles, None for the whole tiles
+        self.window: Optional[Tuple[int, int, int, int]] = None
+
+    @classmethod
+    def covering(cls, bounding_box: BoundingBox, zoom, source: Optional[TileSource] = None):
+        """Creates a TileCollection with every tile at zoom that bounding_box touches"""
+        collection = cls(zoom=zoom, source=source)
+        x_min, x_max, y_min, y_max = cls.tile_range(bounding_box, zoom)
+        collection.tiles = [Tile(x=x, y=y, zoom=zoom) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+        return collection
+
+    @staticmethod
+    def tile_range(bounding_box: BoundingBox, zoom):
+        """Returns the (x_min, x_max, y_min, y_max) tile numbers at zoom that bounding_box touches"""
+        tiles = [Tile.for_latitude_longitude(lat=max(min(point.y, MAX_LATITUDE), -MAX_LATITUDE), lng=point.x, zoom=zoom)
+                 for point in bounding_box.as_points()]
+        # points on the east edge fall just outside the last tile of the row
+        last = 2 ** zoom - 1
+        x_min, x_max = max(min(n.x for n in tiles), 0), min(max(n.x for n in tiles), last)
+        y_min, y_max = max(min(n.y for n in tiles), 0), min(max(n.y for n in tiles), last)
+        return x_min, x_max, y_min, y_max
 
     def calculate_tiles(self, bounding_box: BoundingBox, lazy=True):
         searching = True
@@ -74,20 +155,154 @@ class TileCollection:
                 break
             self.zoom -= 1
 
-        tiles = [Tile.for_point(point, self.zoom) for point in bounding_box.as_points()]
-
-        tile_xs = [tile.x for tile in tiles]
-        tile_ys = [tile.y for tile in tiles]
-        for x in range(min(tile_xs), max(tile_xs) + 1):
-            for y in range(min(tile_ys), max(tile_ys) + 1):
-                self.tiles.append(Tile(x=x, y=y, zoom=self.zoom))
+        self.tiles = TileCollection.covering(bounding_box, self.zoom).tiles
+        self.window = None
         # if not lazy:
         #     self.fetch_tiles()
 
-    # def fetch_tiles(self):
-    #     for tile in self.tiles:
-    #         tile.fetch()
-    #         print('fetched')
+    def fit(self, bounding_box: BoundingBox, size: Tuple[int, int], padding: int = 0):
+        """Picks the highest zoom that fits bounding_box in size pixels less padding on every side
+
+        The window is a size pixel area centred on bounding_box and the tiles are only the
+        ones the window touches.
+        """
+        width, height = size
+        if width <= 2 * padding or height <= 2 * padding:
+            raise ValueError(f'Size {size} leaves no room inside padding {padding}')
+        if bounding_box.is_empty:
+            raise ValueError('Cannot fit an empty bounding box')
+        left, top = lng_lat_to_pixel(bounding_box.x_min, bounding_box.y_max, 0)
+        right, bottom = lng_lat_to_pixel(bounding_box.x_max, bounding_box.y_min, 0)
+        # spans double with every zoom level, so the zoom follows from the ratio of the spans at zoom 0
+        zoom = self.MAX_ZOOM
+        if right > left:
+            zoom = min(zoom, math.floor(math.log2((width - 2 * padding) / (right - left))))
+        if bottom > top:
+            zoom = min(zoom, math.floor(math.log2((height - 2 * padding) / (bottom - top))))
+        self.zoom = max(zoom, 0)
+        scale = 2 ** self.zoom
+        window_left = round((left + right) / 2 * scale - width / 2)
+        window_top = round((top + bottom) / 2 * scale - height / 2)
+        self.set_window((window_left, window_top, width, height))
+
+    def frame(self, bounding_box: BoundingBox, zoom, padding: int = 0):
+        """Sets the window to bounding_box at zoom with padding pixels on every side, however large that is"""
+        if bounding_box.is_empty:
+            raise ValueError('Cannot frame an empty bounding box')
+        self.zoom = zoom
+        left, top = lng_lat_to_pixel(bounding_box.x_min, bounding_box.y_max, zoom)
+        right, bottom = lng_lat_to_pixel(bounding_box.x_max, bounding_box.y_min, zoom)
+        left, top = math.floor(left) - padding, math.floor(top) - padding
+        right, bottom = math.ceil(right) + padding, math.ceil(bottom) + padding
+        self.set_window((left, top, max(right - left, 1), max(bottom - top, 1)))
+
+    def set_window(self, window: Tuple[int, int, int, int]):
+        """Sets the (left, top, width, height) pixel window at zoom and keeps the tiles it touches"""
+        self.window = window
+        left, top, width, height = window
+        last = 2 ** self.zoom - 1
+        x_min, x_max = max(left // TILE_SIZE, 0), min((left + width - 1) // TILE_SIZE, last)
+        y_min, y_max = max(top // TILE_SIZE, 0), min((top + height - 1) // TILE_SIZE, last)
+        self.tiles = [Tile(x=x, y=y, zoom=self.zoom) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+    def strips(self, height: int = TILE_SIZE):
+        """Yields a TileCollection for every horizontal strip of the window, from the top down
+
+        Strips are at most height pixels tall, rounded up to whole tile rows, and end on tile
+        row boundaries, so no tile belongs to two strips.
+        """
+        left, top, width, window_height = self.pixel_window
+        step = max(1, math.ceil(height / TILE_SIZE)) * TILE_SIZE
+        strip_top = top
+        while strip_top < top + window_height:
+            strip_bottom = min(top + window_height, (strip_top // step + 1) * step)
+            strip = TileCollection(zoom=self.zoom, source=self.source)
+            strip.set_window((left, strip_top, width, strip_bottom - strip_top))
+            yield strip
+            strip_top = strip_bottom
+
+    @property
+    def pixel_window(self) -> Tuple[int, int, int, int]:
+        """(left, top, width, height) in pixels at zoom of the area the tiles are stitched into"""
+        if self.window is not None:
+            return self.window
+        return (self.min_x_tile * TILE_SIZE, self.min_y_tile * TILE_SIZE,
+                self.x_tiles * TILE_SIZE, self.y_tiles * TILE_SIZE)
+
+    def visible_part(self, tile: Tile):
+        """(left, top, right, bottom) in pixels at zoom of the part of tile inside the window"""
+        left, top, width, height = self.pixel_window
+        return (max(tile.x * TILE_SIZE, left), max(tile.y * TILE_SIZE, top),
+                min((tile.x + 1) * TILE_SIZE, left + width), min((tile.y + 1) * TILE_SIZE, top + height))
+
+    def fetch_tiles(self, cache=None, workers=8, decode=None, tiles=None, stats: Optional[RenderStats] = None):
+        """Fetches the tiles, or only the given tiles, on a pool of workers and yields (tile, image) as each one completes
+
+        decode is called on the fetched file object inside the worker, so decoding overlaps
+        with the remaining downloads. Tiles missing from the source are skipped. Fetch and
+        decode times and the tile counters are added to stats when given.
+        """
+        stats = RenderStats() if stats is None else stats
+        def load(tile):
+            try:
+                with stats.span('fetch'):
+                    image = tile.fetch(source=self.source, cache=cache, stats=stats)
+            except TileNotFoundError:
+                return None
+            return load_data(image)
+        def load_data(image):
+            if not decode:
+                return image
+            with stats.span('decode'):
+                return decode(image)
+        tiles = self.tiles if tiles is None else tiles
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            if self.source.batched:
+                with stats.span('fetch'):
+                    fetched = list(self.source.fetch_many(tiles))
+                stats.count(tiles_fetched=len(fetched), bytes_downloaded=sum(len(data) for _, data in fetched))
+                futures = {executor.submit(load_data, io.BytesIO(data)): tile for tile, data in fetched}
+            else:
+                futures = {executor.submit(load, tile): tile for tile in tiles}
+            for future in as_completed(futures):
+                image = future.result()
+                if image is not None:
+                    yield futures[future], image
+
+    async def fetch_tiles_async(self, source: Optional[AsyncTileSource] = None, cache=None, decode=None, tiles=None,
+                                stats: Optional[RenderStats] = None, timeout: Optional[float] = None):
+        """Fetches the tiles concurrently on the running event loop and yields (tile, image) as each one completes
+
+        source defaults to the async counterpart of the collection's source. decode runs on
+        the loop's default executor. Every tile gets timeout seconds, a tile that takes
+        longer raises TimeoutError. Leaving the iteration early or cancelling it cancels the
+        fetches still running. Tiles missing from the source are skipped.
+        """
+        source = source or AsyncTileSource.from_source(self.source)
+        stats = RenderStats() if stats is None else stats
+        loop = asyncio.get_running_loop()
+        def timed_decode(image):
+            with stats.span('decode'):
+                return decode(image)
+        async def load(tile):
+            try:
+                with stats.span('fetch'):
+                    image = await asyncio.wait_for(tile.fetch_async(source, cache=cache, stats=stats), timeout)
+            except TileNotFoundError:
+                return tile, None
+            if decode:
+                image = await loop.run_in_executor(None, timed_decode, image)
+            return tile, image
+        tasks = [asyncio.ensure_future(load(tile)) for tile in (self.tiles if tiles is None else tiles)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                tile, image = await next_done
+                if image is not None:
+                    yield tile, image
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     @property
     def min_x_tile(self):
@@ -105,6 +320,13 @@ class TileCollection:
     def max_y_tile(self):
         return max([tile.y for tile in self.tiles])
 
+    def buffered_bounding_box(self, pixels) -> BoundingBox:
+        """Gets the lng/lat bounds of the window grown by a number of pixels on every side"""
+        left, top, width, height = self.pixel_window
+        west, north = pixel_to_lng_lat(left - pixels, top - pixels, self.zoom)
+        east, south = pixel_to_lng_lat(left + width + pixels, top + height + pixels, self.zoom)
+        return BoundingBox(x_min=west, x_max=east, y_min=south, y_max=north)
+
     @property
     def x_tiles(self):
         return (self.max_x_tile - self.min_x_tile) + 1
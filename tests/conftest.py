@@ -0,0 +1,59 @@
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+import pytest
+
+
+class StandInTileServer(ThreadingHTTPServer):
+    """Local stand-in for an XYZ tile server that answers every tile after latency seconds"""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), StandInTileHandler)
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        buffer = io.BytesIO()
+        Image.new('RGBA', (256, 256), (200, 220, 200, 255)).save(buffer, format='PNG')
+        self.png = buffer.getvalue()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}/{{zoom}}/{{x}}/{{y}}.png'
+
+
+class StandInTileHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 1 << 16
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(self.server.png)))
+        self.end_headers()
+        self.wfile.write(self.server.png)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def tile_server():
+    server = StandInTileServer(latency=0.05)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,92 @@
+import asyncio
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+from quickmap import QuickMap, XYZTileSource
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import Point
+from quickmap.session import AsyncTileSession, TileSession
+from quickmap.source import AsyncTileSource, AsyncXYZTileSource, DirectoryTileSource, ThreadedTileSource
+from quickmap.tile import Tile
+
+
+def quick_map(url, **kwargs):
+    fc = FeatureCollection([Feature(geometry=Point(-87.65 + i / 10, 41.85), properties={}) for i in range(5)])
+    quick_map = QuickMap(fc, source=XYZTileSource(url, TileSession(max_per_host=8)), **kwargs)
+    quick_map.cover_tiles()
+    return quick_map
+
+def test_render_async_matches_save_png(tile_server, tmp_path):
+    async_map = quick_map(tile_server.url)
+    data = asyncio.run(async_map.render_async(tmp_path / 'async.png'))
+    assert (tmp_path / 'async.png').read_bytes() == data
+    tiles = len(async_map.canvas._tiles.tiles)
+    assert tile_server.requests == tiles
+    assert async_map.render_stats.tiles_fetched == tiles
+
+    sync_map = quick_map(tile_server.url)
+    sync_map.save_png(tmp_path / 'sync.png')
+    assert Image.open(io.BytesIO(data)).tobytes() == Image.open(tmp_path / 'sync.png').tobytes()
+
+def test_tiles_are_fetched_concurrently(tile_server):
+    async def fetch_all():
+        source = AsyncXYZTileSource(tile_server.url, AsyncTileSession(max_per_host=8))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        bodies = await asyncio.gather(*(source.fetch(Tile(x, 0, 4)) for x in range(16)))
+        elapsed = loop.time() - start
+        await source.close()
+        return bodies, elapsed
+    bodies, elapsed = asyncio.run(fetch_all())
+    assert all(body == tile_server.png for body, _ in bodies)
+    assert elapsed < 16 * tile_server.latency / 2
+    # connections are kept alive and reused
+    assert tile_server.connections <= 8
+
+def test_stitch_runs_off_the_loop(tile_server):
+    async_map = quick_map(tile_server.url)
+    canvas = async_map.canvas
+    threads = []
+    for name in ('_start_stitch', '_paste_tile'):
+        method = getattr(canvas, name)
+        def record(*args, method=method):
+            threads.append(threading.get_ident())
+            return method(*args)
+        setattr(canvas, name, record)
+    asyncio.run(async_map.render_async())
+    assert len(threads) == len(canvas._tiles.tiles) + 1
+    assert threading.get_ident() not in threads
+
+def test_tile_timeout(tile_server):
+    tile_server.latency = 1.0
+    with pytest.raises(TimeoutError):
+        asyncio.run(quick_map(tile_server.url).render_async(tile_timeout=0.1))
+
+def test_cancelled_render_can_be_retried(tile_server):
+    async def cancel_then_render(quick_map):
+        task = asyncio.ensure_future(quick_map.render_async())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        data = await quick_map.render_async()
+        await quick_map.aclose()
+        return data
+    data = asyncio.run(cancel_then_render(quick_map(tile_server.url)))
+    assert Image.open(io.BytesIO(data)).format == 'PNG'
+
+def test_blocking_sources_run_on_threads(tmp_path):
+    (tmp_path / '3' / '2').mkdir(parents=True)
+    (tmp_path / '3' / '2' / '1.png').write_bytes(b'png')
+    source = AsyncTileSource.from_source(DirectoryTileSource(str(tmp_path)))
+    assert isinstance(source, ThreadedTileSource)
+    assert asyncio.run(source.fetch(Tile(2, 1, 3))) == (b'png', None)
+
+def test_session_address():
+    assert AsyncTileSession._address('http', 'tiles.example.com') == ('tiles.example.com', 80)
+    assert AsyncTileSession._address('https', 'tiles.example.com:8443') == ('tiles.example.com', 8443)
+    assert AsyncTileSession._address('http', '[::1]') == ('::1', 80)
+    assert AsyncTileSession._address('https', '[2001:db8::1]:8080') == ('2001:db8::1', 8080)
@@ -0,0 +1,64 @@
+import subprocess
+import sys
+
+from PIL import Image
+
+from quickmap import batch
+from quickmap.batch import render_batch
+from quickmap.feature import FeatureCollection
+from quickmap.source import XYZTileSource
+from quickmap.tile import TileCollection
+
+from .test_feature_collection import geojson
+
+def point(lng, lat):
+    return {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [lng, lat]}}
+
+def test_render_batch_shares_tiles(tile_server, tmp_path):
+    jobs = [({'type': 'FeatureCollection', 'features': [point(-87.65, 41.85), point(-87.64, 41.86)]}, tmp_path / 'a.png'),
+            ({'type': 'FeatureCollection', 'features': [point(-87.65, 41.85), point(-87.64, 41.86)]}, tmp_path / 'b.png'),
+            ({'type': 'FeatureCollection', 'features': []}, tmp_path / 'empty.png'),
+            (geojson, tmp_path / 'c.png')]
+    results = render_batch(jobs, source=XYZTileSource(tile_server.url), processes=2)
+    assert [r.error is None for r in results] == [True, True, False, True]
+    assert 'no features' in results[2].error
+    assert all(r.seconds > 0 for r in results if r.error is None)
+    assert Image.open(tmp_path / 'a.png').size == Image.open(tmp_path / 'b.png').size
+    # a and b need the same tiles, so every distinct tile is fetched once
+    needed = set()
+    for data, _ in jobs[:1] + jobs[3:]:
+        fc = FeatureCollection()
+        fc.load_geojson(data)
+        tiles = TileCollection()
+        tiles.calculate_tiles(fc.bounding_box)
+        needed.update(tiles.tiles)
+    assert tile_server.requests == len(needed)
+
+def test_render_batch_without_shared_memory(tile_server, tmp_path, monkeypatch):
+    # one tile per wave and no room in shared memory
+    monkeypatch.setattr(batch, 'WAVE_BYTES', batch.TILE_BYTES)
+    monkeypatch.setattr(batch, '_allocate', lambda size: None)
+    jobs = [({'type': 'FeatureCollection', 'features': [point(-87.65 + i / 10, 41.85)]}, tmp_path / f'{i}.png')
+            for i in range(3)]
+    results = render_batch(jobs, source=XYZTileSource(tile_server.url), processes=2)
+    assert all(r.error is None for r in results), results
+    assert Image.open(tmp_path / '0.png').getextrema()[3][1] == 255
+
+def test_render_batch_leaks_no_shared_memory(tile_server, tmp_path):
+    # warnings of the resource trackers are printed when they shut down, so the batch runs in its own interpreter
+    script = f'''
+from multiprocessing import resource_tracker
+from quickmap.batch import render_batch
+from quickmap.source import XYZTileSource
+{point.__name__} = lambda lng, lat: {{'type': 'Feature', 'properties': {{}}, 'geometry': {{'type': 'Point', 'coordinates': [lng, lat]}}}}
+jobs = [({{'type': 'FeatureCollection', 'features': [point(-87.65 + i / 100, 41.85)]}}, {str(tmp_path)!r} + f'/{{i}}.png')
+        for i in range(4)]
+for shared_tracker in (False, True):
+    if shared_tracker:
+        resource_tracker.ensure_running()
+    results = render_batch(jobs, source=XYZTileSource({tile_server.url!r}), processes=2)
+    assert all(r.error is None for r in results), results
+'''
+    process = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=120)
+    assert process.returncode == 0, process.stderr
+    assert 'resource_tracker' not in process.stderr and 'Traceback' not in process.stderr, process.stderr
@@ -0,0 +1,117 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from quickmap.binary import FeatureArrays, FeatureFile, open_features, write_features
+from quickmap.canvas import MapCanvas
+from quickmap.cluster import ClusterStyle
+from quickmap.columnar import PointArray
+from quickmap.density import HeatmapStyle
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import BoundingBox, LineString, Point, Polygon
+from quickmap.quickmap import QuickMap
+
+
+@pytest.fixture
+def features():
+    return FeatureCollection([
+        Feature(Point(-90.0, 40.0), {'name': 'a', 'rank': 1}),
+        Feature(LineString([[[-91.0, 41.0], [-92.0, 42.0]], [[-93.0, 43.0], [-94.0, 44.0], [-95.0, 44.5]]]),
+                {'nested': {'list': [1, 2]}, 'missing': None}),
+        Feature(Polygon([[[[0, 0], [4, 0], [4, 4], [0, 0]], [[1, 1], [2, 1], [2, 2], [1, 1]]],
+                         [[[10, 10], [11, 10], [11, 11], [10, 10]]]]), {}),
+        Feature(Point(-89.5, 39.5), {'name': 'b'}),
+    ])
+
+def test_round_trip(features, tmp_path):
+    path = tmp_path / 'features.qmf'
+    assert features.to_binary(path) == 4
+    loaded = FeatureCollection.from_binary(path)
+    assert loaded.bounding_box == features.bounding_box
+    for original, feature in zip(features.features, loaded.features):
+        assert feature.properties == original.properties
+        assert type(feature.geometry) is type(original.geometry)
+        if isinstance(original.geometry, Point):
+            assert feature.geometry == original.geometry
+        else:
+            assert len(feature.geometry.parts) == len(original.geometry.parts)
+            for part, original_part in zip(feature.geometry.parts, original.geometry.parts):
+                assert np.array_equal(part, original_part)
+    assert loaded.features[2].geometry.rings == [2, 1]
+
+def test_arrays_are_mapped_from_the_file(tmp_path):
+    points = PointArray(np.linspace(-100, -90, 1000), np.linspace(30, 40, 1000))
+    path = tmp_path / 'points.qmf'
+    write_features(points, path)
+    feature_file = open_features(path)
+    assert isinstance(feature_file.x, np.memmap)
+    mapped = feature_file.to_point_array()
+    assert np.shares_memory(mapped.x, feature_file.x)
+    assert np.array_equal(mapped.x, points.x) and np.array_equal(mapped.y, points.y)
+    assert feature_file[-1].geometry == Point(-90.0, 40.0)
+    assert feature_file.bounding_box == points.bounding_box
+
+def test_query_by_bounding_box(features, tmp_path):
+    path = tmp_path / 'features.qmf'
+    features.to_binary(path)
+    feature_file = FeatureFile(path)
+    box = BoundingBox(x_min=-90.5, x_max=-89.0, y_min=39.0, y_max=41.0)
+    assert feature_file.within(box).tolist() == [0, 3]
+    assert len(feature_file.to_point_array(feature_file.within(BoundingBox(x_min=-100, x_max=20, y_min=0, y_max=50)))) == 2
+    assert [n.properties['name'] for n in FeatureCollection.from_binary(path, box).features] == ['a', 'b']
+
+def test_pickles_by_path(features, tmp_path):
+    path = tmp_path / 'features.qmf'
+    features.to_binary(path)
+    feature_file = pickle.loads(pickle.dumps(FeatureFile(path)))
+    assert len(feature_file) == 4 and feature_file[0].properties == {'name': 'a', 'rank': 1}
+
+def test_empty_and_invalid_files(tmp_path):
+    path = tmp_path / 'empty.qmf'
+    FeatureCollection().to_binary(path)
+    assert len(open_features(path)) == 0
+    assert open_features(path).bounding_box.is_empty
+    other = tmp_path / 'other.qmf'
+    other.write_bytes(b'not a feature file at all')
+    with pytest.raises(ValueError):
+        open_features(other)
+
+def test_feature_arrays_pickle(features):
+    arrays = pickle.loads(pickle.dumps(FeatureArrays.from_features(features)))
+    assert len(arrays) == 4 and arrays.bounding_box == features.bounding_box
+    assert [feature.properties for feature in arrays.features()] == [feature.properties for feature in features.features]
+    assert arrays[3].geometry == Point(-89.5, 39.5)
+
+def render(source, bounding_box, **styles):
+    canvas = MapCanvas(source)
+    for name, value in styles.items():
+        setattr(canvas, name, value)
+    canvas._tiles.fit(bounding_box, (300, 200), padding=10)
+    canvas.stitch_tiles(images={})
+    return canvas.to_array().copy()
+
+def test_renders_arrays_like_features(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    fc = FeatureCollection([Feature(Point(x, y), {'value': i}) for i, (x, y) in
+                            enumerate(zip(rng.uniform(-91, -89, 300), rng.uniform(39, 41, 300)))])
+    fc.add(Feature(LineString([[[-91.0, 39.0], [-89.0, 41.0]]]), {}))
+    path = tmp_path / 'layer.qmf'
+    fc.to_binary(path)
+    built = []
+    features = FeatureFile.features
+    monkeypatch.setattr(FeatureFile, 'features', lambda self, indices=None: built.extend(features(self, indices)) or iter(built))
+    box = fc.bounding_box
+    assert np.array_equal(render(open_features(path), box), render(fc, box))
+    assert len(built) == 1 and isinstance(built[0].geometry, LineString)
+    points = fc.to_point_array()
+    for styles in ({}, {'cluster_style': ClusterStyle(labels=False)}, {'heatmap_style': HeatmapStyle(max_value=5)}):
+        expected = render(FeatureCollection([n for n in fc.features if isinstance(n.geometry, Point)]), box, **styles)
+        assert np.array_equal(render(points, box, **styles), expected)
+    with pytest.raises(ValueError):
+        render(points, box, style_function=lambda feature: None)
+
+def test_empty_array_layer_is_kept():
+    points = PointArray([], [])
+    quick_map = QuickMap(points)
+    assert quick_map.canvas._feature_collection is points
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from quickmap import QuickMap
+from quickmap.bulk import expand_paths, load_many
+from quickmap.feature import FeatureCollection
+from quickmap.geometry import BoundingBox
+from quickmap.io_service import dumps, json_backend, read_geojson, set_json_backend
+
+
+def points(start, count):
+    return {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-100.0 + i * 0.5, 30.0 + i * 0.25]},
+         'properties': {'id': i}} for i in range(start, start + count)]}
+
+def large(properties):
+    return properties['id'] >= 5
+
+@pytest.fixture
+def files(tmp_path):
+    for n in range(4):
+        (tmp_path / f'{n}.geojson').write_text(json.dumps(points(n * 3, 3)))
+    (tmp_path / 'notes.txt').write_text('not geojson')
+    return tmp_path
+
+def test_expand_paths(files):
+    expected = [str(files / f'{n}.geojson') for n in range(4)]
+    assert expand_paths(files) == expected
+    assert expand_paths(str(files / '*.geojson')) == expected
+    assert expand_paths(expected[::-1]) == expected[::-1]
+    assert expand_paths(expected[0]) == expected[:1]
+
+def test_loads_in_order(files):
+    feature_collection, results = load_many(files, processes=1)
+    assert [feature.properties['id'] for feature in feature_collection.features] == list(range(12))
+    assert [result.features for result in results] == [3] * 4
+    assert all(result.error is None and result.seconds >= 0 for result in results)
+    expected = FeatureCollection()
+    expected.extend(feature for n in range(4) for feature in FeatureCollection.get_features(points(n * 3, 3)))
+    assert feature_collection.bounding_box == expected.bounding_box
+    assert results[1].bounding_box == BoundingBox(x_min=-98.5, x_max=-97.5, y_min=30.75, y_max=31.25)
+
+def test_pool_matches_serial(files):
+    serial, _ = load_many(files, processes=1, where=large)
+    pooled, results = load_many(files, processes=2, where=large)
+    assert [feature.properties for feature in pooled.features] == [feature.properties for feature in serial.features]
+    assert [result.features for result in results] == [0, 1, 3, 3]
+    assert pooled.bounding_box == serial.bounding_box
+
+def test_bad_file_is_reported(files):
+    (files / '2.geojson').write_text('{"type": "FeatureCollection", "features": [')
+    feature_collection, results = load_many(files, processes=2)
+    assert len(feature_collection.features) == 9
+    assert results[2].error and results[2].features == 0 and results[2].bounding_box is None
+    assert all(result.error is None for i, result in enumerate(results) if i != 2)
+
+def test_bounding_box_filter(files):
+    box = BoundingBox(x_min=-99.0, x_max=-97.0, y_min=29.0, y_max=32.0)
+    feature_collection, _ = load_many(files, processes=1, bounding_box=box)
+    assert [feature.properties['id'] for feature in feature_collection.features] == [2, 3, 4, 5, 6]
+
+def test_json_backend():
+    backend = json_backend()
+    try:
+        assert set_json_backend('json') == json_backend() == 'json'
+        assert read_geojson('{"type": "FeatureCollection", "features": []}')['features'] == []
+        with pytest.raises(ImportError):
+            set_json_backend('no_such_json_module')
+    finally:
+        set_json_backend(backend)
+
+def test_quickmap_load_many(files):
+    quick_map = QuickMap(size=(400, 300))
+    results = quick_map.load_many(files, processes=1)
+    assert len(results) == 4 and len(quick_map._feature_collection.features) == 12
+    assert quick_map.render_stats.spans['parse'] > 0
+    assert quick_map.canvas._tiles.tiles
+
+def test_json_backends_write_compact_bytes():
+    backend = json_backend()
+    try:
+        for name in ('json', backend):
+            set_json_backend(name)
+            assert dumps({'a': [1, 2.5, None], 1: 'b'}) == b'{"a":[1,2.5,null],"1":"b"}'
+    finally:
+        set_json_backend(backend)
@@ -0,0 +1,56 @@
+from quickmap.cache import TileCache
+from quickmap.source import TileSource, TILE_URL
+from quickmap.tile import Tile
+
+import pytest
+
+@pytest.fixture
+def cache(tmp_path):
+    return TileCache(str(tmp_path / 'tiles.sqlite'), max_bytes=10)
+
+def test_hit_and_miss(cache):
+    tile = Tile(1, 2, 3)
+    assert cache.get(TILE_URL, tile) is None
+    cache.put(TILE_URL, tile, b'abc', etag='"1"')
+    cached = cache.get(TILE_URL, tile)
+    assert cached.data == b'abc'
+    assert cached.etag == '"1"'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_lru_eviction(cache):
+    first, second, third = Tile(0, 0, 1), Tile(1, 0, 1), Tile(0, 1, 1)
+    cache.put(TILE_URL, first, b'1234')
+    cache.put(TILE_URL, second, b'1234')
+    cache.get(TILE_URL, first)
+    cache.put(TILE_URL, third, b'1234')
+    assert (TILE_URL, first) in cache
+    assert (TILE_URL, second) not in cache
+    assert cache.size == 8
+
+class CountingSource(TileSource):
+    name = 'counting'
+
+    def __init__(self, etag_current=False):
+        self.etag_current = etag_current
+        self.fetched = []
+
+    def fetch(self, tile, etag=None):
+        self.fetched.append(tile)
+        if self.etag_current:
+            return None, etag
+        return b'png', None
+
+def test_fetch_reads_through(cache):
+    source = CountingSource()
+    tile = Tile(1, 1, 1)
+    assert tile.fetch(source=source, cache=cache).read() == b'png'
+    assert tile.fetch(source=source, cache=cache).read() == b'png'
+    assert len(source.fetched) == 1
+
+def test_stale_tile_is_revalidated(tmp_path):
+    cache = TileCache(str(tmp_path / 'tiles.sqlite'), ttl=0)
+    source = CountingSource(etag_current=True)
+    tile = Tile(1, 1, 1)
+    cache.put(source.name, tile, b'png', etag='"1"')
+    assert tile.fetch(source=source, cache=cache).read() == b'png'
+    assert cache.revalidations == 1
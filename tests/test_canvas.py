@@ -0,0 +1,111 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from quickmap import QuickMap
+from quickmap.canvas import MapCanvas
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import BoundingBox, Point
+from quickmap.meta import lng_lat_to_pixel
+from quickmap.source import TileSource, XYZTileSource
+from quickmap.tile import TileCollection
+
+
+def point_feature(lng, lat):
+    return Feature(geometry=Point(lng, lat), properties={})
+
+def test_growing_extent_fetches_only_new_tiles(tile_server):
+    canvas = MapCanvas(FeatureCollection(), source=XYZTileSource(tile_server.url))
+    canvas._tiles.calculate_tiles(BoundingBox(x_min=-90.0, y_min=40.0, x_max=-89.99, y_max=40.01))
+    canvas.stitch_tiles()
+    first = tile_server.requests
+    assert first == len(canvas._tiles.tiles)
+    canvas.stitch_tiles()
+    assert tile_server.requests == first
+    old = {(tile.x, tile.y) for tile in canvas._tiles.tiles}
+    canvas._tiles.calculate_tiles(BoundingBox(x_min=-90.0, y_min=40.0, x_max=-89.98, y_max=40.01))
+    canvas.stitch_tiles()
+    new = {(tile.x, tile.y) for tile in canvas._tiles.tiles}
+    assert new - old and old & new
+    assert tile_server.requests - first == len(new - old)
+    assert np.asarray(canvas._basemap)[..., 3].all()
+
+def test_appended_features_are_drawn_incrementally(monkeypatch):
+    fc = FeatureCollection([point_feature(-90.0, 40.0)])
+    canvas = MapCanvas(fc)
+    canvas._tiles.calculate_tiles(BoundingBox(x_min=-90.01, y_min=39.99, x_max=-89.99, y_max=40.01))
+    canvas.stitch_tiles(images={})
+    canvas.render()
+    first = np.asarray(canvas._image).copy()
+
+    drawn = []
+    draw_features = canvas.draw_features
+    monkeypatch.setattr(canvas, 'draw_features', lambda features=None: drawn.append(features) or draw_features(features))
+    fc.add(point_feature(-90.005, 40.005))
+    canvas.render()
+    assert [len(features) for features in drawn] == [1]
+
+    full = MapCanvas(fc)
+    full._tiles = canvas._tiles
+    full.stitch_tiles(images={})
+    full.render()
+    assert np.array_equal(np.asarray(canvas._image), np.asarray(full._image))
+    assert not np.array_equal(np.asarray(canvas._image), first)
+
+    fc.remove(fc.features[1])
+    canvas.render()
+    assert drawn[-1] is None
+    assert np.array_equal(np.asarray(canvas._image), first)
+
+class GridTileSource(TileSource):
+    """Answers every tile with a png coloured after its x and y"""
+
+    name = 'grid'
+    cacheable = False
+
+    def __init__(self):
+        self.fetched = []
+
+    def fetch(self, tile, etag=None):
+        self.fetched.append(tile)
+        buffer = io.BytesIO()
+        image = Image.new('RGBA', (256, 256), (tile.x % 256, tile.y % 256, 0, 255))
+        image.putpixel((0, 0), (255, 255, 255, 255))
+        image.save(buffer, format='PNG')
+        return buffer.getvalue(), None
+
+def test_fit_stitches_only_the_window():
+    box = BoundingBox(x_min=-90.0, x_max=-87.0, y_min=40.0, y_max=42.0)
+    source = GridTileSource()
+    canvas = MapCanvas(FeatureCollection(), source=source)
+    canvas._tiles.fit(box, (400, 300), padding=20)
+    canvas.stitch_tiles()
+    assert canvas._basemap.size == (400, 300)
+    assert sorted(source.fetched, key=lambda n: (n.x, n.y)) == sorted(canvas._tiles.tiles, key=lambda n: (n.x, n.y))
+
+    mosaic = MapCanvas(FeatureCollection(), source=GridTileSource())
+    mosaic._tiles = TileCollection(zoom=canvas._tiles.zoom, source=mosaic._tiles.source)
+    mosaic._tiles.tiles = canvas._tiles.tiles
+    mosaic.stitch_tiles()
+    left, top, width, height = canvas._tiles.window
+    mosaic_left, mosaic_top, _, _ = mosaic._tiles.pixel_window
+    expected = mosaic._basemap.crop((left - mosaic_left, top - mosaic_top, left - mosaic_left + width, top - mosaic_top + height))
+    assert np.array_equal(np.asarray(canvas._basemap), np.asarray(expected))
+
+    # moving the window by a few pixels only fetches the tiles it newly touches
+    fetched = len(source.fetched)
+    canvas._tiles.window = (left + 300, top, width, height)
+    canvas._tiles.tiles = TileCollection.covering(canvas._tiles.buffered_bounding_box(-1), canvas._tiles.zoom).tiles
+    canvas.stitch_tiles()
+    assert 0 < len(source.fetched) - fetched < len(canvas._tiles.tiles)
+
+def test_quickmap_output_size(tmp_path):
+    fc = FeatureCollection([point_feature(-90.0, 40.0), point_feature(-87.0, 42.0)])
+    quick_map = QuickMap(fc, source=GridTileSource(), size=(400, 300), padding=20)
+    quick_map.render_basemap()
+    quick_map.save_png(tmp_path / 'map.png')
+    assert Image.open(tmp_path / 'map.png').size == (400, 300)
+    for feature in fc.features:
+        x, y = quick_map.canvas.translated(*lng_lat_to_pixel(feature.geometry.x, feature.geometry.y, quick_map.canvas._tiles.zoom))
+        assert 20 - 1 <= x <= 380 + 1 and 20 - 1 <= y <= 280 + 1
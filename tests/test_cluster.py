@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from quickmap.canvas import MapCanvas
+from quickmap.cluster import ClusterIndex, ClusterStyle
+from quickmap.columnar import PointArray
+from quickmap.geometry import BoundingBox
+
+WORLD = BoundingBox(x_min=-180.0, x_max=180.0, y_min=-85.0, y_max=85.0)
+
+
+def random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return PointArray(rng.uniform(-100.0, -90.0, n), rng.uniform(30.0, 40.0, n))
+
+def test_clusters_keep_every_point_at_every_zoom():
+    index = ClusterIndex(random_points(5000), max_zoom=14)
+    counts = [len(index.clusters(WORLD, zoom)) for zoom in range(0, 16)]
+    for zoom in range(0, 16):
+        assert index.clusters(WORLD, zoom).properties['count'].sum() == 5000
+    assert counts[0] == 1
+    assert counts == sorted(counts)
+    assert counts[-1] == 5000
+
+def test_cluster_is_the_centroid_of_its_points():
+    points = PointArray([10.0, 10.001, 10.002], [20.0, 20.0, 20.003])
+    clusters = ClusterIndex(points).clusters(WORLD, 5)
+    assert clusters.properties['count'].tolist() == [3]
+    assert clusters.x[0] == pytest.approx(10.001)
+    assert clusters.y[0] == pytest.approx(20.001, abs=1e-5)
+
+def test_query_matches_filtering_every_cluster():
+    index = ClusterIndex(random_points(20000))
+    box = BoundingBox(x_min=-97.0, x_max=-93.5, y_min=33.0, y_max=36.0)
+    for zoom in (3, 8, 12, 17):
+        everything = index.clusters(WORLD, zoom)
+        expected = everything[everything.within(box)]
+        found = index.clusters(box, zoom)
+        assert sorted(zip(found.x, found.y)) == pytest.approx(sorted(zip(expected.x, expected.y)))
+
+def test_empty_index():
+    index = ClusterIndex(PointArray([], []))
+    assert len(index) == 0
+    assert len(index.clusters(WORLD, 3)) == 0
+
+def test_canvas_draws_clusters_with_labels():
+    fc = random_points(2000).to_feature_collection()
+    canvas = MapCanvas(fc)
+    canvas._tiles.calculate_tiles(fc.bounding_box)
+    canvas.stitch_tiles(images={})
+    canvas.cluster_style = ClusterStyle(color=(200, 0, 0, 255))
+    canvas.render()
+    frame = np.asarray(canvas._image)
+    clusters = canvas.cluster_index.clusters(canvas._tiles.buffered_bounding_box(canvas.SYMBOL_BUFFER), canvas._tiles.zoom)
+    assert len(clusters) < 2000
+    red = (frame[..., 0] == 200) & (frame[..., 3] == 255)
+    assert red.any() and (frame[..., 1] > 230).any()
+
+    canvas.cluster_style = ClusterStyle(color=(200, 0, 0, 255), labels=False)
+    canvas.render()
+    frame = np.asarray(canvas._image)
+    assert not (frame[..., 1] > 230).any()
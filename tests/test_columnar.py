@@ -0,0 +1,39 @@
+from quickmap.columnar import PointArray
+from quickmap.feature import FeatureCollection
+from quickmap.geometry import BoundingBox, Point
+
+import pytest
+
+from .test_feature_collection import geojson
+
+@pytest.fixture
+def points():
+    return PointArray.from_geojson(geojson)
+
+def test_from_geojson(points):
+    assert len(points) == 2
+    assert points.properties['population'].tolist() == [100.0, 200.0]
+
+def test_matches_point_projection(points):
+    point = Point(-112.0372, 46.608058)
+    assert points.web_mercator[0][0] == pytest.approx(point.web_mercator[0])
+    assert points.web_mercator[1][0] == pytest.approx(point.web_mercator[1])
+    pixels_x, pixels_y = points.pixels(zoom=7)
+    assert (pixels_x[0], pixels_y[0]) == point.pixels(zoom=7)
+
+def test_bounding_box(points):
+    fc = FeatureCollection()
+    fc.load_geojson(geojson)
+    assert points.bounding_box == fc.bounding_box
+
+def test_within(points):
+    mask = points.within(BoundingBox(x_min=-100, x_max=-70, y_min=30, y_max=50))
+    assert mask.tolist() == [False, True]
+    assert points[mask].properties['population'].tolist() == [200.0]
+
+def test_round_trip():
+    fc = FeatureCollection()
+    fc.load_geojson(geojson)
+    back = FeatureCollection.from_point_array(fc.to_point_array())
+    assert [n.properties for n in back.features] == [n.properties for n in fc.features]
+    assert [n.geometry for n in back.features] == [n.geometry for n in fc.features]
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from quickmap.canvas import MapCanvas
+from quickmap.columnar import PointArray
+from quickmap.density import DensityGrid, HeatmapStyle, blur, gaussian_kernel
+from quickmap.feature import Feature
+from quickmap.geometry import Point
+
+
+def test_grid_matches_histogram():
+    rng = np.random.default_rng(0)
+    xs, ys = rng.integers(-20, 120, 5000), rng.integers(-20, 80, 5000)
+    grid = DensityGrid(100, 60, margin=5)
+    inside = (xs >= -5) & (xs < 105) & (ys >= -5) & (ys < 65)
+    assert grid.add(xs, ys) == inside.sum()
+    expected, _, _ = np.histogram2d(ys[inside], xs[inside], bins=(70, 110), range=((-5, 65), (-5, 105)))
+    assert np.array_equal(grid.counts, expected)
+    grid.add([10], [10], weights=[2.5])
+    assert grid.counts[15, 15] == expected[15, 15] + 2.5
+
+def test_blur_is_the_separable_gaussian():
+    values = np.zeros((41, 41))
+    values[20, 20] = 1.0
+    blurred = blur(values, 3.0)
+    kernel = gaussian_kernel(3.0)
+    expected = np.zeros_like(values)
+    expected[20 - 9:20 + 10, 20 - 9:20 + 10] = np.outer(kernel, kernel)
+    assert np.allclose(blurred, expected)
+    assert blurred.sum() == pytest.approx(1.0)
+    assert blur(values, 0) is values
+
+def test_colorize_leaves_empty_pixels_transparent():
+    grid = DensityGrid(50, 50, margin=HeatmapStyle(sigma=2).margin)
+    assert not grid.colorize(HeatmapStyle(sigma=2)).any()
+    grid.add([25], [25])
+    frame = grid.colorize(HeatmapStyle(sigma=2))
+    assert frame.shape == (50, 50, 4)
+    assert tuple(frame[25, 25]) == HeatmapStyle().colors[-1]
+    assert not frame[0, 0].any()
+
+def test_canvas_updates_the_heatmap_incrementally(monkeypatch):
+    rng = np.random.default_rng(1)
+    points = PointArray(rng.normal(-90.0, 0.5, 2000), rng.normal(40.0, 0.5, 2000))
+    fc = points[:1500].to_feature_collection()
+    canvas = MapCanvas(fc)
+    canvas.heatmap_style = HeatmapStyle(sigma=4)
+    canvas._tiles.fit(points.bounding_box, (300, 200))
+    canvas.stitch_tiles(images={})
+    canvas.render()
+    first = canvas.to_array().copy()
+    assert first[..., 3].any()
+
+    binned = []
+    draw_density = canvas.draw_density
+    monkeypatch.setattr(canvas, 'draw_density', lambda features: binned.append(len(features)) or draw_density(features))
+    fc.extend(points[1500:].features())
+    canvas.render()
+    assert binned == [500]
+
+    full = MapCanvas(fc)
+    full.heatmap_style = canvas.heatmap_style
+    full._tiles = canvas._tiles
+    full.stitch_tiles(images={})
+    full.render()
+    assert np.array_equal(canvas.to_array(), full.to_array())
+    assert not np.array_equal(canvas.to_array(), first)
+
+def test_weights():
+    style = HeatmapStyle(sigma=0, weight='value', colors=((0, 0, 0, 0), (255, 0, 0, 255)), max_value=10)
+    features = [Feature(Point(-90.0, 40.0), {'value': 5}), Feature(Point(-90.0, 40.0), {'value': 5}),
+                Feature(Point(-89.99, 40.0), {})]
+    canvas = MapCanvas(PointArray([-90.0], [40.0]).to_feature_collection())
+    canvas._feature_collection.features = features
+    canvas.heatmap_style = style
+    canvas._tiles.fit(PointArray([-90.01, -89.98], [39.99, 40.01]).bounding_box, (100, 100))
+    canvas.stitch_tiles(images={})
+    frame = canvas.to_array()
+    assert frame[..., 3].max() == 255
+    assert (frame[..., 3] > 0).sum() == 1
@@ -0,0 +1,75 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from quickmap.canvas import MapCanvas
+from quickmap.encoders import JPEG, PNG, PNG8, WEBP, Encoder
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import Point
+from quickmap.tile import Tile
+
+
+@pytest.fixture
+def image():
+    rng = np.random.default_rng(0)
+    array = np.zeros((256, 256, 4), dtype=np.uint8)
+    array[..., :3] = np.linspace(0, 255, 256, dtype=np.uint8)[:, None, None]
+    array[..., 3] = 255
+    array[100:110, 100:110, :3] = rng.integers(0, 255, (10, 10, 3))
+    return Image.fromarray(array)
+
+def test_png_levels_are_lossless(image):
+    fast = Encoder(compress_level=1).encode(image)
+    small = Encoder(compress_level=9).encode(image)
+    assert len(small) <= len(fast)
+    assert Image.open(io.BytesIO(fast)).tobytes() == Image.open(io.BytesIO(small)).tobytes() == image.tobytes()
+
+def test_palette_png():
+    noise = Image.fromarray(np.random.default_rng(0).integers(0, 255, (256, 256, 4), dtype=np.uint8))
+    data = PNG8.encode(noise)
+    assert Image.open(io.BytesIO(data)).mode == 'P'
+    assert len(data) < len(PNG.encode(noise)) / 2
+    assert Encoder.from_name('png8') == PNG8
+
+def test_jpeg_flattens_transparency():
+    transparent = Image.new('RGBA', (16, 16))
+    decoded = Image.open(io.BytesIO(JPEG.encode(transparent)))
+    assert decoded.mode == 'RGB'
+    assert decoded.getpixel((8, 8)) == (255, 255, 255)
+    assert Encoder.from_name('.jpg') == JPEG
+    assert JPEG.content_type == 'image/jpeg'
+
+def test_webp(image):
+    lossless = Encoder(format='webp', lossless=True).encode(image)
+    assert Image.open(io.BytesIO(lossless)).convert('RGBA').tobytes() == image.tobytes()
+    assert Image.open(io.BytesIO(WEBP.encode(image))).format == 'WEBP'
+
+def test_invalid_encoders():
+    with pytest.raises(ValueError):
+        Encoder(format='gif')
+    with pytest.raises(ValueError):
+        Encoder(colors=1)
+
+def test_canvas_output_without_copies():
+    fc = FeatureCollection([Feature(geometry=Point(-87.65, 41.85), properties={})])
+    canvas = MapCanvas(fc)
+    tile = Tile.for_point(Point(-87.65, 41.85), zoom=10)
+    image = canvas.render_tile(tile)
+    array = canvas.to_array()
+    # without a basemap the frame is the overlay itself
+    assert np.shares_memory(array, canvas._overlay)
+    assert not array.flags.writeable
+    assert array[..., 3].any()
+    buffer = io.BytesIO()
+    canvas.encode(buffer)
+    assert Image.open(io.BytesIO(buffer.getvalue())).tobytes() == image.tobytes()
+
+    # with nothing to draw the basemap is used as it is
+    empty = MapCanvas(FeatureCollection())
+    empty._tiles.tiles = [tile]
+    empty._tiles.zoom = tile.zoom
+    empty.stitch_tiles(images={})
+    empty.render()
+    assert empty._image is empty._basemap
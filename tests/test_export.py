@@ -0,0 +1,39 @@
+import sqlite3
+
+from quickmap.export import export_tiles, occupied_tiles
+from quickmap.feature import FeatureCollection
+
+from .test_feature_collection import geojson
+
+def test_export_directory_and_resume(tmp_path):
+    fc = FeatureCollection()
+    fc.load_geojson(geojson)
+    result = export_tiles(fc, str(tmp_path), 0, 4, processes=2)
+    written = sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob('*.png'))
+    assert result.written == len(written)
+    assert result.empty > 0
+    assert '0/0/0.png' in written
+    assert '4/4/5.png' in written
+    again = export_tiles(fc, str(tmp_path), 0, 4, processes=2)
+    assert (again.written, again.existing) == (0, result.written)
+
+def test_export_mbtiles(tmp_path):
+    fc = FeatureCollection()
+    fc.load_geojson(geojson)
+    path = tmp_path / 'overlay.mbtiles'
+    result = export_tiles(fc, str(path), 2, 2, processes=1)
+    rows = sqlite3.connect(path).execute('SELECT zoom_level, tile_column, tile_row FROM tiles').fetchall()
+    assert result.written == len(rows) == 2
+    assert sorted(rows) == [(2, 0, 2), (2, 1, 2)]
+
+def test_sparse_export_visits_occupied_tiles(tmp_path):
+    fc = FeatureCollection()
+    fc.load_geojson({'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-74.0, 40.7]}, 'properties': {}},
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-118.2, 34.1]}, 'properties': {}}]})
+    checked = sum(len(tiles) for _, tiles in occupied_tiles(fc, 14))
+    # a symbol near a tile corner reaches four tiles, each checked with its four children
+    assert checked < 15 * 2 * 16
+    result = export_tiles(fc, str(tmp_path), 8, 12, processes=1)
+    assert result.written == len(list(tmp_path.rglob('*.png')))
+    assert result.empty < 5 * 2 * 16
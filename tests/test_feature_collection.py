@@ -1,4 +1,5 @@
-from quickmap.feature import FeatureCollection
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import BoundingBox, Point
 
 geojson = {
   "type": "FeatureCollection",
@@ -26,11 +27,31 @@ geojson = {
   ] 
 }
 
+
 def test_field_access():
   fc = FeatureCollection()
   assert fc.features == []
 
+
 def test_from_json():
   fc = FeatureCollection()
   fc.load_geojson(geojson)
-  assert len(fc.features) == 2
\ No newline at end of file
+  assert len(fc.features) == 2
+
+
+def test_extent_tracks_changes():
+  fc = FeatureCollection()
+  assert fc.bounding_box.is_empty
+  fc.load_geojson(geojson)
+  assert fc.bounding_box == BoundingBox(x_min=-112.0372, x_max=-80.0372, y_min=40.608058, y_max=46.608058)
+  version = fc.version
+  fc.add(Feature(Point(-70.0, 30.0), {}))
+  assert fc.version == version + 1
+  assert fc.bounding_box == BoundingBox(x_min=-112.0372, x_max=-70.0, y_min=30.0, y_max=46.608058)
+  fc.remove(fc.features[-1])
+  assert fc.bounding_box == BoundingBox(x_min=-112.0372, x_max=-80.0372, y_min=40.608058, y_max=46.608058)
+
+
+def test_extent_of_negative_coordinates():
+  fc = FeatureCollection([Feature(Point(-10.0, -20.0), {})])
+  assert fc.bounding_box == BoundingBox(x_min=-10.0, x_max=-10.0, y_min=-20.0, y_max=-20.0)
@@ -0,0 +1,42 @@
+import random
+
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import BoundingBox, Point
+from quickmap.index import QuadTree
+from quickmap.tile import Tile
+
+import pytest
+
+from .test_feature_collection import geojson
+
+def test_query_matches_linear_scan():
+    rng = random.Random(1)
+    boxes = []
+    tree = QuadTree()
+    for i in range(2000):
+        x, y = rng.uniform(-180, 179), rng.uniform(-90, 89)
+        box = BoundingBox(x_min=x, x_max=x + rng.choice([0, 0, 0.5, 40]), y_min=y, y_max=y + rng.choice([0, 0.5]))
+        boxes.append(box)
+        tree.insert(i, box)
+    assert len(tree) == 2000
+    for _ in range(50):
+        x, y = rng.uniform(-180, 170), rng.uniform(-90, 80)
+        search = BoundingBox(x_min=x, x_max=x + 10, y_min=y, y_max=y + 10)
+        assert sorted(tree.query(search)) == [i for i, box in enumerate(boxes) if box.intersects(search)]
+
+def test_tile_bounding_box():
+    box = Tile(0, 0, 1).bounding_box
+    assert (box.x_min, box.x_max, box.y_min) == (-180.0, 0.0, 0.0)
+    assert box.y_max == pytest.approx(85.0511287798)
+
+def test_index_follows_appends():
+    fc = FeatureCollection()
+    fc.load_geojson(geojson)
+    tile = Tile.for_point(Point(-80.0372, 40.608058), zoom=9)
+    assert [n.properties['population'] for n in fc.features_in_tile(tile)] == [200]
+    index = fc.index
+    fc.add(Feature(Point(-80.0372, 40.608058), {'population': 300}))
+    assert fc.index is index
+    assert [n.properties['population'] for n in fc.features_in_tile(tile)] == [200, 300]
+    fc.remove(fc.features[1])
+    assert [n.properties['population'] for n in fc.features_in_tile(tile)] == [300]
@@ -0,0 +1,68 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+from quickmap import io_service
+from quickmap.feature import FeatureCollection
+from quickmap.geometry import BoundingBox
+from quickmap.io_service import iter_geojson
+
+import pytest
+
+from .test_feature_collection import geojson
+
+def test_streams_features_across_chunks():
+    data = json.dumps({'name': 'features', 'features': geojson['features'] * 50, 'type': 'FeatureCollection'})
+    features = list(iter_geojson(io.StringIO(data), chunk_size=7))
+    assert features == geojson['features'] * 50
+
+def test_streams_binary_file(tmp_path):
+    path = tmp_path / 'points.geojson'
+    path.write_text(json.dumps(geojson))
+    with open(path, 'rb') as f:
+        assert list(iter_geojson(f, chunk_size=16)) == geojson['features']
+    assert list(iter_geojson(str(path))) == geojson['features']
+
+def test_single_feature():
+    feature = geojson['features'][0]
+    assert list(iter_geojson(json.dumps(feature), chunk_size=5)) == [feature]
+
+def test_invalid_json():
+    with pytest.raises(ValueError):
+        list(iter_geojson('{"type": "FeatureCollection", "features": [{"type": '))
+
+def test_large_feature_is_decoded_once(monkeypatch):
+    calls = []
+    class Decoder:
+        def raw_decode(self, text, pos):
+            calls.append(pos)
+            return json.JSONDecoder().raw_decode(text, pos)
+    monkeypatch.setattr(io_service, '_decoder', Decoder())
+    coordinates = [[i * 1e-5, i * 2e-5] for i in range(200000)]
+    feature = {'type': 'Feature', 'properties': {'name': 'a "quoted]" name\\'},
+               'geometry': {'type': 'LineString', 'coordinates': coordinates}}
+    data = json.dumps({'type': 'FeatureCollection', 'features': [feature]})
+    assert len(data) > 5_000_000
+    assert list(iter_geojson(io.StringIO(data))) == [feature]
+    # the keys, the type and the feature, not a decode per chunk
+    assert len(calls) < 10
+
+def test_load_with_filters():
+    fc = FeatureCollection()
+    fc.load_geojson(json.dumps(geojson), bounding_box=BoundingBox(x_min=-120, x_max=-100, y_min=40, y_max=50))
+    assert [n.properties['population'] for n in fc.features] == [100]
+    fc.load_geojson(geojson, where=lambda properties: properties['population'] > 150)
+    assert [n.properties['population'] for n in fc.features] == [100, 200]
+
+def test_file_is_read_as_utf8(tmp_path):
+    path = tmp_path / 'names.geojson'
+    feature = {'type': 'Feature', 'properties': {'name': 'Zürich, 東京'}, 'geometry': {'type': 'Point', 'coordinates': [8.5, 47.4]}}
+    path.write_bytes(json.dumps(feature, ensure_ascii=False).encode('utf-8'))
+    # an ascii locale makes open default to ascii
+    script = f'from quickmap.io_service import iter_geojson\nprint(ascii(list(iter_geojson({str(path)!r}))[0]["properties"]["name"]))'
+    process = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                             env={**os.environ, 'LC_ALL': 'C', 'LANG': 'C', 'PYTHONUTF8': '0'})
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip() == ascii('Zürich, 東京')
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split()
+
+def test_import_does_not_load_heavy_dependencies():
+    loaded = run(
+        'import sys, types, quickmap\n'
+        'for name in ("numpy", "PIL.Image", "PIL.ImageDraw", "pyproj", "http.client"):\n'
+        '    print(name in sys.modules and type(sys.modules[name]) is types.ModuleType)')
+    assert loaded == ['False'] * 5
+
+def test_dependencies_load_on_first_use():
+    loaded = run(
+        'import sys\n'
+        'from quickmap.geometry import Point\n'
+        'from quickmap.columnar import PointArray\n'
+        'print(PointArray.from_features([]).x.dtype)\n'
+        'print(Point.TRAN_4326_TO_3857.transform(0.0, 0.0) == (0.0, 0.0))')
+    assert loaded == ['float64', 'True']
+
+def test_mercator_math_without_pyproj():
+    loaded = run(
+        'import sys\n'
+        'sys.modules["pyproj"] = None\n'
+        'from quickmap import FeatureCollection, QuickMap\n'
+        'from quickmap.geometry import Point\n'
+        'from quickmap.tile import Tile\n'
+        'print(Tile.for_point(Point(-87.65, 41.85), zoom=7).x)\n'
+        'try:\n'
+        '    Point.TRAN_4326_TO_3857\n'
+        'except ImportError as e:\n'
+        '    print("ImportError")')
+    assert loaded == ['32', 'ImportError']
+
+def test_first_use_from_many_threads():
+    loaded = run(
+        'import threading\n'
+        'from quickmap.lazy import lazy_import\n'
+        'modules = [lazy_import(name) for name in ("http.client", "ssl", "decimal")]\n'
+        'errors = []\n'
+        'def use():\n'
+        '    try:\n'
+        '        modules[0].HTTPConnection, modules[1].SSLContext, modules[2].Decimal\n'
+        '    except AttributeError as e:\n'
+        '        errors.append(e)\n'
+        'threads = [threading.Thread(target=use) for _ in range(16)]\n'
+        'for thread in threads:\n'
+        '    thread.start()\n'
+        'for thread in threads:\n'
+        '    thread.join()\n'
+        'print(len(errors))')
+    assert loaded == ['0']
@@ -0,0 +1,55 @@
+import numpy as np
+from PIL import Image
+
+from quickmap.canvas import MapCanvas
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import LineString, Polygon
+from quickmap.simplify import simplify
+from quickmap.tile import Tile
+
+line = {'type': 'Feature', 'properties': {}, 'geometry': {
+    'type': 'LineString', 'coordinates': [[-90.0 + i / 1000, 40.0 + np.sin(i / 100) / 10] for i in range(5000)]}}
+donut = {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'MultiPolygon', 'coordinates': [
+    [[[-89, 41], [-88, 41], [-88, 42], [-89, 42], [-89, 41]], [[-88.6, 41.4], [-88.4, 41.4], [-88.4, 41.6], [-88.6, 41.4]]],
+    [[[-87, 41], [-86.5, 41], [-86.5, 41.5], [-87, 41]]]]}}
+
+def test_load_paths():
+    fc = FeatureCollection()
+    fc.load_geojson({'type': 'FeatureCollection', 'features': [line, donut]})
+    assert isinstance(fc.features[0].geometry, LineString)
+    assert isinstance(fc.features[1].geometry, Polygon)
+    assert fc.features[1].geometry.rings == [2, 1]
+    assert fc.bounding_box.x_min == -90.0
+    assert fc.bounding_box.x_max == -85.001
+
+def test_simplify_keeps_shape():
+    pixels = np.column_stack([np.arange(1000.0), np.zeros(1000)])
+    pixels[500, 1] = 10.0
+    simplified = simplify(pixels, tolerance=0.5)
+    assert simplified.tolist() == [[0.0, 0.0], [499.0, 0.0], [500.0, 10.0], [501.0, 0.0], [999.0, 0.0]]
+    assert simplify(pixels, tolerance=0) is pixels
+
+def test_bounding_box_is_computed_once(monkeypatch):
+    geometry = Feature.from_feature_dict(donut).geometry
+    monkeypatch.setattr(np, 'concatenate', None)
+    assert geometry.bounding_box == geometry.bounding_box
+    assert (geometry.bounding_box.x_min, geometry.bounding_box.y_max) == (-89.0, 42.0)
+
+def test_simplified_parts_are_cached_per_zoom():
+    geometry = Feature.from_feature_dict(line).geometry
+    low = geometry.pixel_parts(4)
+    assert geometry.pixel_parts(4) is low
+    assert len(low[0]) < len(geometry.pixel_parts(12)[0]) < 5000
+
+def test_draw_polygon_with_hole():
+    fc = FeatureCollection([Feature.from_feature_dict(donut)])
+    canvas = MapCanvas(fc)
+    canvas._tiles.zoom = 7
+    canvas._tiles.tiles = [Tile(x, y, 7) for x in (32, 33) for y in (47, 48)]
+    canvas._basemap = Image.new('RGBA', (512, 512), (255, 255, 255, 255))
+    canvas.render()
+    def pixel(lng, lat):
+        x, y = Feature.from_geometry_dict({'type': 'Point', 'coordinates': [lng, lat]}).geometry.pixels(7)
+        return canvas._image.getpixel(canvas.translated(x, y))
+    assert pixel(-88.8, 41.2)[0] < 255
+    assert pixel(-88.45, 41.45) == (255, 255, 255, 255)
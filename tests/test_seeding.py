@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from quickmap.cache import TileCache
+from quickmap.cli import main
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import BoundingBox, Point
+from quickmap.seeding import count_tiles, extent_of, iter_tiles, seed
+from quickmap.source import XYZTileSource
+from quickmap.tile import Tile, TileCollection
+
+BOX = BoundingBox(x_min=-90.2, x_max=-89.8, y_min=39.8, y_max=40.2)
+
+
+def test_count_matches_the_tiles():
+    tiles = list(iter_tiles(BOX, 3, 10))
+    assert len(tiles) == count_tiles(BOX, 3, 10) == len(set(tiles))
+    assert Tile.for_latitude_longitude(lat=40.0, lng=-90.0, zoom=10) in tiles
+    assert sorted(tiles, key=lambda n: (n.zoom, n.x, n.y)) == tiles
+    assert set(TileCollection.covering(BOX, 8).tiles) == {n for n in tiles if n.zoom == 8}
+
+def test_extent_of():
+    assert extent_of(BOX) is BOX
+    fc = FeatureCollection([Feature(Point(-90.0, 40.0), {}), Feature(Point(-89.0, 41.0), {})])
+    assert extent_of(fc) == BoundingBox(x_min=-90.0, x_max=-89.0, y_min=40.0, y_max=41.0)
+    feature = {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [-90.0, 40.0]}}
+    assert extent_of(feature) == BoundingBox(x_min=-90.0, x_max=-90.0, y_min=40.0, y_max=40.0)
+
+def test_seed_is_resumable(tile_server):
+    cache = TileCache(':memory:')
+    source = XYZTileSource(tile_server.url)
+    reports = []
+    progress = seed(BOX, 5, 9, cache=cache, source=source, rate=None, progress=reports.append)
+    total = count_tiles(BOX, 5, 9)
+    assert progress.fetched == progress.done == total == tile_server.requests
+    assert progress.bytes_downloaded == total * len(tile_server.png)
+    assert reports[-1] is progress and progress.tiles_per_second > 0
+    assert all((source.name, tile) in cache for tile in iter_tiles(BOX, 5, 9))
+
+    again = seed(BOX, 5, 10, cache=cache, source=source, rate=None)
+    assert again.skipped == total
+    assert again.fetched == count_tiles(BOX, 10, 10) == tile_server.requests - total
+
+def test_seed_rate_limit_and_cap(tile_server):
+    tile_server.latency = 0.0
+    cache = TileCache(':memory:')
+    source = XYZTileSource(tile_server.url)
+    with pytest.raises(ValueError):
+        seed(BOX, 5, 12, cache=cache, source=source, limit=10)
+    assert tile_server.requests == 0
+    start = time.perf_counter()
+    progress = seed(BOX, 9, 10, cache=cache, source=source, rate=20.0, workers=4)
+    assert progress.fetched == count_tiles(BOX, 9, 10)
+    assert time.perf_counter() - start >= (progress.fetched - 1) / 20.0
+
+def test_seed_command(tile_server, tmp_path, capsys):
+    cache = tmp_path / 'tiles.sqlite'
+    arguments = ['seed', '--bbox=-90.2,39.8,-89.8,40.2', '--zoom', '6-8', '--tiles', tile_server.url,
+                 '--cache', str(cache), '--rate', '0']
+    assert main(arguments + ['--dry-run']) == 0
+    assert tile_server.requests == 0
+    assert main(arguments) == 0
+    assert tile_server.requests == count_tiles(BOX, 6, 8)
+    assert f'{count_tiles(BOX, 6, 8)} tiles' in capsys.readouterr().err
+    assert main(arguments + ['--limit', '1']) == 2
+    with pytest.raises(SystemExit):
+        main(['seed', '--bbox=-90.2,39.8,-89.8,40.2', '--zoom', '6-8', '--cache', str(cache)])
+
+def test_seed_counts_once(tile_server, tmp_path, monkeypatch):
+    import quickmap.seeding
+    path = tmp_path / 'extent.geojson'
+    path.write_text('{"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [-90.0, 40.0]}}')
+    counts = []
+    count = quickmap.seeding.count_tiles
+    monkeypatch.setattr(quickmap.seeding, 'count_tiles', lambda *args: counts.append(args) or count(*args))
+    arguments = ['seed', '--geojson', str(path), '--zoom', '6-8', '--tiles', tile_server.url,
+                 '--cache', str(tmp_path / 'tiles.sqlite'), '--rate', '0']
+    assert main(arguments) == 0
+    assert len(counts) == 1 and tile_server.requests == 3
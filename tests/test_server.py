@@ -0,0 +1,97 @@
+import http.client
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from quickmap import XYZTileSource
+from quickmap.server import RenderServer, RenderService, SingleFlight
+
+points = {'type': 'FeatureCollection', 'features': [
+    {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [-87.65 + i / 10, 41.85]}}
+    for i in range(5)]}
+
+
+@pytest.fixture
+def render_server(tile_server):
+    server = RenderServer(('127.0.0.1', 0), RenderService(source=XYZTileSource(tile_server.url)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=10)
+    if headers is None:
+        connection.request(method, path, body=body)
+    else:
+        connection.putrequest(method, path)
+        for name, value in headers.items():
+            connection.putheader(name, value)
+        connection.endheaders(body)
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    return response.status, data
+
+def test_render(render_server):
+    status, data = request(render_server, 'POST', '/render?width=400&height=300&padding=20&size=9&color=200,30,30',
+                           json.dumps(points))
+    assert status == 200
+    assert Image.open(io.BytesIO(data)).size == (400, 300)
+
+def test_concurrent_renders_share_tile_fetches(render_server, tile_server):
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda _: request(render_server, 'POST', '/render', json.dumps(points)), range(8)))
+    assert [status for status, _ in results] == [200] * 8
+    tiles = render_server.service.tiles
+    assert tile_server.requests == len(tiles)
+    assert tiles.coalesced > 0
+
+    request(render_server, 'POST', '/render', json.dumps(points))
+    assert tile_server.requests == len(tiles)
+    status, data = request(render_server, 'GET', '/stats')
+    stats = json.loads(data)
+    assert stats['requests'] == 9
+    assert stats['errors'] == 0
+    assert stats['tiles']['hits'] >= len(tiles)
+    assert stats['latency']['p50'] <= stats['latency']['p99']
+
+def test_bad_requests(render_server):
+    assert request(render_server, 'POST', '/render', b'{not json')[0] == 400
+    assert request(render_server, 'POST', '/render', json.dumps({'type': 'FeatureCollection', 'features': []}))[0] == 400
+    assert request(render_server, 'POST', '/render?width=abc', json.dumps(points))[0] == 400
+    assert request(render_server, 'GET', '/missing')[0] == 404
+    assert json.loads(request(render_server, 'GET', '/stats')[1])['errors'] == 1
+    assert request(render_server, 'POST', '/render?width=100000&height=100000', json.dumps(points))[0] == 400
+    assert request(render_server, 'POST', '/render?width=-1&height=300', json.dumps(points))[0] == 400
+    assert request(render_server, 'POST', '/render?width=100000', json.dumps(points))[0] == 400
+    assert request(render_server, 'POST', '/render?height=300', json.dumps(points))[0] == 400
+    assert request(render_server, 'POST', '/render', b'{}', headers={'Content-Length': '-1'})[0] == 400
+    assert request(render_server, 'POST', '/render', b'{}', headers={'Content-Length': 'abc'})[0] == 400
+    assert request(render_server, 'POST', '/render', headers={'Content-Length': str(1 << 40)})[0] == 413
+
+def test_single_flight():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'result'
+    with ThreadPoolExecutor(4) as executor:
+        leader = executor.submit(flight.do, 'key', slow)
+        started.wait()
+        followers = [executor.submit(flight.do, 'key', slow) for _ in range(3)]
+        time.sleep(0.1)
+        release.set()
+        assert leader.result() == ('result', False)
+        assert [follower.result() for follower in followers] == [('result', True)] * 3
+    assert len(calls) == 1
@@ -0,0 +1,33 @@
+import time
+
+from quickmap.session import TileSession
+from quickmap.source import XYZTileSource
+from quickmap.tile import Tile, TileCollection
+
+def fetch_all(tile_server, workers):
+    collection = TileCollection(zoom=3, source=XYZTileSource(tile_server.url, TileSession(max_per_host=16)))
+    collection.tiles = [Tile(x, y, 3) for x in range(4) for y in range(4)]
+    start = time.perf_counter()
+    images = list(collection.fetch_tiles(workers=workers))
+    assert len(images) == 16
+    return time.perf_counter() - start
+
+def test_wall_clock_scales_with_workers(tile_server):
+    serial = fetch_all(tile_server, workers=1)
+    concurrent = fetch_all(tile_server, workers=8)
+    assert serial > 16 * tile_server.latency
+    assert concurrent < serial / 3
+
+def test_connections_are_reused(tile_server):
+    source = XYZTileSource(tile_server.url)
+    for x in range(4):
+        Tile(x, 0, 2).fetch(source=source)
+    assert tile_server.requests == 4
+    assert tile_server.connections == 1
+
+def test_per_host_limit(tile_server):
+    collection = TileCollection(zoom=3, source=XYZTileSource(tile_server.url, TileSession(max_per_host=2)))
+    collection.tiles = [Tile(x, 0, 3) for x in range(8)]
+    start = time.perf_counter()
+    list(collection.fetch_tiles(workers=8))
+    assert time.perf_counter() - start >= 4 * tile_server.latency
@@ -0,0 +1,42 @@
+import sqlite3
+
+from quickmap.source import DirectoryTileSource, MBTilesTileSource, TileNotFoundError
+from quickmap.tile import Tile, TileCollection
+
+import pytest
+
+@pytest.fixture
+def mbtiles(tmp_path):
+    path = tmp_path / 'tiles.mbtiles'
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)')
+    for x in range(2):
+        for y in range(2):
+            # rows are stored flipped, TMS style
+            connection.execute('INSERT INTO tiles VALUES (1, ?, ?, ?)', (x, 1 - y, f'{x}/{y}'.encode()))
+    connection.commit()
+    connection.close()
+    return MBTilesTileSource(str(path))
+
+def test_directory_source(tmp_path):
+    (tmp_path / '3' / '2').mkdir(parents=True)
+    (tmp_path / '3' / '2' / '1.png').write_bytes(b'png')
+    source = DirectoryTileSource(str(tmp_path))
+    assert source.fetch(Tile(2, 1, 3)) == (b'png', None)
+    with pytest.raises(TileNotFoundError):
+        source.fetch(Tile(2, 2, 3))
+
+def test_mbtiles_fetch(mbtiles):
+    assert mbtiles.fetch(Tile(1, 0, 1))[0] == b'1/0'
+    with pytest.raises(TileNotFoundError):
+        mbtiles.fetch(Tile(0, 0, 2))
+
+def test_mbtiles_fetch_many(mbtiles):
+    tiles = [Tile(0, 0, 1), Tile(0, 1, 1), Tile(1, 1, 1), Tile(5, 5, 3)]
+    found = dict(mbtiles.fetch_many(tiles))
+    assert found == {Tile(0, 0, 1): b'0/0', Tile(0, 1, 1): b'0/1', Tile(1, 1, 1): b'1/1'}
+
+def test_collection_skips_missing_tiles(mbtiles):
+    collection = TileCollection(zoom=1, source=mbtiles)
+    collection.tiles = [Tile(0, 0, 1), Tile(4, 4, 3)]
+    assert [tile for tile, _ in collection.fetch_tiles()] == [Tile(0, 0, 1)]
@@ -0,0 +1,39 @@
+from quickmap import QuickMap, RenderStats, TileCache, XYZTileSource
+from quickmap.stats import STAGES
+
+points = {'type': 'FeatureCollection', 'features': [
+    {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [-87.65 + i / 100, 41.85]}}
+    for i in range(10)]}
+
+def test_render_stats(tile_server, tmp_path, capsys):
+    cache = TileCache(':memory:')
+    reported = []
+    quick_map = QuickMap(cache=cache, source=XYZTileSource(tile_server.url), stats_hook=reported.append)
+    quick_map.load_geosjon(points)
+    quick_map.save_png(tmp_path / 'map.png')
+    stats = quick_map.render_stats
+    assert reported == [stats]
+    assert set(stats.spans) == set(STAGES)
+    tiles = len(quick_map.canvas._tiles.tiles)
+    assert stats.tiles_fetched == tile_server.requests == tiles
+    assert stats.bytes_downloaded == tiles * len(tile_server.png)
+    assert stats.cache_hits == 0
+    assert stats.features_drawn == 10
+    assert capsys.readouterr().out == ''
+
+    again = QuickMap(cache=cache, source=XYZTileSource(tile_server.url))
+    again.load_geosjon(points)
+    again.save_png(tmp_path / 'again.png')
+    assert again.render_stats.as_dict()['cache_hits'] == tiles
+    assert again.render_stats.tiles_fetched == 0
+
+def test_next_render_starts_new_stats(tile_server, tmp_path):
+    quick_map = QuickMap(source=XYZTileSource(tile_server.url))
+    quick_map.load_geosjon(points)
+    quick_map.save_png(tmp_path / 'map.png')
+    first = quick_map.render_stats
+    quick_map.save_png(tmp_path / 'map.png')
+    assert quick_map.render_stats is not first
+    assert isinstance(quick_map.render_stats, RenderStats)
+    assert quick_map.render_stats.tiles_fetched == 0
+    assert set(quick_map.render_stats.spans) == {'draw', 'encode'}
@@ -0,0 +1,83 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from quickmap import QuickMap
+from quickmap.canvas import MapCanvas
+from quickmap.columnar import PointArray
+from quickmap.density import HeatmapStyle
+from quickmap.feature import Feature
+from quickmap.geometry import Polygon
+from quickmap.source import TileSource
+from quickmap.striped import PNGWriter, TIFFWriter, render_striped
+
+
+class GradientTileSource(TileSource):
+    """Every tile is a different color, so misplaced tiles show up"""
+
+    name = 'gradient'
+    cacheable = False
+
+    def fetch(self, tile, etag=None):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (256, 256), (tile.x * 37 % 256, tile.y * 53 % 256, tile.zoom * 11, 255)).save(buffer, 'PNG')
+        return buffer.getvalue(), None
+
+
+def image(height, width, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 4), dtype=np.uint8)
+
+@pytest.mark.parametrize('writer', [PNGWriter, TIFFWriter])
+def test_writers_round_trip(writer):
+    frame = image(150, 70)
+    buffer = io.BytesIO()
+    output = writer(buffer, 70, 150)
+    for start, stop in [(0, 1), (1, 64), (64, 65), (65, 150)]:
+        output.write(frame[start:stop])
+    output.close()
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(buffer.getvalue()))), frame)
+
+def test_writer_checks_rows():
+    output = PNGWriter(io.BytesIO(), 10, 5)
+    with pytest.raises(ValueError):
+        output.write(image(5, 11))
+    output.write(image(4, 10))
+    with pytest.raises(ValueError):
+        output.close()
+
+def features():
+    rng = np.random.default_rng(2)
+    fc = PointArray(rng.uniform(-91.0, -89.0, 500), rng.uniform(39.0, 41.0, 500)).to_feature_collection()
+    fc.add(Feature(Polygon([[[[-90.5, 39.5], [-89.5, 39.5], [-89.5, 40.5], [-90.5, 39.5]]]]), {}))
+    return fc
+
+@pytest.mark.parametrize('extension', ['png', 'tif'])
+def test_striped_render_matches_whole_render(tmp_path, extension):
+    canvas = MapCanvas(features(), source=GradientTileSource())
+    canvas._tiles.fit(canvas._feature_collection.bounding_box, (700, 600), padding=10)
+    canvas.stitch_tiles()
+    canvas.render()
+    whole = np.asarray(canvas._image)
+    assert render_striped(canvas, tmp_path / f'map.{extension}', strip_height=200) == (700, 600)
+    striped = np.asarray(Image.open(tmp_path / f'map.{extension}'))
+    # polygon edges are rasterized per strip, so a few edge pixels may round differently
+    assert (striped != whole).any(axis=-1).mean() < 1e-3
+    assert np.array_equal(striped[:60], whole[:60])
+
+def test_save_striped_at_zoom(tmp_path):
+    quick_map = QuickMap(features(), source=GradientTileSource(), padding=5)
+    quick_map.cover_tiles()
+    window = quick_map.canvas._tiles.pixel_window
+    width, height = quick_map.save_striped(tmp_path / 'poster.png', zoom=9)
+    assert Image.open(tmp_path / 'poster.png').size == (width, height)
+    assert width > 256 * 2 and height > 256 * 2
+    assert quick_map.canvas._tiles.pixel_window == window
+
+def test_striped_heatmap_needs_a_scale(tmp_path):
+    canvas = MapCanvas(features(), source=GradientTileSource())
+    canvas._tiles.fit(canvas._feature_collection.bounding_box, (300, 300))
+    canvas.heatmap_style = HeatmapStyle()
+    with pytest.raises(ValueError):
+        render_striped(canvas, tmp_path / 'heat.png')
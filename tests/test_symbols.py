@@ -0,0 +1,41 @@
+import numpy as np
+from PIL import Image
+
+from quickmap.canvas import MapCanvas
+from quickmap.feature import Feature, FeatureCollection
+from quickmap.geometry import Point
+from quickmap.symbols import PointStyle, load_symbol, sprite, stamp
+from quickmap.tile import Tile
+
+def test_sprite_is_cached_and_styled():
+    style = PointStyle(size=9, color=(255, 0, 0))
+    assert sprite(style) is sprite(PointStyle(size=9, color=(255, 0, 0)))
+    assert sprite(style).shape == (9, 9, 4)
+    assert tuple(sprite(style)[4, 4]) == (255, 0, 0, 255)
+    assert load_symbol.cache_info().currsize == 1
+
+def test_stamp_centers_and_culls():
+    frame = np.zeros((20, 20, 4), dtype=np.uint8)
+    circle = sprite(PointStyle())
+    drawn = stamp(frame, np.array([10, -50, 19]), np.array([10, 5, 19]), circle)
+    assert drawn == 2
+    assert tuple(frame[10, 10]) == (0, 0, 0, 255)
+    assert frame[0, 0, 3] == 0
+    assert frame[18, 18, 3] == 255
+
+def test_stamp_transparent_sprite():
+    frame = np.zeros((20, 20, 4), dtype=np.uint8)
+    assert stamp(frame, np.array([10]), np.array([10]), np.zeros((5, 5, 4), dtype=np.uint8)) == 0
+    assert not frame.any()
+
+def test_draw_features_by_style():
+    fc = FeatureCollection([Feature(Point(-87.65, 41.85), {'kind': 'a'}), Feature(Point(-87.6, 41.8), {'kind': 'b'})])
+    canvas = MapCanvas(fc)
+    canvas._tiles.zoom = 7
+    canvas._tiles.tiles = [Tile(32, 47, 7)]
+    canvas._basemap = Image.new('RGBA', (256, 256), (255, 255, 255, 255))
+    colors = {'a': (255, 0, 0), 'b': (0, 0, 255)}
+    canvas.style_function = lambda feature: PointStyle(color=colors[feature.properties['kind']])
+    canvas.render()
+    x, y = canvas.translated(*fc.features[0].geometry.pixels(7))
+    assert canvas._image.getpixel((x, y))[:3] in colors.values()
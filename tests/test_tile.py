@@ -1,4 +1,6 @@
-from quickmap.tile import BaseTile, Tile
+from quickmap.geometry import BoundingBox
+from quickmap.meta import lng_lat_to_pixel
+from quickmap.tile import BaseTile, Tile, TileCollection
 from quickmap.tile import Point
 
 import pytest
@@ -17,4 +19,26 @@ def test_from_point(point):
     tile = Tile.for_point(point, zoom=7)
     assert tile.x == 32
     assert tile.y == 47
-    
\ No newline at end of file
+    
+def test_fit_picks_highest_zoom_that_fits():
+    box = BoundingBox(x_min=-90.0, x_max=-87.0, y_min=40.0, y_max=42.0)
+    collection = TileCollection()
+    collection.fit(box, (400, 300), padding=20)
+    left, top = lng_lat_to_pixel(box.x_min, box.y_max, 0)
+    right, bottom = lng_lat_to_pixel(box.x_max, box.y_min, 0)
+    fits = [z for z in range(19) if (right - left) * 2 ** z <= 360 and (bottom - top) * 2 ** z <= 260]
+    assert collection.zoom == max(fits)
+    window_left, window_top, width, height = collection.window
+    assert (width, height) == (400, 300)
+    assert abs(window_left + 200 - (left + right) / 2 * 2 ** collection.zoom) <= 1
+    tiles = {(tile.x, tile.y) for tile in collection.tiles}
+    assert tiles == {(x, y) for x in range(window_left // 256, (window_left + 399) // 256 + 1)
+                     for y in range(window_top // 256, (window_top + 299) // 256 + 1)}
+
+def test_fit_single_point_uses_max_zoom():
+    collection = TileCollection()
+    collection.fit(BoundingBox(x_min=-87.65, x_max=-87.65, y_min=41.85, y_max=41.85), (256, 256))
+    assert collection.zoom == TileCollection.MAX_ZOOM
+    assert 1 <= len(collection.tiles) <= 4
+    with pytest.raises(ValueError):
+        collection.fit(BoundingBox(x_min=-87.65, x_max=-87.65, y_min=41.85, y_max=41.85), (40, 40), padding=20)